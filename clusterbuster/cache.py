@@ -0,0 +1,28 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import cache_lookups
+
+__all__ = ['MeteredCacheMixin', 'MeteredLocMemCache']
+
+
+class MeteredCacheMixin:
+    """
+    Counts the hits and misses of a cache backend's lookups, under the cache's location.
+    """
+    MISSING = object()
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metric_name = location
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MeteredCacheMixin.MISSING, version)
+        if value is MeteredCacheMixin.MISSING:
+            cache_lookups.inc(cache=self.metric_name, result='miss')
+            return default
+        cache_lookups.inc(cache=self.metric_name, result='hit')
+        return value
+
+
+class MeteredLocMemCache(MeteredCacheMixin, LocMemCache):
+    pass
@@ -0,0 +1,134 @@
+"""
+Traffic capture records the requests made to the lobby and game views, with the seed each one's random
+choices were drawn from, to gzipped JSON lines in `CAPTURE_DIR`, a file per process.
+`core.loadtest.TraceReplay` sends them again.
+"""
+import atexit
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+from time import monotonic, time
+
+from django.conf import settings
+
+__all__ = ['TraceWriter', 'writer', 'read_traces']
+
+TRACE_VERSION = 1
+EXCLUDED_FIELDS = ('csrfmiddlewaretoken',)
+
+
+def get_client_id(session_key: str) -> str:
+    # Session keys are credentials, so traces only hold a digest of them.
+    return hashlib.sha1(session_key.encode('utf-8')).hexdigest()[:12]
+
+
+class TraceWriter:
+    """
+    Trace Writers append this process's captured requests to its trace file, flushing them
+    every `CAPTURE_FLUSH_INTERVAL` seconds and at exit.
+    """
+    FILE_PATTERN = 'trace-*.jsonl.gz'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.trace_file = None
+        self.flushed = monotonic()
+        self.aliases = {}
+
+    @staticmethod
+    def get_directory():
+        return getattr(settings, 'CAPTURE_DIR', None)
+
+    def get_file(self):
+        # Forked workers inherit the writer, so each opens a file of its own when it first writes.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            directory = TraceWriter.get_directory()
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, 'trace-%d-%d.jsonl.gz' % (self.pid, int(time() * 1000)))
+            self.trace_file = gzip.open(path, 'wt', encoding='utf-8')
+            self.trace_file.write(json.dumps({'version': TRACE_VERSION}) + '\n')
+        return self.trace_file
+
+    def get_client(self, request, response):
+        """
+        Returns the id of the client that made the request, following sessions whose key changed.
+        :return: Optional[str], `None` for requests without a session
+        """
+        cookie_name = settings.SESSION_COOKIE_NAME
+        session_key = request.COOKIES.get(cookie_name)
+        new_session_key = response.cookies[cookie_name].value if cookie_name in response.cookies else None
+        if session_key is None and not new_session_key:
+            return None
+        client = get_client_id(session_key or new_session_key)
+        client = self.aliases.get(client, client)
+        if session_key is not None and new_session_key and new_session_key != session_key:
+            self.aliases[get_client_id(new_session_key)] = client
+        return client
+
+    def write(self, request, response, seed: int, seconds: float):
+        record = {
+            'at': round(time() - seconds, 3),
+            'client': None,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'seed': seed,
+            'status': response.status_code,
+            'seconds': round(seconds, 6),
+        }
+        if request.method == 'POST':
+            record['data'] = [[key, values] for key, values in request.POST.lists() if key not in EXCLUDED_FIELDS]
+        with self.lock:
+            record['client'] = self.get_client(request, response)
+            self.get_file().write(json.dumps(record, separators=(',', ':')) + '\n')
+            if monotonic() - self.flushed >= getattr(settings, 'CAPTURE_FLUSH_INTERVAL', 5.0):
+                self.flush()
+
+    def flush(self):
+        self.flushed = monotonic()
+        if self.trace_file is not None and self.pid == os.getpid():
+            self.trace_file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.trace_file is not None and self.pid == os.getpid():
+                self.trace_file.close()
+            self.trace_file = None
+            self.pid = None
+
+
+writer = TraceWriter()
+atexit.register(writer.close)
+
+
+def read_traces(paths: list) -> list:
+    """
+    Returns the requests of the trace files, and of the trace files in directories, in the order they were made.
+    A file still being written ends at its last flush.
+    :param paths: list of file or directory paths
+    :return: list of dict
+    """
+    records = []
+    for path in paths:
+        if os.path.isdir(path):
+            file_paths = sorted(glob.glob(os.path.join(path, TraceWriter.FILE_PATTERN)))
+        else:
+            file_paths = [path]
+        for file_path in file_paths:
+            with gzip.open(file_path, 'rt', encoding='utf-8') as trace_file:
+                try:
+                    header = json.loads(trace_file.readline())
+                    if header.get('version') != TRACE_VERSION:
+                        raise ValueError('Trace %s has version %s, not %d.' % (file_path, header.get('version'),
+                                                                               TRACE_VERSION))
+                    for line in trace_file:
+                        records.append(json.loads(line))
+                except (EOFError, json.JSONDecodeError):
+                    pass
+    records.sort(key=lambda record: record['at'])
+    return records
+
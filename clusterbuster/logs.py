@@ -0,0 +1,120 @@
+"""
+Logging pieces for the game engine, whose rules, triggers and states log on every update:
+records are written as one JSON object per line with the fields they were logged with,
+sampled per logger, and handed to a queue so the thread serving a request never waits on the stream.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+__all__ = ['StructuredFormatter', 'SamplingFilter', 'QueuedStreamHandler']
+
+RESERVED_ATTRIBUTES = frozenset(vars(logging.LogRecord('', logging.INFO, '', 0, '', None, None))) | {'message'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Structured Formatters write records as JSON, with every field passed in `extra` next to the message.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in RESERVED_ATTRIBUTES:
+                data[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Sampling Filters let through a fraction of the records below `WARNING`, by the rate of the logger
+    they were logged on or of its closest configured parent. Loggers without a rate are not sampled.
+    """
+    def __init__(self, rates=None, name=''):
+        """
+        :param rates: Optional[dict] of fractions from 0 to 1 by logger name
+        :param name: str
+        """
+        super(SamplingFilter, self).__init__(name)
+        self.rates = dict(rates or {})
+        self.logger_rates = {}
+
+    def get_rate(self, logger_name: str) -> float:
+        rate = self.logger_rates.get(logger_name)
+        if rate is None:
+            name = logger_name
+            rate = 1.0
+            while name:
+                if name in self.rates:
+                    rate = self.rates[name]
+                    break
+                name = name.rpartition('.')[0]
+            self.logger_rates[logger_name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.get_rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class QueuedStreamHandler(logging.handlers.QueueHandler):
+    """
+    Queued Stream Handlers put records on a bounded queue, which a listener thread of each process
+    writes to the stream. Records that find the queue full are dropped and counted, rather than waited on.
+    """
+    def __init__(self, queue_size=10000, stream=None):
+        """
+        :param queue_size: int records held before new ones are dropped
+        :param stream: Optional stream, defaults to `sys.stderr`
+        """
+        super(QueuedStreamHandler, self).__init__(queue.Queue(queue_size))
+        self.target = logging.StreamHandler(stream)
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+
+    def setFormatter(self, fmt):
+        # Records are formatted by the listener thread, with the formatter this handler is configured with.
+        self.target.setFormatter(fmt)
+
+    def start_listener(self):
+        # Forked workers inherit the handler but not its thread, so each process starts its own.
+        self.pid = os.getpid()
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = (self.target.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.pid != os.getpid():
+            self.start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,319 @@
+"""
+Metrics count what each process serves and runs in memory, and expose it at `/metrics` in Prometheus' text format.
+Processes share a `METRICS_DIR` by writing their metrics to a file of their own there, every
+`METRICS_FLUSH_INTERVAL` seconds and at exit. The endpoint then adds up the files of every process.
+Only the standard library is used, so nothing but a scraper is needed.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+from time import monotonic, time
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+
+from clusterbuster.mixins import replace_json_file
+
+__all__ = ['Counter', 'Histogram', 'MetricRegistry', 'registry', 'connect_signals', 'metrics_view',
+           'requests', 'request_duration', 'request_queries', 'game_updates', 'game_update_duration',
+           'game_update_iterations', 'rule_evaluations', 'rule_duration', 'parameter_reads', 'parameter_writes',
+           'cache_lookups']
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SNAPSHOT_VERSION = 1
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+ITERATION_BUCKETS = (1, 2, 3, 5, 8, 13, 21)
+
+logger = logging.getLogger(__name__)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(label_names, label_values, extra=()) -> str:
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % (','.join('%s="%s"' % (name, escape_label_value(value)) for name, value in pairs),)
+
+
+def format_number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Metrics hold one value per combination of label values, and register themselves with the registry.
+    """
+    TYPE = None
+
+    def __init__(self, name: str, documentation: str, label_names=(), metric_registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.registry = metric_registry or registry
+        self.values = {}
+        self.registry.register(self)
+
+    def get_key(self, labels: dict) -> tuple:
+        return tuple(str(labels[label_name]) for label_name in self.label_names)
+
+    def get_samples(self) -> list:
+        with self.registry.lock:
+            return [[list(key), value] for key, value in self.values.items()]
+
+    def get_snapshot(self) -> dict:
+        return {'type': self.TYPE, 'help': self.documentation, 'labels': list(self.label_names),
+                'samples': self.get_samples()}
+
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.get_key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get_value(self, **labels):
+        return self.values.get(self.get_key(labels), 0)
+
+
+class Histogram(Metric):
+    """
+    Histograms count observations per bucket, along with their sum and count.
+    Values are kept as the non-cumulative count of each bucket, then the sum and the count.
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names=(), buckets=DURATION_BUCKETS,
+                 metric_registry=None):
+        self.buckets = tuple(buckets)
+        super(Histogram, self).__init__(name, documentation, label_names, metric_registry)
+
+    def observe(self, value, **labels):
+        key = self.get_key(labels)
+        bucket_i = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                bucket_i = i
+                break
+        with self.registry.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 3)
+            counts[bucket_i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def get_snapshot(self) -> dict:
+        snapshot = super(Histogram, self).get_snapshot()
+        snapshot['buckets'] = list(self.buckets)
+        return snapshot
+
+
+class MetricRegistry:
+    """
+    Metric Registries hold the metrics of the process, and add them up with those other processes wrote.
+    """
+    FILE_PATTERN = 'metrics-*.json'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.flushed = monotonic()
+        self.pid = None
+        self.file_name = None
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+
+    def get_snapshot(self) -> dict:
+        return {metric.name: metric.get_snapshot() for metric in self.metrics}
+
+    @staticmethod
+    def get_directory():
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def get_file_name(self) -> str:
+        # Forked workers inherit the registry, so each names its file when it first writes.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.file_name = 'metrics-%d-%d.json' % (self.pid, int(time() * 1000))
+        return self.file_name
+
+    def flush(self):
+        """
+        Writes the process's metrics to its file in `METRICS_DIR`, if there is one.
+        :return: None
+        """
+        directory = MetricRegistry.get_directory()
+        self.flushed = monotonic()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        # The temporary file ends in .tmp, so collect does not read it.
+        replace_json_file(os.path.join(directory, self.get_file_name()),
+                          {'version': SNAPSHOT_VERSION, 'metrics': self.get_snapshot()})
+
+    def flush_if_due(self):
+        """
+        Flushes the metrics if `METRICS_FLUSH_INTERVAL` seconds have passed. A flush that fails is
+        logged and retried at the next interval, so metrics never fail the request.
+        :return: None
+        """
+        if monotonic() - self.flushed >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Writing metrics to %s failed.', MetricRegistry.get_directory())
+
+    @staticmethod
+    def merge(snapshots: list) -> dict:
+        """
+        Adds up snapshots of the same metrics, label values by label values.
+        :param snapshots: list of dict
+        :return: dict
+        """
+        merged = {}
+        for snapshot in snapshots:
+            for name, metric in snapshot.items():
+                merged_metric = merged.get(name)
+                if merged_metric is None:
+                    merged_metric = merged[name] = dict(metric, samples={})
+                elif merged_metric.get('buckets') != metric.get('buckets'):
+                    continue
+                samples = merged_metric['samples']
+                for label_values, value in metric['samples']:
+                    key = tuple(label_values)
+                    if key not in samples:
+                        samples[key] = value
+                    elif isinstance(value, list):
+                        samples[key] = [total + added for total, added in zip(samples[key], value)]
+                    else:
+                        samples[key] += value
+        for metric in merged.values():
+            metric['samples'] = [[list(key), value] for key, value in metric['samples'].items()]
+        return merged
+
+    def collect(self) -> dict:
+        """
+        Returns the metrics of every process sharing `METRICS_DIR`, or of this process alone.
+        :return: dict
+        """
+        directory = MetricRegistry.get_directory()
+        if not directory:
+            return self.get_snapshot()
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, MetricRegistry.FILE_PATTERN)):
+            try:
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('version') == SNAPSHOT_VERSION:
+                snapshots.append(snapshot['metrics'])
+        return MetricRegistry.merge(snapshots)
+
+    @staticmethod
+    def render(snapshot: dict, extra_lines=()) -> str:
+        lines = []
+        for name, metric in sorted(snapshot.items()):
+            lines.append('# HELP %s %s' % (name, metric['help']))
+            lines.append('# TYPE %s %s' % (name, metric['type']))
+            for label_values, value in sorted(metric['samples']):
+                if metric['type'] != 'histogram':
+                    lines.append('%s%s %s' % (name, format_labels(metric['labels'], label_values),
+                                              format_number(value)))
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric['buckets'] + [float('inf')], value[:-2]):
+                    cumulative += count
+                    lines.append('%s_bucket%s %s' % (name, format_labels(metric['labels'], label_values, [
+                        ('le', format_number(float(bound)))]), cumulative))
+                lines.append('%s_sum%s %s' % (name, format_labels(metric['labels'], label_values),
+                                              format_number(value[-2])))
+                lines.append('%s_count%s %s' % (name, format_labels(metric['labels'], label_values),
+                                                format_number(value[-1])))
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricRegistry()
+atexit.register(registry.flush)
+
+requests = Counter('clusterbuster_requests_total', 'Requests served, by view and status code.',
+                   ('view', 'status'))
+request_duration = Histogram('clusterbuster_request_duration_seconds', 'Time to serve a request, by view.',
+                             ('view',))
+request_queries = Histogram('clusterbuster_request_queries', 'Queries run to serve a request, by view.',
+                            ('view',), QUERY_BUCKETS)
+game_updates = Counter('clusterbuster_game_updates_total', 'Game updates, by game.', ('game',))
+game_update_duration = Histogram('clusterbuster_game_update_duration_seconds', 'Time a game update took, by game.',
+                                 ('game',))
+game_update_iterations = Histogram('clusterbuster_game_update_iterations',
+                                   'Passes over the triggers a game update made, by game.', ('game',),
+                                   ITERATION_BUCKETS)
+rule_evaluations = Counter('clusterbuster_rule_evaluations_total', 'Rules run by pulled triggers, by rule.',
+                           ('rule',))
+rule_duration = Histogram('clusterbuster_rule_duration_seconds', 'Time a rule took, by rule.', ('rule',))
+parameter_reads = Counter('clusterbuster_parameter_reads_total', 'Parameter values read.')
+parameter_writes = Counter('clusterbuster_parameter_writes_total', 'Parameter values written.')
+cache_lookups = Counter('clusterbuster_cache_lookups_total', 'Cache lookups, by cache and result.',
+                        ('cache', 'result'))
+
+
+def record_game_update(sender, game, iterations: int, duration: float, **kwargs):
+    game_updates.inc(game=game.get_game_slug())
+    game_update_duration.observe(duration, game=game.get_game_slug())
+    game_update_iterations.observe(iterations, game=game.get_game_slug())
+
+
+def record_rule(sender, rule: str, duration: float, **kwargs):
+    rule_evaluations.inc(rule=rule)
+    rule_duration.observe(duration, rule=rule)
+
+
+def connect_signals():
+    from games.signals import game_updated, rule_evaluated
+    game_updated.connect(record_game_update, dispatch_uid='clusterbuster.metrics.record_game_update')
+    rule_evaluated.connect(record_rule, dispatch_uid='clusterbuster.metrics.record_rule')
+
+
+def get_game_state_lines() -> list:
+    """
+    Returns gauge lines of the number of live games in each state of each state machine, counted when scraped.
+    :return: list of str
+    """
+    from core import registries
+    from games.models import Game, Parameter
+    states = {state.pk: state.slug for state in registries.states.all()}
+    machines = {machine.slug for machine in registries.state_machines.all()}
+    rows = Parameter.objects.filter(key__in=machines, dictionary__in=Game.objects.values('parameters')).values(
+        'key', 'object_id').order_by().annotate(games=Count('pk'))
+    name = 'clusterbuster_games_by_state'
+    lines = ['# HELP %s Live games, by state machine and the state they are in.' % (name,),
+             '# TYPE %s gauge' % (name,)]
+    for row in sorted(rows, key=lambda state_row: (state_row['key'], state_row['object_id'] or 0)):
+        state = states.get(row['object_id'], 'none')
+        lines.append('%s%s %d' % (name, format_labels(('machine', 'state'), (row['key'], state)), row['games']))
+    return lines
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.META.get('HTTP_AUTHORIZATION') != 'Bearer %s' % (token,):
+        return HttpResponseForbidden()
+    body = MetricRegistry.render(registry.collect(), get_game_state_lines())
+    return HttpResponse(body, content_type=CONTENT_TYPE)
@@ -0,0 +1,114 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from . import capture, metrics
+from .mixins import seed_random
+from .profiling import RequestProfile, summary
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests when `PROFILING_ENABLED` is set, or when they carry an `X-Profile` header equal to
+    `PROFILING_TOKEN`, and writes their reports to `PROFILING_DIR`. Should come first, to see every query.
+    """
+    HEADER = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def is_profiled(request) -> bool:
+        if getattr(settings, 'PROFILING_ENABLED', False):
+            return True
+        token = getattr(settings, 'PROFILING_TOKEN', None)
+        return bool(token) and request.META.get(ProfilingMiddleware.HEADER) == token
+
+    @staticmethod
+    def get_endpoint(request) -> str:
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is not None and resolver_match.url_name:
+            return resolver_match.url_name
+        return request.path
+
+    def __call__(self, request):
+        if not ProfilingMiddleware.is_profiled(request):
+            return self.get_response(request)
+        # The query string is left out with the query parameters, since either may hold form input.
+        profile = RequestProfile(request.method, request.path)
+        profile.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        directory = settings.PROFILING_DIR
+        report = profile.write(directory, ProfilingMiddleware.get_endpoint(request), response.status_code)
+        summary.add(report)
+        summary.write(directory)
+        response['X-Profile-Report'] = report['id']
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency and queries by view for `/metrics`, and writes the process's metrics
+    to `METRICS_DIR` when they are due.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.connect_signals()
+
+    @staticmethod
+    def get_view(request) -> str:
+        # Paths that resolve to no view are counted together, so scanners can not add label values.
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            return 'unresolved'
+        return resolver_match.url_name or resolver_match.view_name
+
+    def __call__(self, request):
+        query_count = [0]
+
+        def count_query(execute, sql, params, many, context):
+            query_count[0] += 1
+            return execute(sql, params, many, context)
+
+        started = perf_counter()
+        with connections['default'].execute_wrapper(count_query):
+            response = self.get_response(request)
+        duration = perf_counter() - started
+        view = MetricsMiddleware.get_view(request)
+        metrics.requests.inc(view=view, status=response.status_code)
+        metrics.request_duration.observe(duration, view=view)
+        metrics.request_queries.observe(query_count[0], view=view)
+        metrics.registry.flush_if_due()
+        return response
+
+
+class CaptureMiddleware:
+    """
+    Records requests to the views of `CAPTURE_APPS` to `CAPTURE_DIR` when it is set, seeding each request's
+    random choices with a seed stored along with it. Must come before the SessionMiddleware, to see the
+    session cookies it sets.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def is_captured(request) -> bool:
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            return False
+        app = resolver_match.func.__module__.split('.', 1)[0]
+        return app in getattr(settings, 'CAPTURE_APPS', ())
+
+    def __call__(self, request):
+        if not getattr(settings, 'CAPTURE_DIR', None):
+            return self.get_response(request)
+        seed = seed_random()
+        started = perf_counter()
+        response = self.get_response(request)
+        if CaptureMiddleware.is_captured(request):
+            capture.writer.write(request, response, seed, perf_counter() - started)
+        return response
@@ -1,2 +1,3 @@
 from .utils import *
-from .models import *
\ No newline at end of file
+from .models import *
+from .registries import *
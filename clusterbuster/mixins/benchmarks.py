@@ -0,0 +1,137 @@
+"""
+Benchmark tests hold views and rule methods to budgets of queries and seconds, so N+1 regressions fail the suite.
+Every measurement is also kept in a report, written as JSON to the `BENCHMARK_REPORT` path when it is set,
+so the numbers can be diffed between commits and database backends.
+Not imported by the package, since it needs Django's test framework.
+"""
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+
+from .registries import ModelRegistry
+from .utils import get_percentile
+
+__all__ = ['BenchmarkReport', 'BenchmarkTestCase', 'report']
+
+FIXTURE = os.path.join(settings.BASE_DIR, 'clusterbuster', 'data', 'clusterbuster.json')
+REPORT_VERSION = 1
+SQL_PREVIEW_LENGTH = 200
+
+
+class BenchmarkReport:
+    """
+    Benchmark Reports collect the measurements of a test run, and the durations of the rules run along the way.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.benchmarks = {}
+        self.rule_durations = defaultdict(list)
+
+    def record(self, name: str, queries: int, seconds: float, query_budget: int, time_budget: float):
+        with self.lock:
+            self.benchmarks[name] = {
+                'queries': queries,
+                'query_budget': query_budget,
+                'seconds': round(seconds, 6),
+                'time_budget': time_budget,
+            }
+
+    def record_rule(self, rule: str, duration: float, **kwargs):
+        with self.lock:
+            self.rule_durations[rule].append(duration)
+
+    def get_report(self) -> dict:
+        with self.lock:
+            rules = {
+                rule: {
+                    'calls': len(durations),
+                    'p50': round(get_percentile(durations, 50), 6),
+                    'max': round(max(durations), 6),
+                }
+                for rule, durations in self.rule_durations.items()
+            }
+            return {'version': REPORT_VERSION, 'vendor': connection.vendor, 'benchmarks': dict(self.benchmarks),
+                    'rules': rules}
+
+    def write(self, path: str):
+        with open(path, 'w') as report_file:
+            json.dump(self.get_report(), report_file, indent=2, sort_keys=True)
+            report_file.write('\n')
+
+
+report = BenchmarkReport()
+
+
+class BenchmarkTestCase(TestCase):
+    """
+    Benchmark Test Cases load the reference data, start every test with empty caches and warm registries,
+    and write the report after each class, so an interrupted run still leaves the classes that finished.
+    Time budgets are multiplied by `BENCHMARK_TIME_FACTOR`, for slower machines.
+    """
+    fixtures = [FIXTURE]
+
+    @classmethod
+    def setUpClass(cls):
+        super(BenchmarkTestCase, cls).setUpClass()
+        from games.signals import rule_evaluated
+        rule_evaluated.connect(report.record_rule, dispatch_uid='clusterbuster.benchmarks.record_rule')
+
+    @classmethod
+    def tearDownClass(cls):
+        from games.signals import rule_evaluated
+        rule_evaluated.disconnect(dispatch_uid='clusterbuster.benchmarks.record_rule')
+        path = getattr(settings, 'BENCHMARK_REPORT', None)
+        if path:
+            report.write(path)
+        super(BenchmarkTestCase, cls).tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        # Rows of an earlier class were rolled back, along with anything the registries still hold of them.
+        ModelRegistry.invalidate_all()
+        for registry in ModelRegistry.registries:
+            registry.load()
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    @staticmethod
+    def get_time_budget(seconds: float) -> float:
+        return seconds * getattr(settings, 'BENCHMARK_TIME_FACTOR', 1.0)
+
+    @contextmanager
+    def assertBudget(self, name: str, queries: int, seconds: float):
+        """
+        Asserts the block runs at most `queries` queries within `seconds`, and records it in the report.
+        :param name: str unique name of the measurement in the report
+        :param queries: int
+        :param seconds: float
+        """
+        time_budget = self.get_time_budget(seconds)
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        # Unlike the query log of a debug cursor, the wrapper sees every query however many there are.
+        with connection.execute_wrapper(capture):
+            started = perf_counter()
+            yield
+            duration = perf_counter() - started
+        report.record(name, len(statements), duration, queries, time_budget)
+        repeated = '\n'.join('%dx %s' % (count, sql[:SQL_PREVIEW_LENGTH])
+                             for sql, count in Counter(statements).most_common(10))
+        self.assertLessEqual(len(statements), queries, '%s ran %d queries, over its budget of %d. Most run:\n%s' % (
+            name, len(statements), queries, repeated))
+        self.assertLessEqual(duration, time_budget, '%s took %.3fs, over its budget of %.3fs.' % (
+            name, duration, time_budget))
@@ -10,11 +10,18 @@ class TimeStamped(models.Model):
     created = models.DateTimeField(null=True, editable=False)
     updated = models.DateTimeField(null=True, editable=False)
 
-    def save(self, *args, **kwargs):
-        _now = now()
+    def stamp(self, _now=None):
+        """
+        Sets the timestamps for saving. Needed before `bulk_create`, which skips `save`.
+        """
+        if _now is None:
+            _now = now()
         self.updated = _now
         if not self.id:
             self.created = _now
+
+    def save(self, *args, **kwargs):
+        self.stamp()
         super(TimeStamped, self).save(*args, **kwargs)
 
 
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+
+from ..metrics import cache_lookups
+
+__all__ = ['ModelRegistry']
+
+
+class ModelRegistry:
+    """
+    Registries keep every row of a rarely changing model in memory.
+    Rows are loaded on first use and dropped whenever a row of the model, or of a model it depends on,
+    is saved or deleted in this process. Other processes pick up changes after `REFERENCE_DATA_TIMEOUT` seconds.
+    Models may be given as 'app_label.ModelName' so registries can be declared before the models are loaded.
+    """
+    registries = []
+
+    def __init__(self, model, key_field='pk', select_related=(), dependencies=()):
+        self.__model = model
+        self.key_field = key_field
+        self.select_related = select_related
+        self.__lock = threading.Lock()
+        self.__cache = None
+        for sender in (model,) + tuple(dependencies):
+            post_save.connect(self.invalidate, sender=sender, weak=False)
+            post_delete.connect(self.invalidate, sender=sender, weak=False)
+        ModelRegistry.registries.append(self)
+
+    def __str__(self):
+        return "%s registry" % (self.model._meta.label,)
+
+    @property
+    def model(self):
+        if isinstance(self.__model, str):
+            self.__model = apps.get_model(self.__model)
+        return self.__model
+
+    @classmethod
+    def invalidate_all(cls):
+        for registry in cls.registries:
+            registry.invalidate()
+
+    @staticmethod
+    def get_timeout():
+        return getattr(settings, 'REFERENCE_DATA_TIMEOUT', None)
+
+    def get_queryset(self):
+        return self.model._default_manager.select_related(*self.select_related)
+
+    def __is_fresh(self, cache) -> bool:
+        if cache is None:
+            return False
+        timeout = self.get_timeout()
+        return timeout is None or time.monotonic() - cache[2] < timeout
+
+    def __get_cache(self):
+        cache = self.__cache
+        if self.__is_fresh(cache):
+            cache_lookups.inc(cache=self.model._meta.label, result='hit')
+        else:
+            cache_lookups.inc(cache=self.model._meta.label, result='miss')
+            cache = self.load()
+        return cache
+
+    def is_loaded(self) -> bool:
+        return self.__is_fresh(self.__cache)
+
+    def load(self):
+        """
+        Loads every row of the model with one query.
+        :return: tuple of the rows, the rows by key and the load time
+        """
+        with self.__lock:
+            cache = self.__cache
+            if self.__is_fresh(cache):
+                return cache
+            objects = list(self.get_queryset())
+            lookup = {getattr(model_object, self.key_field): model_object for model_object in objects}
+            cache = (objects, lookup, time.monotonic())
+            self.__cache = cache
+            return cache
+
+    def invalidate(self, *args, **kwargs):
+        self.__cache = None
+
+    def all(self) -> list:
+        """
+        Returns all rows of the model, in the model's default order.
+        :return: list
+        """
+        return self.__get_cache()[0]
+
+    def get(self, key):
+        """
+        Returns the row whose key field matches the key.
+        :param key:
+        :raise: DoesNotExist
+        :return: Model
+        """
+        try:
+            return self.__get_cache()[1][key]
+        except KeyError:
+            raise self.model.DoesNotExist('%s matching %r does not exist.' % (self.model._meta.object_name, key))
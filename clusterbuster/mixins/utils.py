@@ -1,8 +1,18 @@
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from enum import Enum
 
+import json
+import os
 import random
 import string
+import tempfile
+import threading
+import zlib
+
+random_streams = threading.local()
 
 
 class ChoiceEnum(Enum):
@@ -18,6 +28,144 @@ class ChoiceEnum(Enum):
         return ""
 
 
+def bulk_create_with_pks(queryset, objects: list) -> list:
+    """
+    Bulk creates the objects and makes sure they have primary keys.
+    Backends that can not return them from a bulk insert get them back as the newest rows of `queryset`,
+    so `queryset` must not gain other rows while this runs.
+    :param queryset: QuerySet the new rows will be in
+    :param objects: list of unsaved model objects
+    :return: list
+    """
+    if not objects:
+        return objects
+    queryset.model._default_manager.bulk_create(objects)
+    if objects[0].pk is None:
+        pks = list(queryset.order_by('-pk').values_list('pk', flat=True)[:len(objects)])
+        for model_object, pk in zip(objects, reversed(pks)):
+            model_object.pk = pk
+    return objects
+
+
+def delete_in_chunks(queryset, chunk_size: int) -> int:
+    """
+    Deletes the rows of the queryset a chunk at a time, so no single delete holds locks for long.
+    Each delete repeats the queryset's filters, so rows that stopped matching since they were listed are kept.
+    :param queryset: QuerySet
+    :param chunk_size: int
+    :return: int number of rows of the queryset's model deleted
+    """
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        count, counts = queryset.filter(pk__in=pks).delete()
+        deleted += counts.get(queryset.model._meta.label, 0)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Cached Count Paginators keep the object count in the cache for a few seconds,
+    so paging through a large list does not count it on every request.
+    """
+    def __init__(self, object_list, per_page, cache_key: str, timeout=30, **kwargs):
+        """
+        :param cache_key: str
+        :param timeout: int seconds the count is kept
+        """
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.timeout = timeout
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = super().count
+            cache.set(self.cache_key, count, self.timeout)
+        return count
+
+
+def get_percentile(values: list, percentile: float) -> float:
+    """
+    Returns the nearest-rank percentile of the values.
+    :param values: list of numbers
+    :param percentile: float from 0 to 100
+    :return: float
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(percentile / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def compress_json(data) -> bytes:
+    """
+    Serializes data to JSON and compresses it, for storing in a BinaryField.
+    :param data: JSON serializable data
+    :return: bytes
+    """
+    return zlib.compress(json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+
+
+def decompress_json(blob):
+    """
+    Reverses `compress_json`.
+    :param blob: bytes or memoryview
+    :return: data
+    """
+    return json.loads(zlib.decompress(bytes(blob)).decode('utf-8'))
+
+
+def replace_json_file(path: str, data, **kwargs):
+    """
+    Writes the data as JSON to a temporary file of its own next to the path, then moves it over the path,
+    so readers never see half a file and writers from several threads never share the temporary file.
+    :param path: str
+    :param data: data
+    :param kwargs: passed on to `json.dump`
+    :return: None
+    """
+    directory, name = os.path.split(path)
+    descriptor, temporary_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(descriptor, 'w') as temporary_file:
+            json.dump(data, temporary_file, **kwargs)
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.unlink(temporary_path)
+        except OSError:
+            pass
+        raise
+
+
+def get_random() -> random.Random:
+    """
+    Returns the random number generator of the current thread. Requests being captured seed it,
+    so replaying them makes the same random choices.
+    :return: random.Random
+    """
+    rng = getattr(random_streams, 'rng', None)
+    if rng is None:
+        rng = random_streams.rng = random.Random()
+    return rng
+
+
+def seed_random(seed=None) -> int:
+    """
+    Seeds the random number generator of the current thread.
+    :param seed: Optional[int], a new one is drawn if it is not given
+    :return: int the seed
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    get_random().seed(seed)
+    return seed
+
+
 def get_user_model_name():
     """
     Returns the app_label.object_name string for the user model.
@@ -30,20 +178,71 @@ class CodeGenerator:
     DEFAULT_CODE_LENGTH = 4
     LOBBY_CODE_LENGTH = 4
     GAME_CODE_LENGTH = 6
+    ALPHABET = string.ascii_uppercase
+    # Coprime with the alphabet size, so multiplying permutes every code space.
+    SEQUENCE_MULTIPLIER = 2654435761
+    SEQUENCE_OFFSET = 40503
+    SEQUENCE_ROUNDS = 3
+
+    @staticmethod
+    def get_code(length=DEFAULT_CODE_LENGTH, rng=None):
+        """
+        Returns a random code.
+        :param length: int
+        :param rng: Optional[random.Random], defaults to the current thread's
+        :return: str
+        """
+        rng = rng or get_random()
+        return ''.join(rng.choice(CodeGenerator.ALPHABET) for _ in range(length))
+
+    @staticmethod
+    def __to_digits(number: int, length: int) -> list:
+        base = len(CodeGenerator.ALPHABET)
+        digits = []
+        for _ in range(length):
+            number, digit = divmod(number, base)
+            digits.append(digit)
+        return digits
+
+    @staticmethod
+    def __from_digits(digits: list) -> int:
+        base = len(CodeGenerator.ALPHABET)
+        number = 0
+        for digit in reversed(digits):
+            number = number * base + digit
+        return number
 
     @staticmethod
-    def get_code(length=DEFAULT_CODE_LENGTH):
-        return ''.join(random.choice(string.ascii_uppercase) for _ in range(length))
+    def get_sequence_code(counter: int, length=DEFAULT_CODE_LENGTH) -> str:
+        """
+        Returns the code of a counter value. Every counter gets a distinct code, and consecutive counters
+        get unrelated looking codes. Once the codes of the length run out, counters continue with longer codes.
+        :param counter: int, from 0
+        :param length: int shortest code length
+        :return: str
+        """
+        if counter < 0:
+            raise ValueError('counter must not be negative.')
+        size = len(CodeGenerator.ALPHABET) ** length
+        while counter >= size:
+            counter -= size
+            length += 1
+            size = len(CodeGenerator.ALPHABET) ** length
+        number = counter
+        for _ in range(CodeGenerator.SEQUENCE_ROUNDS):
+            number = (number * CodeGenerator.SEQUENCE_MULTIPLIER + CodeGenerator.SEQUENCE_OFFSET) % size
+            number = CodeGenerator.__from_digits(list(reversed(CodeGenerator.__to_digits(number, length))))
+        return ''.join(CodeGenerator.ALPHABET[digit] for digit in reversed(CodeGenerator.__to_digits(number, length)))
 
     @staticmethod
-    def room_code(length=ROOM_CODE_LENGTH):
-        return CodeGenerator.get_code(length)
+    def room_code(length=ROOM_CODE_LENGTH, rng=None):
+        return CodeGenerator.get_code(length, rng)
 
     @staticmethod
-    def lobby_code(length=LOBBY_CODE_LENGTH):
-        return CodeGenerator.get_code(length)
+    def lobby_code(length=LOBBY_CODE_LENGTH, rng=None):
+        return CodeGenerator.get_code(length, rng)
 
     @staticmethod
-    def game_code(length=GAME_CODE_LENGTH):
-        return CodeGenerator.get_code(length)
+    def game_code(length=GAME_CODE_LENGTH, rng=None):
+        return CodeGenerator.get_code(length, rng)
 
@@ -0,0 +1,232 @@
+"""
+Request profiles capture the cProfile stats, wall and CPU time and every query of one request,
+group the queries by shape to spot N+1 patterns, and write it all to a report file.
+A summary of the slowest endpoints is kept by each process, and rewritten after every profiled request.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import traceback
+from collections import OrderedDict, defaultdict, deque
+from contextlib import ExitStack
+from time import perf_counter, thread_time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.timezone import now
+
+from clusterbuster.mixins import get_percentile, replace_json_file
+
+__all__ = ['get_query_shape', 'RequestProfile', 'ProfileSummary', 'summary']
+
+PROFILE_STATS_LINES = 40
+QUERY_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+QUERY_NUMBER = re.compile(r'\b\d+\b')
+THIS_FILE = os.path.abspath(__file__)
+
+
+def get_query_shape(sql: str) -> str:
+    """
+    Returns the query with its parameter lists and inlined numbers collapsed, so the same query
+    run with other values has the same shape.
+    :param sql: str
+    :return: str
+    """
+    return QUERY_NUMBER.sub('N', QUERY_PLACEHOLDER_LIST.sub('%s...', sql))
+
+
+def get_param_types(params, many: bool):
+    """
+    Returns the types of the query's parameters in place of their values, which may hold session keys,
+    identities or form input.
+    :param params: parameters as passed to the cursor
+    :param many: bool whether `params` holds a sequence of parameters per row
+    :return: Optional list of type names, dict of them by name, or int number of rows
+    """
+    if params is None:
+        return None
+    if many:
+        return len(params) if hasattr(params, '__len__') else None
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def get_call_site() -> str:
+    """
+    Returns the innermost frame of the project's own code in the current stack.
+    :return: str 'path:line in function'
+    """
+    base_dir = os.path.abspath(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename == THIS_FILE or not filename.startswith(base_dir) or 'site-packages' in filename:
+            continue
+        return '%s:%d in %s' % (os.path.relpath(filename, base_dir), frame.lineno, frame.name)
+    return '?'
+
+
+class RequestProfile:
+    """
+    Request Profiles record one request from `start` to `stop`, on the thread serving it.
+    """
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = now()
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.wall_started = None
+        self.cpu_started = None
+        self.wall = None
+        self.cpu = None
+        self.wrappers = ExitStack()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'param_types': get_param_types(params, many),
+                'many': many,
+                'seconds': perf_counter() - started,
+                'database': context['connection'].alias,
+                'call_site': get_call_site(),
+            })
+
+    def start(self):
+        for connection in connections.all():
+            self.wrappers.enter_context(connection.execute_wrapper(self.record_query))
+        self.wall_started = perf_counter()
+        self.cpu_started = thread_time()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.wall = perf_counter() - self.wall_started
+        self.cpu = thread_time() - self.cpu_started
+        self.wrappers.close()
+
+    def get_query_groups(self) -> list:
+        """
+        Returns the queries grouped by shape, most run first, with the call sites they came from.
+        :return: list of dict
+        """
+        groups = OrderedDict()
+        for query in self.queries:
+            shape = get_query_shape(query['sql'])
+            group = groups.get(shape)
+            if group is None:
+                group = groups[shape] = {'shape': shape, 'count': 0, 'seconds': 0.0, 'call_sites': defaultdict(int)}
+            group['count'] += 1
+            group['seconds'] += query['seconds']
+            group['call_sites'][query['call_site']] += 1
+        ordered = sorted(groups.values(), key=lambda query_group: (-query_group['count'], -query_group['seconds']))
+        for group in ordered:
+            group['call_sites'] = sorted(group['call_sites'].items(), key=lambda call_site: -call_site[1])
+        return ordered
+
+    def get_stats(self, lines=PROFILE_STATS_LINES) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(lines)
+        return stream.getvalue()
+
+    def get_report(self, endpoint: str, status_code: int) -> dict:
+        threshold = getattr(settings, 'PROFILING_REPEATED_QUERY_THRESHOLD', 5)
+        groups = self.get_query_groups()
+        return {
+            'method': self.method,
+            'path': self.path,
+            'endpoint': endpoint,
+            'status': status_code,
+            'started': self.started_at.isoformat(),
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'query_count': len(self.queries),
+            'query_seconds': sum(query['seconds'] for query in self.queries),
+            'repeated_queries': [group for group in groups if group['count'] >= threshold],
+            'query_groups': groups,
+            'queries': self.queries,
+            'profile': self.get_stats(),
+        }
+
+    def write(self, directory: str, endpoint: str, status_code: int) -> dict:
+        """
+        Writes the report as JSON, and the raw cProfile stats next to it for other viewers.
+        The directory is created readable by this user alone.
+        :param directory: str
+        :param endpoint: str
+        :param status_code: int
+        :return: dict the report, with the id its files are named after
+        """
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        report = self.get_report(endpoint, status_code)
+        report['id'] = '%s-%d-%s' % (self.started_at.strftime('%Y%m%dT%H%M%S%f'), threading.get_ident(),
+                                     re.sub(r'[^\w.-]+', '_', endpoint))
+        with open(os.path.join(directory, report['id'] + '.json'), 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        self.profiler.dump_stats(os.path.join(directory, report['id'] + '.prof'))
+        return report
+
+
+class ProfileSummary:
+    """
+    Profile Summaries rank the endpoints of this process's profiled requests by their 95th percentile time,
+    over the last `PROFILING_SUMMARY_WINDOW` requests of each.
+    """
+    FILE_NAME = 'summary-%d.json'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    @staticmethod
+    def get_window() -> int:
+        return getattr(settings, 'PROFILING_SUMMARY_WINDOW', 50)
+
+    def add(self, report: dict):
+        with self.lock:
+            endpoint = self.endpoints.get(report['endpoint'])
+            if endpoint is None:
+                endpoint = self.endpoints[report['endpoint']] = {'requests': 0, 'recent': deque(
+                    maxlen=ProfileSummary.get_window())}
+            endpoint['requests'] += 1
+            endpoint['recent'].append((report['wall'], report['query_count'], len(report['repeated_queries']),
+                                       report['id']))
+
+    def get_summary(self) -> list:
+        """
+        Returns the endpoints, slowest first.
+        :return: list of dict
+        """
+        ranked = []
+        with self.lock:
+            for name, endpoint in self.endpoints.items():
+                recent = list(endpoint['recent'])
+                walls = [wall for wall, query_count, repeated, report_id in recent]
+                slowest = max(recent, key=lambda request: request[0])
+                ranked.append({
+                    'endpoint': name,
+                    'requests': endpoint['requests'],
+                    'wall_p50': get_percentile(walls, 50),
+                    'wall_p95': get_percentile(walls, 95),
+                    'queries_max': max(query_count for wall, query_count, repeated, report_id in recent),
+                    'repeated_max': max(repeated for wall, query_count, repeated, report_id in recent),
+                    'slowest_report': slowest[3],
+                })
+        ranked.sort(key=lambda endpoint: -endpoint['wall_p95'])
+        return ranked[:getattr(settings, 'PROFILING_SUMMARY_SIZE', 20)]
+
+    def write(self, directory: str):
+        replace_json_file(os.path.join(directory, ProfileSummary.FILE_NAME % (os.getpid(),)), self.get_summary(),
+                          indent=2)
+
+
+summary = ProfileSummary()
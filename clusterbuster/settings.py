@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -43,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'clusterbuster.middleware.ProfilingMiddleware',
+    'clusterbuster.middleware.MetricsMiddleware',
+    'clusterbuster.middleware.CaptureMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'lobbies.middleware.PlayerIdentityMiddleware',
 ]
 
 ROOT_URLCONF = 'clusterbuster.urls'
@@ -84,6 +88,151 @@ DATABASES = {
     }
 }
 
+# Set DATABASE_ENGINE=postgresql to use Postgres, configured by the other DATABASE_ variables. Connections are
+# kept open for DATABASE_CONN_MAX_AGE seconds, so requests do not pay for connecting. Tests and benchmarks run
+# against a test_ copy of DATABASE_NAME, which the user needs the right to create. Load tests need Postgres,
+# since SQLite fails concurrent writes with 'database is locked'.
+if os.environ.get('DATABASE_ENGINE') == 'postgresql':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DATABASE_NAME', 'clusterbuster'),
+        'USER': os.environ.get('DATABASE_USER', ''),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', ''),
+        'PORT': os.environ.get('DATABASE_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'clusterbuster.cache.MeteredLocMemCache',
+        'LOCATION': 'clusterbuster-default',
+    },
+    'template_fragments': {
+        'BACKEND': 'clusterbuster.cache.MeteredLocMemCache',
+        'LOCATION': 'clusterbuster-template-fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Game page fragments are keyed by the game's state version, so this only bounds how long
+# fragments of abandoned games linger. Fragments of games that are over never expire.
+GAME_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+
+# States, state machines, code cards and activity options are held in memory by each process.
+# Edits made through another process are picked up after this many seconds.
+REFERENCE_DATA_TIMEOUT = 5 * 60
+
+
+# Parameter changes are recorded in 'full' (a Parameter Update row each), 'compact' (encoded values,
+# inserted in batches), 'memory' (the latest changes of each process only) or 'off' mode.
+PARAMETER_AUDIT_LOG = 'full'
+PARAMETER_AUDIT_LOG_BATCH_SIZE = 500
+PARAMETER_AUDIT_LOG_MEMORY_SIZE = 1000
+
+# Value rows interned within this many hours are kept by the collect_parameter_values command, even when
+# nothing points at them yet.
+PARAMETER_VALUE_GRACE_PERIOD = 1.0
+
+# Finished games are moved to the archive table of this database by the archive_games command.
+# Another alias must have the games app migrated into it.
+GAME_ARCHIVE_DATABASE = 'default'
+
+# Lobby codes of deleted lobbies are given out again after this many hours.
+CODE_REUSE_DELAY = 24.0
+
+# Lobbies idle for LOBBY_EXPIRY_AGE hours (counting their games' activity), and teams and players idle for
+# PLAYER_EXPIRY_AGE hours that no lobby or game holds, are deleted by the expire_lobbies command, along with
+# expired sessions. Set EXPIRY_INTERVAL to a number of seconds to also sweep from a thread of every process.
+LOBBY_EXPIRY_AGE = 24.0
+PLAYER_EXPIRY_AGE = 24.0 * 7
+EXPIRY_CHUNK_SIZE = 500
+EXPIRY_INTERVAL = None
+
+# Seconds the lobby list keeps its count of open lobbies.
+LOBBY_LIST_COUNT_TIMEOUT = 30
+
+# Requests are profiled when PROFILING_ENABLED is set, or when they carry an X-Profile header equal to
+# PROFILING_TOKEN. Each writes a report of its cProfile stats, times and queries to PROFILING_DIR, flagging
+# query shapes run PROFILING_REPEATED_QUERY_THRESHOLD times or more. Queries are recorded with the types of
+# their parameters, not their values. Each process also keeps a summary there of its PROFILING_SUMMARY_SIZE
+# slowest endpoints, over their last PROFILING_SUMMARY_WINDOW requests. The directory is created readable by
+# the server's user alone, and responses name their report by id, in the X-Profile-Report header.
+PROFILING_ENABLED = False
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'clusterbuster-profiles'))
+PROFILING_REPEATED_QUERY_THRESHOLD = 5
+PROFILING_SUMMARY_SIZE = 20
+PROFILING_SUMMARY_WINDOW = 50
+
+# Request, rule, parameter and cache metrics are served at /metrics, to requests bearing METRICS_TOKEN
+# when it is set. Processes sharing a METRICS_DIR write their metrics there every METRICS_FLUSH_INTERVAL
+# seconds, and the endpoint adds them all up.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5.0
+
+# Requests to the views of CAPTURE_APPS are recorded to a trace file per process in CAPTURE_DIR when it is set,
+# flushed every CAPTURE_FLUSH_INTERVAL seconds, with the seeds of their random choices. The replay_traffic
+# command sends them again against a fresh database.
+CAPTURE_DIR = os.environ.get('CAPTURE_DIR')
+CAPTURE_APPS = ('lobbies', 'core')
+CAPTURE_FLUSH_INTERVAL = 5.0
+
+# The games, core and lobbies apps log JSON lines to stderr from a queue, at LOG_LEVEL. Set it to INFO to log
+# every rule evaluation, trigger pull and state transition, with the game's code and state version. Records
+# below WARNING are kept at the rate LOG_SAMPLE_RATES gives their logger, and at most LOG_QUEUE_SIZE wait
+# to be written before new ones are dropped.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
+LOG_SAMPLE_RATES = {
+    'games.rules': 0.01,
+    'games.triggers': 0.01,
+    'core.states': 1.0,
+}
+LOG_QUEUE_SIZE = 10000
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {'()': 'clusterbuster.logs.StructuredFormatter'},
+    },
+    'filters': {
+        'sampled': {'()': 'clusterbuster.logs.SamplingFilter', 'rates': LOG_SAMPLE_RATES},
+    },
+    'handlers': {
+        'queued': {
+            'class': 'clusterbuster.logs.QueuedStreamHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'formatter': 'structured',
+            'filters': ['sampled'],
+        },
+    },
+    'loggers': {
+        app: {'handlers': ['queued'], 'level': LOG_LEVEL, 'propagate': False} for app in ('games', 'core', 'lobbies')
+    },
+}
+
+# Benchmark tests write their query counts and timings as JSON to this path, when it is set.
+# Their time budgets are multiplied by BENCHMARK_TIME_FACTOR, for slower machines.
+BENCHMARK_REPORT = os.environ.get('BENCHMARK_REPORT')
+BENCHMARK_TIME_FACTOR = float(os.environ.get('BENCHMARK_TIME_FACTOR', 1.0))
+
+
+# Sessions
+# https://docs.djangoproject.com/en/2.1/topics/http/sessions/
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Signed cookie naming the current player, so page views skip the session and Player lookups.
+PLAYER_IDENTITY_COOKIE_NAME = 'player_identity'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
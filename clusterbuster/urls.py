@@ -16,7 +16,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from .metrics import metrics_view
+
 urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
     path('', include('lobbies.urls')),
     path('', include('core.urls')),
     path('admin/', admin.site.urls),
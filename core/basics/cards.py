@@ -36,8 +36,8 @@ class Deck(CardStack):
         self.all.append(self)
         super(Deck, self).__init__()
 
-    def shuffle(self):
-        random.shuffle(self)
+    def shuffle(self, rng=None):
+        (rng or random).shuffle(self)
 
     def draw(self, number=1):
         number = min(number, len(self))
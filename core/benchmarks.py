@@ -0,0 +1,180 @@
+"""
+Micro-benchmarks of the primitives every game is built on: parameter dictionaries, conditions and decks.
+Each operation is timed call by call on dictionaries of several sizes, and its median can be compared
+with the one stored in a baseline file, per database vendor.
+"""
+import json
+import os
+import random
+from time import perf_counter
+
+from django.db import connection
+
+from clusterbuster.mixins import get_percentile
+from games.models import Condition, ConditionGroup, Game, ParameterDictionary
+
+from .models import CodeCard, Deck
+
+__all__ = ['OPERATIONS', 'ParameterBenchmark', 'get_result_key', 'load_baseline', 'save_baseline',
+           'find_regressions']
+
+BASELINE_VERSION = 1
+DISTINCT_VALUES = 100
+INHERITED_KEYS = 100
+CONDITIONS_PER_GROUP = 12
+OPERATIONS = ['get_parameter', 'get_value', 'get_value_inherited', 'set_value', 'condition_passes',
+              'condition_group_passes', 'deck_draw']
+
+
+class ParameterBenchmark:
+    """
+    Parameter Benchmarks fill a game's dictionary with `size` parameters, inheriting from a shared one,
+    then time each operation `repeat` times on random keys.
+    """
+    def __init__(self, size: int, repeat: int, rng: random.Random):
+        self.size = size
+        self.repeat = repeat
+        self.rng = rng
+        self.game = None
+        self.dictionary = None
+        self.conditions = []
+        self.condition_group = None
+        self.deck = None
+
+    @staticmethod
+    def get_key(key_i: int) -> tuple:
+        return 'benchmark', key_i
+
+    def setup(self):
+        shared = ParameterDictionary.get_shared('benchmark_defaults', {
+            ('inherited', key_i): key_i % DISTINCT_VALUES for key_i in range(INHERITED_KEYS)})
+        self.dictionary = ParameterDictionary.objects.create(parent=shared)
+        self.dictionary.bulk_set_values([(ParameterBenchmark.get_key(key_i), key_i % DISTINCT_VALUES)
+                                         for key_i in range(self.size)], record=False)
+        self.game = Game.objects.create(parameters=self.dictionary)
+        for condition_i in range(CONDITIONS_PER_GROUP):
+            self.conditions.append(Condition.objects.create(
+                game=self.game, condition_type=Condition.HAS_VALUE,
+                parameter_1=self.dictionary.get_parameter(self.get_random_key())))
+        self.condition_group = ConditionGroup.objects.create(game=self.game)
+        self.condition_group.conditions.set(self.conditions)
+        self.condition_group.set_to_and_op()
+        self.deck = Deck.objects.create()
+
+    def get_random_key(self) -> tuple:
+        return ParameterBenchmark.get_key(self.rng.randrange(self.size))
+
+    def get_dictionary(self) -> ParameterDictionary:
+        # A fresh instance per call, the way each request loads its game.
+        return ParameterDictionary.objects.get(pk=self.dictionary.pk)
+
+    def prepare(self, operation: str):
+        """
+        Returns the call to time for the operation, doing the work the call should not be timed for.
+        :param operation: str one of `OPERATIONS`
+        :return: callable
+        """
+        dictionary = self.get_dictionary()
+        key = self.get_random_key()
+        if operation == 'get_parameter':
+            return lambda: dictionary.get_parameter(key)
+        if operation == 'get_value':
+            return lambda: dictionary.get_value(key)
+        if operation == 'get_value_inherited':
+            inherited_key = ('inherited', self.rng.randrange(INHERITED_KEYS))
+            return lambda: dictionary.get_value(inherited_key)
+        if operation == 'set_value':
+            value = self.rng.randrange(DISTINCT_VALUES)
+            return lambda: dictionary.set_value(key, value)
+        if operation == 'condition_passes':
+            condition = Condition.objects.get(pk=self.rng.choice(self.conditions).pk)
+            return condition.passes
+        if operation == 'condition_group_passes':
+            return ConditionGroup.objects.get(pk=self.condition_group.pk).passes
+        if operation == 'deck_draw':
+            if not self.deck.cards.exists():
+                self.deck.cards.set(CodeCard.objects.all())
+            return lambda: self.deck.draw(self.rng)
+        raise ValueError('Unknown operation %s.' % (operation,))
+
+    def time(self, operation: str) -> list:
+        """
+        Times the operation `repeat` times.
+        :param operation: str one of `OPERATIONS`
+        :return: list of seconds
+        """
+        durations = []
+        for repeat_i in range(self.repeat):
+            call = self.prepare(operation)
+            started = perf_counter()
+            call()
+            durations.append(perf_counter() - started)
+        return durations
+
+    def run(self, operations=OPERATIONS) -> dict:
+        """
+        Sets the benchmark up and times the operations.
+        :param operations: list of str
+        :return: dict of the median and 95th percentile seconds by operation
+        """
+        self.setup()
+        results = {}
+        for operation in operations:
+            durations = self.time(operation)
+            results[operation] = {
+                'median': get_percentile(durations, 50),
+                'p95': get_percentile(durations, 95),
+                'calls': len(durations),
+            }
+        return results
+
+
+def get_result_key(size: int, operation: str) -> str:
+    return '%s/%d/%s' % (connection.vendor, size, operation)
+
+
+def load_baseline(path: str) -> dict:
+    """
+    Returns the results stored in the baseline file, or no results if there is no file yet.
+    :param path: str
+    :return: dict of results by result key
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError('Baseline %s has version %s, not %d.' % (path, baseline.get('version'), BASELINE_VERSION))
+    return baseline['results']
+
+
+def save_baseline(path: str, results: dict):
+    """
+    Stores the results in the baseline file, keeping the results of other vendors and sizes.
+    :param path: str
+    :param results: dict of results by result key
+    :return: None
+    """
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, 'w') as baseline_file:
+        json.dump({'version': BASELINE_VERSION, 'results': baseline}, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Returns the operations whose median is more than `threshold` slower than the baseline's.
+    :param results: dict of results by result key
+    :param baseline: dict of results by result key
+    :param threshold: float fraction of the baseline median, 0.25 allowing 25% slower
+    :return: list of (result key, baseline median, median)
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        baseline_result = baseline.get(key)
+        if baseline_result is None or not baseline_result['median']:
+            continue
+        if result['median'] > baseline_result['median'] * (1 + threshold):
+            regressions.append((key, baseline_result['median'], result['median']))
+    return regressions
@@ -0,0 +1,422 @@
+"""
+Load tests drive the site's routes over HTTP with virtual players, seated at tables of one lobby and game each.
+Players follow the links the game page shows them, the way people do, and each request's latency is recorded
+under the name of the route it hit. Captured traffic can also be replayed, in process, from the clients that sent it.
+"""
+import html
+import random
+import re
+import threading
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from time import perf_counter, sleep
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, build_opener
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.urls import Resolver404, resolve
+
+from clusterbuster.mixins import get_percentile, seed_random
+
+__all__ = ['LoadStats', 'LoadClient', 'VirtualPlayer', 'VirtualTable', 'TraceReplay', 'LocalServer']
+
+HISTOGRAM_BOUNDS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+GAME_LINK = re.compile(r'href="/games/([A-Z]+)/"')
+GAME_OVER = 'Game Over'
+CODE_WORDS_TABLE = re.compile(r'<table id="code-words-table">(.*?)</table>', re.DOTALL)
+TABLE_CELL = re.compile(r'<td>\s*(.*?)\s*</td>', re.DOTALL)
+HINT_TEXT = re.compile(r'<span class="hint-text">(.*?)</span>', re.DOTALL)
+FORM_INPUT = re.compile(r'<input\b[^>]*\bname="([^"]+)"[^>]*\bvalue="([^"]*)"')
+
+
+class LoadStats:
+    """
+    Load Stats collect the latency and outcome of every request by endpoint, from many threads.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, status, error=False):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][str(status)] += 1
+            if error:
+                self.errors[endpoint] += 1
+
+    @staticmethod
+    def get_histogram(latencies: list) -> list:
+        """
+        Returns the request counts per latency bucket, the last bucket being slower than every bound.
+        :param latencies: list of seconds
+        :return: list of (upper bound in ms or None, count)
+        """
+        counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for seconds in latencies:
+            milliseconds = seconds * 1000
+            bucket_i = len(HISTOGRAM_BOUNDS)
+            for bound_i, bound in enumerate(HISTOGRAM_BOUNDS):
+                if milliseconds <= bound:
+                    bucket_i = bound_i
+                    break
+            counts[bucket_i] += 1
+        return list(zip(HISTOGRAM_BOUNDS + [None], counts))
+
+    def get_report(self) -> dict:
+        report = {}
+        with self.lock:
+            for endpoint, latencies in sorted(self.latencies.items()):
+                report[endpoint] = {
+                    'requests': len(latencies),
+                    'errors': self.errors[endpoint],
+                    'error_rate': self.errors[endpoint] / len(latencies),
+                    'p50': get_percentile(latencies, 50),
+                    'p95': get_percentile(latencies, 95),
+                    'p99': get_percentile(latencies, 99),
+                    'statuses': dict(self.statuses[endpoint]),
+                    'histogram': LoadStats.get_histogram(latencies),
+                }
+        return report
+
+
+class NoRedirectHandler(HTTPRedirectHandler):
+    """
+    Leaves redirects to the caller, so each hop is timed as a request of its own.
+    """
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class LoadClient:
+    """
+    Load Clients are one browser: they keep cookies, send the CSRF token with posts and time every request.
+    """
+    def __init__(self, base_url: str, stats: LoadStats, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), NoRedirectHandler())
+
+    @staticmethod
+    def get_endpoint(path: str) -> str:
+        try:
+            return resolve(path).url_name or path
+        except Resolver404:
+            return path
+
+    def get_cookie(self, name: str):
+        for cookie in self.cookies:
+            if cookie.name == name:
+                return cookie.value
+        return None
+
+    def request(self, path: str, data=None):
+        """
+        Requests the path, posting the data if there is any.
+        :param path: str
+        :param data: Optional[dict]
+        :return: (status, redirect location or None, body)
+        """
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.get_cookie('csrftoken') or '')
+            data = urlencode(data).encode('utf-8')
+        endpoint = LoadClient.get_endpoint(urlsplit(path).path)
+        started = perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data, timeout=self.timeout) as response:
+                body = response.read().decode('utf-8')
+                status = response.status
+                location = None
+        except HTTPError as error:
+            status = error.code
+            location = error.headers.get('Location')
+            body = error.read().decode('utf-8', 'replace')
+        except (URLError, OSError) as error:
+            self.stats.record(endpoint, perf_counter() - started, type(error).__name__, error=True)
+            raise
+        self.stats.record(endpoint, perf_counter() - started, status, error=status >= 400)
+        if location is not None:
+            location = urlsplit(location).path
+        return status, location, body
+
+    def get(self, path: str):
+        return self.request(path)
+
+    def post(self, path: str, data: dict):
+        return self.request(path, data)
+
+
+class VirtualPlayer:
+    """
+    Virtual Players create a player, join their table's lobby and play its game by following the game page's links.
+    Leaders hint with the secret words of their code, as the hint form suggests. Players guess their own team's
+    code by finding its hints among their secret words, and opponents' codes at random.
+    """
+    def __init__(self, table, client: LoadClient, name: str, rng: random.Random, think_time=0.0):
+        self.table = table
+        self.client = client
+        self.name = name
+        self.rng = rng
+        self.think_time = think_time
+        self.page = ''
+
+    def think(self):
+        if self.think_time:
+            sleep(self.rng.uniform(0, self.think_time))
+
+    def create_player(self, lobby_code=None):
+        self.client.get('/new_player/')
+        data = {'name': self.name}
+        if lobby_code is not None:
+            data['lobby_code'] = lobby_code
+        status, location, body = self.client.post('/new_player/', data)
+        if location is None:
+            raise RuntimeError('Creating player %s failed with status %s.' % (self.name, status))
+        if lobby_code is not None:
+            status, location, body = self.client.get(location)
+            if status >= 400:
+                raise RuntimeError('Player %s could not join lobby %s, status %s.' % (self.name, lobby_code, status))
+
+    def create_lobby(self) -> str:
+        self.client.get('/new_lobby/')
+        status, location, body = self.client.post('/new_lobby/', {})
+        if location is None:
+            raise RuntimeError('Creating a lobby failed with status %s.' % (status,))
+        return location.rstrip('/').split('/')[-1]
+
+    def start_game(self, lobby_code: str) -> str:
+        self.client.get('/lobbies/%s/start_cluster_buster/' % (lobby_code,))
+        status, location, body = self.client.get('/lobbies/%s/' % (lobby_code,))
+        match = GAME_LINK.search(body)
+        if match is None:
+            raise RuntimeError('Lobby %s did not start a game.' % (lobby_code,))
+        return match.group(1)
+
+    def refresh(self):
+        self.think()
+        status, location, self.page = self.client.get('/games/%s/' % (self.table.game_code,))
+
+    def has_link(self, route: str) -> bool:
+        return ('href="/games/%s/%s/"' % (self.table.game_code, route)) in self.page
+
+    @staticmethod
+    def get_guess_data(code: list) -> dict:
+        return {'guess_%d' % (card_i + 1,): number for card_i, number in enumerate(code)}
+
+    def get_random_guesses(self) -> dict:
+        return VirtualPlayer.get_guess_data(self.rng.sample(range(1, 5), 3))
+
+    def get_own_guesses(self) -> dict:
+        """
+        Returns the code the hints on the game page point at, reading them as the leader's team would.
+        The team's hints are the ones found among its secret words.
+        :return: dict
+        """
+        table = CODE_WORDS_TABLE.search(self.page)
+        secret_words = [html.unescape(word) for word in TABLE_CELL.findall(table.group(1))] if table else []
+        hints = [html.unescape(hint) for hint in HINT_TEXT.findall(self.page)]
+        code = [secret_words.index(hint) + 1 for hint in hints if hint in secret_words]
+        if len(code) != 3:
+            return self.get_random_guesses()
+        return VirtualPlayer.get_guess_data(code)
+
+    def submit_form(self, route: str, data=None):
+        """
+        Opens the form and posts it, with the data or else with the values the form was shown with.
+        :param route: str
+        :param data: Optional[dict]
+        :return: None
+        """
+        path = '/games/%s/%s/' % (self.table.game_code, route)
+        status, location, body = self.client.get(path)
+        if data is None:
+            data = {name: html.unescape(value) for name, value in FORM_INPUT.findall(body)}
+        self.think()
+        status, location, body = self.client.post(path, data)
+        # Valid forms redirect to the game, invalid ones are shown again.
+        if location is None:
+            raise RuntimeError('Posting %s failed with status %s.' % (path, status))
+
+    def make_hints(self):
+        if self.has_link('leader_hints'):
+            self.submit_form('leader_hints')
+
+    def make_guesses(self):
+        if self.has_link('player_guesses'):
+            self.submit_form('player_guesses', self.get_own_guesses())
+        if self.has_link('player_guesses_opponents'):
+            self.submit_form('player_guesses_opponents', self.get_random_guesses())
+
+    def follow_once(self, route: str, stage: str):
+        """
+        Follows the link if it is shown and no one at the table followed it for this stage yet.
+        Scoring and starting rounds are shown to several players, but must happen once.
+        """
+        if self.has_link(route) and self.table.claim(stage):
+            self.client.get('/games/%s/%s/' % (self.table.game_code, route))
+
+
+class VirtualTable:
+    """
+    Virtual Tables seat players in one lobby and play one game, moving through each round's stages together.
+    """
+    def __init__(self, base_url: str, stats: LoadStats, table_i: int, player_count: int, seed: int,
+                 think_time=0.0, max_rounds=20):
+        self.stats = stats
+        self.max_rounds = max_rounds
+        self.barrier = threading.Barrier(player_count)
+        self.lock = threading.Lock()
+        self.claims = set()
+        self.lobby_code = None
+        self.game_code = None
+        self.error = None
+        self.players = [
+            VirtualPlayer(self, LoadClient(base_url, stats), 'table %d player %d' % (table_i, player_i),
+                          random.Random(seed * 1000 + table_i * 100 + player_i), think_time)
+            for player_i in range(player_count)
+        ]
+
+    def claim(self, stage: str) -> bool:
+        with self.lock:
+            if stage in self.claims:
+                return False
+            self.claims.add(stage)
+            return True
+
+    def wait(self):
+        self.barrier.wait()
+
+    def play(self, player: VirtualPlayer):
+        """
+        Plays the whole game as the player. Runs in a thread per player.
+        The first error of the table is kept in `error`.
+        :param player: VirtualPlayer
+        :return: None
+        """
+        try:
+            self.__play(player)
+        except threading.BrokenBarrierError:
+            pass
+        except Exception as error:
+            # The table stops, and its other players leave the barrier they are waiting at.
+            if self.error is None:
+                self.error = error
+            self.barrier.abort()
+
+    def __play(self, player: VirtualPlayer):
+        is_host = player is self.players[0]
+        if is_host:
+            player.create_player()
+            self.lobby_code = player.create_lobby()
+        self.wait()
+        if not is_host:
+            player.create_player(self.lobby_code)
+        self.wait()
+        if is_host:
+            self.game_code = player.start_game(self.lobby_code)
+        self.wait()
+        for round_i in range(self.max_rounds):
+            player.refresh()
+            if GAME_OVER in player.page:
+                return
+            player.make_hints()
+            self.wait()
+            player.refresh()
+            player.make_guesses()
+            self.wait()
+            player.refresh()
+            player.follow_once('score_teams', 'score %d' % (round_i,))
+            self.wait()
+            player.refresh()
+            player.follow_once('start_next_round', 'next %d' % (round_i,))
+            self.wait()
+        player.refresh()
+        if GAME_OVER not in player.page:
+            raise RuntimeError('Game %s was not over after %d rounds.' % (self.game_code, self.max_rounds))
+
+
+class TraceReplay:
+    """
+    Trace Replays send captured requests in the order they were made, one at a time, each at its captured
+    time divided by `speed`, or as soon as the one before it returned. A speed of 0 sends them without waiting.
+    Requests answered with another status than the one captured are counted as errors, since the replay
+    diverged from the capture there.
+    """
+    def __init__(self, records: list, stats: LoadStats, original_stats=None, speed=1.0):
+        """
+        :param records: list of dict, from `clusterbuster.capture.read_traces`
+        :param stats: LoadStats recording the replayed requests
+        :param original_stats: Optional[LoadStats] recording the captured requests' times
+        :param speed: float
+        """
+        self.records = records
+        self.stats = stats
+        self.original_stats = original_stats
+        self.speed = speed
+        self.clients = {}
+
+    def get_client(self, client_id) -> Client:
+        if client_id is None:
+            return Client()
+        client = self.clients.get(client_id)
+        if client is None:
+            client = self.clients[client_id] = Client()
+        return client
+
+    def send(self, record: dict):
+        client = self.get_client(record['client'])
+        seed_random(record['seed'])
+        if record['method'] == 'POST':
+            return client.post(record['path'], {key: values for key, values in record.get('data', [])})
+        return client.generic(record['method'], record['path'])
+
+    def run(self):
+        if not self.records:
+            return
+        first_at = self.records[0]['at']
+        started = perf_counter()
+        for record in self.records:
+            if self.speed:
+                delay = (record['at'] - first_at) / self.speed - (perf_counter() - started)
+                if delay > 0:
+                    sleep(delay)
+            endpoint = LoadClient.get_endpoint(urlsplit(record['path']).path)
+            request_started = perf_counter()
+            response = self.send(record)
+            self.stats.record(endpoint, perf_counter() - request_started, response.status_code,
+                              error=response.status_code != record['status'])
+            if self.original_stats is not None:
+                self.original_stats.record(endpoint, record['seconds'], record['status'])
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """
+    Serves the site from threads of this process, on a free port of the loopback interface.
+    """
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = ThreadedWSGIServer((host, port), QuietRequestHandler, allow_reuse_address=True)
+        self.server.set_app(get_wsgi_application())
+        self.thread = threading.Thread(target=self.server.serve_forever, name='load-test-server', daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,91 @@
+import json
+import os
+import random
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmarks import (OPERATIONS, ParameterBenchmark, get_result_key, load_baseline, save_baseline,
+                             find_regressions)
+from core.simulation import FIXTURE
+
+
+class Command(BaseCommand):
+    help = ("Times parameter dictionary reads and writes, conditions and deck draws on dictionaries of several "
+            "sizes, in a throwaway copy of the default database, and flags medians that regressed past a baseline. "
+            "Run it once per database backend, with settings pointing the default database at it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000,100000',
+                            help='Comma separated numbers of parameters in the dictionary.')
+        parser.add_argument('--repeat', type=int, default=200, help='Calls timed per operation and size.')
+        parser.add_argument('--operations', default=','.join(OPERATIONS),
+                            help='Comma separated operations to time, of %s.' % (', '.join(OPERATIONS),))
+        parser.add_argument('--seed', type=int, default=0, help='Seeds the keys picked.')
+        parser.add_argument('--baseline', default=None, help='Baseline file to compare the medians with.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store the results in the baseline file, replacing those of the same vendor, '
+                                 'size and operation.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Fraction a median may be slower than its baseline before it is flagged.')
+        parser.add_argument('--json', dest='json_path', default=None, help='Also write the results to this file.')
+
+    @staticmethod
+    def get_list(value: str) -> list:
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def run_benchmarks(self, sizes: list, operations: list, repeat: int, seed: int) -> dict:
+        results = {}
+        for size in sizes:
+            self.stdout.write("Timing %d parameters..." % (size,))
+            benchmark = ParameterBenchmark(size, repeat, random.Random(seed))
+            for operation, result in benchmark.run(operations).items():
+                results[get_result_key(size, operation)] = result
+        return results
+
+    def write_results(self, results: dict, baseline: dict):
+        self.stdout.write("%-44s %12s %12s %12s %8s" % ('operation', 'median us', 'p95 us', 'baseline us', 'change'))
+        for key, result in results.items():
+            baseline_median = baseline.get(key, {}).get('median')
+            if baseline_median:
+                compared = "%12.1f %+7.1f%%" % (baseline_median * 1e6, (result['median'] / baseline_median - 1) * 100)
+            else:
+                compared = "%12s %8s" % ('-', '-')
+            self.stdout.write("%-44s %12.1f %12.1f %s" % (key, result['median'] * 1e6, result['p95'] * 1e6,
+                                                          compared))
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in Command.get_list(options['sizes'])]
+        except ValueError:
+            raise CommandError('Sizes must be whole numbers.')
+        operations = Command.get_list(options['operations'])
+        unknown = set(operations) - set(OPERATIONS)
+        if unknown:
+            raise CommandError('Unknown operations: %s.' % (', '.join(sorted(unknown)),))
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline needs --baseline.')
+        baseline = load_baseline(options['baseline']) if options['baseline'] else {}
+        # The benchmark fills tables with throwaway rows, so it never runs against the real database.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('loaddata', os.path.join(settings.BASE_DIR, 'clusterbuster', 'data', FIXTURE), verbosity=0)
+            results = self.run_benchmarks(sizes, operations, options['repeat'], options['seed'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.write_results(results, baseline)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as results_file:
+                json.dump(results, results_file, indent=2, sort_keys=True)
+        if options['save_baseline']:
+            save_baseline(options['baseline'], results)
+            self.stdout.write("Saved %d results to %s." % (len(results), options['baseline']))
+        regressions = find_regressions(results, baseline, options['threshold'])
+        for key, baseline_median, median in regressions:
+            self.stderr.write("%s regressed from %.1fus to %.1fus." % (key, baseline_median * 1e6, median * 1e6))
+        if regressions:
+            raise CommandError('%d operations regressed more than %d%%.' % (len(regressions),
+                                                                            options['threshold'] * 100))
+        self.stdout.write(self.style.SUCCESS("Timed %d operations." % (len(results),)))
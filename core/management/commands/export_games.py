@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ClusterBuster
+from core.transfer import export_games
+
+
+class Command(BaseCommand):
+    help = "Exports Cluster Buster games to a gzip compressed JSON lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write.')
+        parser.add_argument('--code', action='append', dest='codes', default=[],
+                            help='Only export the game with this code. Can be repeated.')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Export at most this many games.')
+
+    def handle(self, *args, **options):
+        games = ClusterBuster.objects.filter(parameters__isnull=False).select_related('parameters').order_by('pk')
+        if options['codes']:
+            games = games.filter(code__in=options['codes'])
+        if options['limit'] is not None:
+            games = games[:options['limit']]
+        count = export_games(options['path'], games.iterator())
+        self.stdout.write(self.style.SUCCESS("Exported %d games." % (count,)))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.transfer import import_games
+
+
+class Command(BaseCommand):
+    help = "Imports Cluster Buster games from a file written by export_games."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read.')
+
+    def handle(self, *args, **options):
+        games = import_games(options['path'])
+        for game in games:
+            self.stdout.write("%s: imported" % (game,))
+        self.stdout.write(self.style.SUCCESS("Imported %d games." % (len(games),)))
@@ -0,0 +1,89 @@
+import json
+import threading
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.loadtest import LoadStats, VirtualTable, LocalServer
+
+
+class Command(BaseCommand):
+    help = ("Plays games over HTTP with virtual players and reports latency and error rates per endpoint. "
+            "Capacity runs need Postgres (DATABASE_ENGINE=postgresql): SQLite lets one write through at a time "
+            "and fails the others with 'database is locked', so its error rates measure the lock, not the site.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=4, help='Games played at once, each with its own lobby.')
+        parser.add_argument('--players', type=int, default=4, help='Players per table.')
+        parser.add_argument('--url', default=None,
+                            help='Site to load, e.g. http://127.0.0.1:8000. Defaults to a server started in '
+                                 'this process on the configured database.')
+        parser.add_argument('--allow-sqlite', action='store_true',
+                            help='Start the server on a SQLite database anyway, for a smoke run.')
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help='Players pause up to this many seconds before each action.')
+        parser.add_argument('--max-rounds', type=int, default=20, help='Rounds played before a table gives up.')
+        parser.add_argument('--seed', type=int, default=0, help='Seeds the players\' guesses.')
+        parser.add_argument('--json', dest='json_path', default=None, help='Also write the report to this file.')
+
+    def write_report(self, report: dict, seconds: float, failed_tables: int):
+        total_requests = sum(stats['requests'] for stats in report.values())
+        total_errors = sum(stats['errors'] for stats in report.values())
+        self.stdout.write("%d requests in %.2fs: %.1f requests/s, %d errors, %d failed tables" % (
+            total_requests, seconds, total_requests / seconds if seconds else 0.0, total_errors, failed_tables))
+        self.stdout.write("%-26s %8s %7s %9s %9s %9s" % ('endpoint', 'requests', 'errors', 'p50 ms', 'p95 ms',
+                                                         'p99 ms'))
+        for endpoint, stats in report.items():
+            self.stdout.write("%-26s %8d %6.1f%% %9.1f %9.1f %9.1f" % (
+                endpoint, stats['requests'], stats['error_rate'] * 100, stats['p50'] * 1000, stats['p95'] * 1000,
+                stats['p99'] * 1000))
+            self.stdout.write("    " + "  ".join(
+                "%s:%d" % ('<=%dms' % (bound,) if bound is not None else 'slower', count)
+                for bound, count in stats['histogram'] if count))
+
+    def handle(self, *args, **options):
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            if connection.vendor == 'sqlite':
+                if not options['allow_sqlite']:
+                    raise CommandError("The configured database is SQLite, which fails concurrent writes with "
+                                       "'database is locked'. Set DATABASE_ENGINE=postgresql, pass --url, or "
+                                       "pass --allow-sqlite for a smoke run whose errors do not size capacity.")
+                self.stderr.write(self.style.WARNING(
+                    "Running on SQLite: errors may come from its write lock rather than the site."))
+            server = LocalServer()
+            server.start()
+            base_url = server.url
+        stats = LoadStats()
+        tables = [
+            VirtualTable(base_url, stats, table_i, options['players'], options['seed'], options['think_time'],
+                         options['max_rounds'])
+            for table_i in range(options['tables'])
+        ]
+        threads = [
+            threading.Thread(target=table.play, args=(player,), name='%s' % (player.name,), daemon=True)
+            for table in tables for player in table.players
+        ]
+        started = perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if server is not None:
+                server.stop()
+        seconds = perf_counter() - started
+        report = stats.get_report()
+        failed_tables = sum(1 for table in tables if table.error is not None)
+        self.write_report(report, seconds, failed_tables)
+        for table_i, table in enumerate(tables):
+            if table.error is not None:
+                self.stdout.write(self.style.WARNING("table %d failed: %r" % (table_i, table.error)))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as report_file:
+                json.dump({'seconds': seconds, 'failed_tables': failed_tables, 'endpoints': report}, report_file,
+                          indent=2)
+        self.stdout.write(self.style.SUCCESS("Played %d tables." % (len(tables) - failed_tables,)))
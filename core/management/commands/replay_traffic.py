@@ -0,0 +1,74 @@
+import json
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from clusterbuster.capture import read_traces
+from core.loadtest import LoadStats, TraceReplay
+from core.simulation import FIXTURE
+
+
+class Command(BaseCommand):
+    help = ("Replays traffic captured in CAPTURE_DIR against a fresh copy of the default database, with the same "
+            "random seeds, and compares each endpoint's latency with the captured one. Requests are sent one at a "
+            "time in the order they were captured, so rows and codes come out the same.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('traces', nargs='+', help='Trace files, or directories of them.')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Multiplies the pace of the captured traffic. 0 sends each request as soon as '
+                                 'the one before it returned.')
+        parser.add_argument('--json', dest='json_path', default=None, help='Also write the report to this file.')
+
+    def write_report(self, report: dict, original_report: dict, seconds: float):
+        total_requests = sum(stats['requests'] for stats in report.values())
+        diverged = sum(stats['errors'] for stats in report.values())
+        self.stdout.write("%d requests in %.2fs, %d answered with another status than captured" % (
+            total_requests, seconds, diverged))
+        self.stdout.write("%-26s %8s %8s %9s %9s %13s %13s" % ('endpoint', 'requests', 'diverged', 'p50 ms',
+                                                               'p95 ms', 'captured p50', 'captured p95'))
+        for endpoint, stats in report.items():
+            original = original_report.get(endpoint, {})
+            self.stdout.write("%-26s %8d %8d %9.1f %9.1f %13.1f %13.1f" % (
+                endpoint, stats['requests'], stats['errors'], stats['p50'] * 1000, stats['p95'] * 1000,
+                original.get('p50', 0.0) * 1000, original.get('p95', 0.0) * 1000))
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError('Speed must not be negative.')
+        for path in options['traces']:
+            if not os.path.exists(path):
+                raise CommandError('%s does not exist.' % (path,))
+        try:
+            records = read_traces(options['traces'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write("Replaying %d requests..." % (len(records),))
+        stats = LoadStats()
+        original_stats = LoadStats()
+        replay = TraceReplay(records, stats, original_stats, options['speed'])
+        # The replay starts from the fixtures alone, so it never runs against the real database.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        setup_test_environment()
+        try:
+            call_command('loaddata', os.path.join(settings.BASE_DIR, 'clusterbuster', 'data', FIXTURE), verbosity=0)
+            started = perf_counter()
+            with override_settings(CAPTURE_DIR=None):
+                replay.run()
+            seconds = perf_counter() - started
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = stats.get_report()
+        original_report = original_stats.get_report()
+        self.write_report(report, original_report, seconds)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as report_file:
+                json.dump({'seconds': seconds, 'endpoints': report, 'captured': original_report}, report_file,
+                          indent=2)
+        self.stdout.write(self.style.SUCCESS("Replayed %d requests." % (len(records),)))
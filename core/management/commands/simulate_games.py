@@ -0,0 +1,100 @@
+import json
+import multiprocessing
+import os
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from clusterbuster.mixins import get_percentile
+from core.simulation import setup_worker, play_games, merge_results
+
+
+class Command(BaseCommand):
+    help = "Plays Cluster Buster games with bots across a process pool and reports the rule engine's throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=100, help='Games to play in total.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes.')
+        parser.add_argument('--players', type=int, default=4, help='Players per game.')
+        parser.add_argument('--accuracy', type=float, default=0.9,
+                            help='Probability a team guesses its own code.')
+        parser.add_argument('--seed', type=int, default=0, help='Seeds the bots of each worker.')
+        parser.add_argument('--database-dir', default=None,
+                            help='Give each worker a SQLite file in this directory instead of an in-memory database.')
+        parser.add_argument('--json', dest='json_path', default=None, help='Also write the report to this file.')
+
+    @staticmethod
+    def get_database_name(database_dir, worker_i: int) -> str:
+        if database_dir is None:
+            return ':memory:'
+        path = os.path.join(database_dir, 'simulation_%d.sqlite3' % (worker_i,))
+        if os.path.exists(path):
+            os.remove(path)
+        return path
+
+    @staticmethod
+    def get_report(results: dict, seconds: float) -> dict:
+        game_count = len(results['game_durations'])
+        query_counts = results['query_counts']
+        return {
+            'games': game_count,
+            'seconds': seconds,
+            'games_per_second': game_count / seconds if seconds else 0.0,
+            'queries_per_game': sum(query_counts) / game_count if game_count else 0.0,
+            'rounds_per_game': sum(results['rounds']) / game_count if game_count else 0.0,
+            'game_p50': get_percentile(results['game_durations'], 50),
+            'game_p95': get_percentile(results['game_durations'], 95),
+            'rules': {
+                rule: {
+                    'count': len(durations),
+                    'p50': get_percentile(durations, 50),
+                    'p95': get_percentile(durations, 95),
+                    'p99': get_percentile(durations, 99),
+                }
+                for rule, durations in sorted(results['rule_durations'].items())
+            },
+        }
+
+    def write_report(self, report: dict):
+        self.stdout.write("%d games in %.2fs: %.2f games/s, %.1f queries/game, %.1f rounds/game" % (
+            report['games'], report['seconds'], report['games_per_second'], report['queries_per_game'],
+            report['rounds_per_game']))
+        self.stdout.write("game latency p50 %.1fms p95 %.1fms" % (report['game_p50'] * 1000,
+                                                                 report['game_p95'] * 1000))
+        self.stdout.write("%-32s %8s %10s %10s %10s" % ('rule', 'count', 'p50 ms', 'p95 ms', 'p99 ms'))
+        for rule, stats in report['rules'].items():
+            self.stdout.write("%-32s %8d %10.2f %10.2f %10.2f" % (
+                rule, stats['count'], stats['p50'] * 1000, stats['p95'] * 1000, stats['p99'] * 1000))
+
+    def handle(self, *args, **options):
+        workers = max(min(options['workers'], options['games']), 1)
+        game_counts = [options['games'] // workers + (1 if worker_i < options['games'] % workers else 0)
+                       for worker_i in range(workers)]
+        # Spawned workers start from a clean interpreter, so each sets Django up on its own database.
+        context = multiprocessing.get_context('spawn')
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'clusterbuster.settings')
+        pools = []
+        for worker_i in range(workers):
+            database_name = Command.get_database_name(options['database_dir'], worker_i)
+            pools.append(context.Pool(1, setup_worker, (database_name, settings_module)))
+        for pool in pools:
+            # Waits for the worker's setup, which is not part of the benchmark.
+            pool.apply(os.getpid)
+        started = perf_counter()
+        try:
+            pending = [
+                pool.apply_async(play_games, (game_count, options['seed'] + worker_i, options['players'],
+                                              options['accuracy']))
+                for worker_i, (pool, game_count) in enumerate(zip(pools, game_counts))
+            ]
+            results = merge_results([result.get() for result in pending])
+        finally:
+            for pool in pools:
+                pool.close()
+                pool.join()
+        report = Command.get_report(results, perf_counter() - started)
+        self.write_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+        self.stdout.write(self.style.SUCCESS("Simulated %d games." % (report['games'],)))
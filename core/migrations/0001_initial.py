@@ -0,0 +1,94 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('games', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterBuster',
+            fields=[
+                ('game_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='games.Game')),
+            ],
+            options={
+                'verbose_name': 'Cluster Buster',
+                'verbose_name_plural': 'Cluster Busters',
+            },
+            bases=('games.game',),
+        ),
+        migrations.CreateModel(
+            name='CodeCard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('number_1', models.PositiveSmallIntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4)], verbose_name='Number 1')),
+                ('number_2', models.PositiveSmallIntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4)], verbose_name='Number 2')),
+                ('number_3', models.PositiveSmallIntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4)], verbose_name='Number 3')),
+            ],
+            options={
+                'verbose_name': 'Code Card',
+                'verbose_name_plural': 'Code Cards',
+            },
+        ),
+        migrations.CreateModel(
+            name='Deck',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('cards', models.ManyToManyField(related_name='_deck_cards_+', to='core.CodeCard')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='State',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('slug', models.SlugField(max_length=32, verbose_name='Slug')),
+                ('name', models.CharField(blank=True, max_length=64, verbose_name='Name')),
+            ],
+            options={
+                'verbose_name': 'State',
+                'verbose_name_plural': 'States',
+            },
+        ),
+        migrations.CreateModel(
+            name='StateMachine',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=32, verbose_name='Slug')),
+                ('root_state', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.State')),
+            ],
+            options={
+                'verbose_name': 'State Machine',
+                'verbose_name_plural': 'State Machines',
+            },
+        ),
+        migrations.CreateModel(
+            name='Word',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('text', models.CharField(db_index=True, max_length=32, verbose_name='Text')),
+            ],
+            options={
+                'verbose_name': 'Word',
+                'verbose_name_plural': 'Words',
+                'ordering': ['text', '-created'],
+            },
+        ),
+    ]
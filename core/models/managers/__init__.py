@@ -1,12 +1,18 @@
-import random
 from django.db import models
 from django.db.models import Count
 
+from clusterbuster.mixins import get_random
+
 
 class RandomWordManager(models.Manager):
-    def random(self):
+    def random(self, rng=None):
+        """
+        Returns a random word.
+        :param rng: Optional[random.Random], defaults to the current thread's
+        :return: Word
+        """
         count = self.aggregate(count=Count('id'))['count']
         if count == 0:
             raise ValueError
-        random_index = random.randint(0, count - 1)
-        return self.all()[random_index]
\ No newline at end of file
+        random_index = (rng or get_random()).randint(0, count - 1)
+        return self.order_by('pk')[random_index]
\ No newline at end of file
@@ -1,13 +1,20 @@
+import logging
+
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from clusterbuster.mixins import get_random
 from clusterbuster.mixins.models import TimeStamped
 
-from games.models import Game, Condition
+from games.models import Game, Condition, GameTemplate, TemplateSlot, TeamSlot, ParameterDictionary
+from lobbies.models import Team
 
+from .. import registries
 from ..basics import PatternDeckBuilder
 from . import managers
 
+state_logger = logging.getLogger('core.states')
+
 
 class Word(TimeStamped):
     """
@@ -65,8 +72,15 @@ class Deck(TimeStamped):
     def __str__(self):
         return str(self.cards.count())
 
-    def draw(self) -> CodeCard:
-        card = self.cards.order_by('?').first()
+    def draw(self, rng=None) -> CodeCard:
+        """
+        Removes a random card from the deck and returns it.
+        :param rng: Optional[random.Random], defaults to the current thread's
+        :return: CodeCard
+        """
+        # Drawn in Python from the deck's few cards, rather than sorted randomly by the database.
+        cards = list(self.cards.order_by('pk'))
+        card = (rng or get_random()).choice(cards) if cards else None
         self.cards.remove(card)
         self.save()
         return card
@@ -84,6 +98,39 @@ class StateMachine(models.Model):
         return str(self.slug)
 
 
+class StateSlot(TemplateSlot):
+    """
+    Stands in for a State, looked up when a game is materialized so templates outlive State edits.
+    """
+    def __init__(self, slug: str):
+        self.slug = slug
+
+    def __str__(self):
+        return str(self.slug)
+
+    def resolve(self, game, context: dict):
+        return ClusterBuster.get_state(self.slug)
+
+
+class CodeCardDeckSlot(TemplateSlot):
+    """
+    Stands in for a team's code card deck, created for each game.
+    """
+    DRAW = 'draw'
+    DISCARD = 'discard'
+
+    def __init__(self, team: TeamSlot, deck: str):
+        self.team = team
+        self.deck = deck
+
+    def __str__(self):
+        return "%s %s deck" % (self.team, self.deck)
+
+    def resolve(self, game, context: dict):
+        team = self.team.resolve(game, context)
+        return context['decks'][team.pk][self.deck]
+
+
 class ClusterBuster(Game):
     SLUG = 'cluster_buster'
     WINNING_TOKENS_REQUIRED_TO_WIN = 2
@@ -102,6 +149,9 @@ class ClusterBuster(Game):
         'last_round_number': LAST_ROUND_NUMBER,
         'first_round_number': FIRST_ROUND_NUMBER,
     }
+    DEFAULT_PARAMETERS_SLUG = 'cluster_buster_defaults'
+    bootstrap_templates = {}
+    default_parameters = None
 
     class Meta:
         verbose_name = _("Cluster Buster")
@@ -110,7 +160,10 @@ class ClusterBuster(Game):
     @staticmethod
     def install_game():
         deck = PatternDeckBuilder.build_deck()
+        installed_cards = {(card.number_1, card.number_2, card.number_3) for card in registries.code_cards.all()}
         for card in deck:
+            if tuple(card.value) in installed_cards:
+                continue
             kwargs = {}
             for card_i, value in enumerate(card.value):
                 code_i = card_i + 1
@@ -122,97 +175,184 @@ class ClusterBuster(Game):
     @staticmethod
     def get_state(state_slug: str):
         try:
-            return State.objects.get(slug=state_slug)
+            return registries.states.get(state_slug)
         except State.DoesNotExist:
             raise ValueError('state_slug must match the label of an existing State')
 
-    def set_start_parameters(self):
-        self.set_values(**ClusterBuster.START_PARAMETERS)
-
-    def set_state_machines(self):
-        for state_machine in StateMachine.objects.all():
+    @staticmethod
+    def set_state_machines(template: GameTemplate):
+        for state_machine in registries.state_machines.all():
             parameter_key = state_machine.slug
-            self.set_value(parameter_key, state_machine.root_state)
+            template.set_value(parameter_key, StateSlot(state_machine.root_state.slug))
 
-    def set_state_parameters(self):
-        for state in State.objects.all():
-            parameter_key = state.slug + "_state"
-            self.set_value(parameter_key, state)
+    @staticmethod
+    def get_default_values() -> dict:
+        values = dict(ClusterBuster.START_PARAMETERS)
+        for state in registries.states.all():
+            values[state.slug + "_state"] = state
+        return values
+
+    def get_default_parameters(self) -> ParameterDictionary:
+        """
+        Returns the dictionary of constants shared by every game, syncing it whenever the states reload.
+        :return: ParameterDictionary
+        """
+        states = registries.states.all()
+        cached = ClusterBuster.default_parameters
+        if cached is None or cached[0] is not states:
+            dictionary = ParameterDictionary.get_shared(ClusterBuster.DEFAULT_PARAMETERS_SLUG,
+                                                        ClusterBuster.get_default_values())
+            cached = (states, dictionary)
+            ClusterBuster.default_parameters = cached
+        return cached[1]
+
+    def is_over(self) -> bool:
+        fsm0 = self.get_value('fsm0')  # type: State
+        return fsm0 is not None and fsm0.slug == 'game_over'
+
+    def get_owned_querysets(self) -> list:
+        deck_pks = []
+        for team in self.get_roster().teams:
+            for key in (('team', team, 'code_card_draw_deck'), ('team', team, 'code_card_discard_deck')):
+                deck = self.get_value(key)
+                if deck is not None:
+                    deck_pks.append(deck.pk)
+        return [Deck.objects.filter(pk__in=deck_pks)]
 
     def set_state(self, key, state_slug: str):
         state = ClusterBuster.get_state(state_slug)
+        if state_logger.isEnabledFor(logging.INFO):
+            previous = self.get_value(key)
+            state_logger.info('%s moved from %s to %s in %s', key, previous, state_slug, self.code, extra={
+                'game': self.code, 'machine': key, 'previous_state': getattr(previous, 'slug', None),
+                'state': state_slug, 'state_version': self.state_version})
         self.set_value(key, state)
 
-    def set_team_win_tokens(self):
-        for team in self.teams.all():
-            self.set_value(('team_winning_tokens', team), ClusterBuster.STARTING_WIN_TOKENS_PER_TEAM)
+    @staticmethod
+    def set_team_win_tokens(template: GameTemplate):
+        for team in template.teams:
+            template.set_value(('team_winning_tokens', team), ClusterBuster.STARTING_WIN_TOKENS_PER_TEAM)
 
-    def set_team_lose_tokens(self):
-        for team in self.teams.all():
-            self.set_value(('team_losing_tokens', team), ClusterBuster.STARTING_LOSE_TOKENS_PER_TEAM)
+    @staticmethod
+    def set_team_lose_tokens(template: GameTemplate):
+        for team in template.teams:
+            template.set_value(('team_losing_tokens', team), ClusterBuster.STARTING_LOSE_TOKENS_PER_TEAM)
 
-    def set_code_card_decks(self):
-        for team in self.teams.all():
-            cards = CodeCard.objects.all()
-            draw = Deck.objects.create()
-            discard = Deck.objects.create()
-            draw.cards.set(cards)
-            draw.save()
-            self.set_value(('team', team, 'code_card_draw_deck'), draw)
-            self.set_value(('team', team, 'code_card_discard_deck'), discard)
-
-    def set_win_condition(self):
-        trigger = self.add_trigger('team_won')
-        for team in self.teams.all():
+    @staticmethod
+    def set_code_card_decks(template: GameTemplate):
+        for team in template.teams:
+            template.set_value(('team', team, 'code_card_draw_deck'), CodeCardDeckSlot(team, CodeCardDeckSlot.DRAW))
+            template.set_value(('team', team, 'code_card_discard_deck'),
+                               CodeCardDeckSlot(team, CodeCardDeckSlot.DISCARD))
+
+    @staticmethod
+    def set_win_condition(template: GameTemplate):
+        trigger = template.add_trigger('team_won')
+        for team in template.teams:
             trigger.add_comparison_condition(
                 ('team_winning_tokens', team),
                 'winning_tokens_required_to_win',
                 Condition.GREATER_THAN_OR_EQUAL
             )
 
-    def set_lose_condition(self):
-        trigger = self.add_trigger('team_lost')
-        for team in self.teams.all():
+    @staticmethod
+    def set_lose_condition(template: GameTemplate):
+        trigger = template.add_trigger('team_lost')
+        for team in template.teams:
             trigger.add_comparison_condition(
                 ('team_losing_tokens', team),
                 'losing_tokens_required_to_lose',
                 Condition.GREATER_THAN_OR_EQUAL
             )
 
-    def set_draw_words_fsm_trigger(self):
-        trigger = self.add_trigger('draw_words')
+    @staticmethod
+    def set_draw_words_fsm_trigger(template: GameTemplate):
+        trigger = template.add_trigger('draw_words')
         trigger.add_comparison_condition('fsm1', 'draw_words_stage_state')
 
-    def set_rounds_fsm_trigger(self):
-        trigger = self.add_trigger('start_first_round')
+    @staticmethod
+    def set_rounds_fsm_trigger(template: GameTemplate):
+        trigger = template.add_trigger('start_first_round')
         trigger.add_comparison_condition('fsm1', 'rounds_stage_state')
 
-    def set_rounds_fsm_repeat_triggers(self):
-        trigger = self.add_trigger('assign_team_leader', repeats=True)
+    @staticmethod
+    def set_rounds_fsm_repeat_triggers(template: GameTemplate):
+        trigger = template.add_trigger('assign_team_leader', repeats=True)
         trigger.add_comparison_condition('fsm3', 'select_leader_stage_state')
-        trigger = self.add_trigger('leaders_draw_code_numbers', repeats=True)
+        trigger = template.add_trigger('leaders_draw_code_numbers', repeats=True)
         trigger.add_comparison_condition('fsm3', 'draw_code_card_stage_state')
 
+    @staticmethod
+    def build_bootstrap_template(team_count: int) -> GameTemplate:
+        """
+        Builds the parameters and triggers every game with the number of teams starts with.
+        :param team_count: int
+        :return: GameTemplate
+        """
+        template = GameTemplate(team_count)
+        ClusterBuster.set_state_machines(template)
+        ClusterBuster.set_team_win_tokens(template)
+        ClusterBuster.set_team_lose_tokens(template)
+        ClusterBuster.set_win_condition(template)
+        ClusterBuster.set_lose_condition(template)
+        ClusterBuster.set_code_card_decks(template)
+        ClusterBuster.set_draw_words_fsm_trigger(template)
+        ClusterBuster.set_rounds_fsm_trigger(template)
+        ClusterBuster.set_rounds_fsm_repeat_triggers(template)
+        template.set_value('fsm0', StateSlot('game_play'))
+        template.set_value('fsm1', StateSlot('draw_words_stage'))
+        return template
+
+    @staticmethod
+    def get_bootstrap_template(team_count: int) -> GameTemplate:
+        """
+        Returns the bootstrap template for the number of teams, building it once per load of the states.
+        :param team_count: int
+        :return: GameTemplate
+        """
+        # Registries hand out the same lists until they reload, so a new list means the template is stale.
+        reference_data = (registries.states.all(), registries.state_machines.all())
+        cached = ClusterBuster.bootstrap_templates.get(team_count)
+        if cached is None or cached[0][0] is not reference_data[0] or cached[0][1] is not reference_data[1]:
+            cached = (reference_data, ClusterBuster.build_bootstrap_template(team_count))
+            ClusterBuster.bootstrap_templates[team_count] = cached
+        return cached[1]
+
+    def create_code_card_decks(self) -> dict:
+        """
+        Creates a draw deck holding every code card and an empty discard deck for each team.
+        :return: dict of the decks by team pk and deck kind
+        """
+        cards = registries.code_cards.all()
+        decks = {}
+        deck_cards = []
+        for team in self.get_roster().teams:
+            draw = Deck.objects.create()
+            discard = Deck.objects.create()
+            deck_cards.extend(Deck.cards.through(deck=draw, codecard=card) for card in cards)
+            decks[team.pk] = {CodeCardDeckSlot.DRAW: draw, CodeCardDeckSlot.DISCARD: discard}
+        Deck.cards.through.objects.bulk_create(deck_cards)
+        return decks
+
     def first_rule(self):
-        self.set_start_parameters()
-        self.set_state_machines()
-        self.set_state_parameters()
-        self.set_team_win_tokens()
-        self.set_team_lose_tokens()
-        self.set_win_condition()
-        self.set_lose_condition()
-        self.set_code_card_decks()
-        self.set_draw_words_fsm_trigger()
-        self.set_rounds_fsm_trigger()
-        self.set_rounds_fsm_repeat_triggers()
-        self.set_state('fsm0', 'game_play')
-        self.set_state('fsm1', 'draw_words_stage')
+        template = ClusterBuster.get_bootstrap_template(len(self.get_roster().teams))
+        template.materialize(self, decks=self.create_code_card_decks())
+
+    def get_scored_teams(self) -> list:
+        """
+        Returns the two teams the game is scored between, in roster order. The roster leaves out teams
+        nobody plays for, so those are looked up from the game's teams when it has fewer than two.
+        :return: list of Team
+        """
+        teams = self.get_roster().teams[:2]
+        if len(teams) < 2:
+            teams = teams + [team for team in self.teams.order_by('name', '-created', 'pk') if team not in teams]
+        return teams[:2]
 
     def set_winning_team(self):
         winning_team = None
         losing_team = None
-        team_1 = self.teams.all()[0]
-        team_2 = self.teams.all()[1]
+        team_1, team_2 = self.get_scored_teams()
         team_1_winning_tokens = self.get_value(('team_winning_tokens', team_1))
         team_2_winning_tokens = self.get_value(('team_winning_tokens', team_2))
         if team_1_winning_tokens > team_2_winning_tokens:
@@ -227,8 +367,7 @@ class ClusterBuster(Game):
     def set_losing_team(self):
         winning_team = None
         losing_team = None
-        team_1 = self.teams.all()[0]
-        team_2 = self.teams.all()[1]
+        team_1, team_2 = self.get_scored_teams()
         team_1_losing_tokens = self.get_value(('team_losing_tokens', team_1))
         team_2_losing_tokens = self.get_value(('team_losing_tokens', team_2))
         if team_1_losing_tokens > team_2_losing_tokens:
@@ -244,12 +383,14 @@ class ClusterBuster(Game):
         self.set_state('fsm1', 'final_scoring_stage')
         self.set_winning_team()
         self.set_state('fsm0', 'game_over')
+        self.take_checkpoint('game_over')
 
     def team_lost(self):
 
         self.set_state('fsm1', 'final_scoring_stage')
         self.set_losing_team()
         self.set_state('fsm0', 'game_over')
+        self.take_checkpoint('game_over')
 
     def last_round_over(self):
         self.set_state('fsm1', 'final_scoring_stage')
@@ -258,20 +399,21 @@ class ClusterBuster(Game):
         if winning_team is None:
             self.set_losing_team()
         self.set_state('fsm0', 'game_over')
+        self.take_checkpoint('game_over')
 
     def draw_words(self):
         if not bool(self.get_value('word_cards_drawn')):
-            teams_set = self.teams
-            team_count = teams_set.count()
+            teams = self.get_roster().teams
+            team_count = len(teams)
             total_words = ClusterBuster.SECRET_WORDS_PER_TEAM * team_count
             # Get Random Words
-            random_word_set = Word.objects.order_by('?')
-            random_words = random_word_set.all()[:total_words]
-            for team_i, team in enumerate(teams_set.all()):
+            words = list(Word.objects.order_by('pk').values_list('text', flat=True))
+            random_words = self.get_random().sample(words, min(total_words, len(words)))
+            for team_i, team in enumerate(teams):
                 start_word_i = ClusterBuster.SECRET_WORDS_PER_TEAM * team_i
                 end_word_i = start_word_i + ClusterBuster.SECRET_WORDS_PER_TEAM
                 for word_i, random_word in enumerate(random_words[start_word_i:end_word_i]):
-                    self.set_value(('team', team, 'secret_word', word_i + 1), str(random_word))
+                    self.set_value(('team', team, 'secret_word', word_i + 1), random_word)
             self.set_value('word_cards_drawn', True)
         self.set_state('fsm1', 'rounds_stage')
 
@@ -280,21 +422,21 @@ class ClusterBuster(Game):
         self.set_value('last_round_number', ClusterBuster.LAST_ROUND_NUMBER)
         self.set_state('fsm2', 'first_round')
         self.set_state('fsm3', 'select_leader_stage')
+        self.take_checkpoint('round', ClusterBuster.FIRST_ROUND_NUMBER)
 
     def assign_team_leader(self):
         round_number = self.get_value('current_round_number')
-        for team in self.teams.all():
-            player_count = team.players.count()
-            offset = (round_number - 1) % player_count
-            round_leader = team.players.all()[offset]
+        roster = self.get_roster()
+        for team in roster.teams:
+            round_leader = roster.get_round_leader(round_number, team)
             self.set_value(('round', round_number, 'team', team, 'leader'), round_leader)
         self.set_state('fsm3', 'draw_code_card_stage')
 
     def leaders_draw_code_numbers(self):
         round_number = self.get_value('current_round_number')
-        for team in self.teams.all():
+        for team in self.get_roster().teams:
             deck = self.get_value(('team', team, 'code_card_draw_deck'))  # type: Deck
-            card = deck.draw()
+            card = deck.draw(self.get_random())
             self.set_value(('round', round_number, 'team', team, 'card'), card)
             self.set_value(('round', round_number, 'team', team, 'code_1'), card.number_1)
             self.set_value(('round', round_number, 'team', team, 'code_2'), card.number_2)
@@ -302,7 +444,7 @@ class ClusterBuster(Game):
         # Team Leader Made Hints Trigger
         trigger = self.add_trigger('leaders_made_hints')
         trigger.set_to_and_op()
-        for team in self.teams.all():
+        for team in self.get_roster().teams:
             for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
                 trigger.add_has_value_condition(
                     ('round', round_number, 'team', team, 'hint', card_i + 1),
@@ -317,8 +459,9 @@ class ClusterBuster(Game):
         # Team Players Made Guesses Trigger
         trigger = self.add_trigger('teams_made_guesses')
         trigger.set_to_and_op()
-        for guessing_team in self.teams.all():
-            for hinting_team in self.teams.all():
+        teams = self.get_roster().teams
+        for guessing_team in teams:
+            for hinting_team in teams:
                 if guessing_team != hinting_team and is_first_round:
                     continue
                 for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
@@ -335,12 +478,13 @@ class ClusterBuster(Game):
         fsm2 = self.get_value('fsm2')  # type: State
         is_first_round = fsm2.slug == 'first_round'
         self.set_state('fsm3', 'score_teams_stage')
-        for hinting_team in self.teams.all():
+        teams = self.get_roster().teams
+        for hinting_team in teams:
             code_card = self.get_value(('round', round_number, 'team', hinting_team, 'card'))  # type: CodeCard
             discard = self.get_value(('team', hinting_team, 'code_card_discard_deck'))  # type: Deck
             discard.cards.add(code_card)
             discard.save()
-            for guessing_team in self.teams.all():
+            for guessing_team in teams:
                 if guessing_team != hinting_team and is_first_round:
                     continue
                 correct_guesses = 0
@@ -383,3 +527,30 @@ class ClusterBuster(Game):
         elif fsm2_state == 'first_round' and round_number > ClusterBuster.FIRST_ROUND_NUMBER:
             self.set_state('fsm2', 'middle_rounds')
         self.set_state('fsm3', 'select_leader_stage')
+        self.take_checkpoint('round', round_number)
+
+    def submit_hints(self, round_number: int, team: Team, hints: list):
+        """
+        Sets the hints the team's leader gave for the round, then updates the game.
+        :param round_number: int
+        :param team: Team
+        :param hints: list of str, one per code card slot
+        :return: None
+        """
+        for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
+            self.set_value(('round', round_number, 'team', team, 'hint', card_i + 1), hints[card_i])
+        self.update()
+
+    def submit_guesses(self, round_number: int, guessing_team: Team, hinting_team: Team, guesses: list):
+        """
+        Sets the guessing team's guesses of the hinting team's code for the round, then updates the game.
+        :param round_number: int
+        :param guessing_team: Team
+        :param hinting_team: Team, the guessing team itself for its own code
+        :param guesses: list of int, one per code card slot
+        :return: None
+        """
+        for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
+            self.set_value(('round', round_number, 'guessing_team', guessing_team, 'hinting_team', hinting_team,
+                            'guess', card_i + 1), guesses[card_i])
+        self.update()
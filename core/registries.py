@@ -0,0 +1,6 @@
+from clusterbuster.mixins import ModelRegistry
+
+states = ModelRegistry('core.State', key_field='slug')
+state_machines = ModelRegistry('core.StateMachine', key_field='slug', select_related=('root_state',),
+                               dependencies=('core.State',))
+code_cards = ModelRegistry('core.CodeCard')
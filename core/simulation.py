@@ -0,0 +1,181 @@
+"""
+Headless Cluster Buster games, played by scripted bots through the same model methods the views call.
+Workers of a process pool each set up Django on a database of their own, so this module only imports
+Django models inside the functions that run once a worker is set up.
+"""
+import os
+import random
+from collections import defaultdict
+from time import perf_counter
+
+__all__ = ['GameBot', 'setup_worker', 'play_games', 'merge_results']
+
+FIXTURE = 'clusterbuster.json'
+
+
+class GameBot:
+    """
+    Game Bots play every team of a game. Leaders hint with their code's secret words. Teams guess their own
+    code right with `accuracy` probability, and opponents' codes at random.
+    """
+    def __init__(self, game, rng: random.Random, accuracy=0.9):
+        """
+        :param game: ClusterBuster
+        :param rng: random.Random
+        :param accuracy: float probability a team guesses its own code
+        """
+        self.game = game
+        self.rng = rng
+        self.accuracy = accuracy
+
+    def get_code(self, round_number: int, team) -> list:
+        return [self.game.get_value(('round', round_number, 'team', team, 'code', card_i + 1))
+                for card_i in range(self.game.CODE_CARD_SLOTS)]
+
+    def get_random_code(self) -> list:
+        return self.rng.sample(range(1, self.game.SECRET_WORDS_PER_TEAM + 1), self.game.CODE_CARD_SLOTS)
+
+    def make_hints(self, round_number: int):
+        for team in self.game.get_roster().teams:
+            hints = [str(self.game.get_value(('team', team, 'secret_word', code_number)))
+                     for code_number in self.get_code(round_number, team)]
+            self.game.submit_hints(round_number, team, hints)
+
+    def get_guesses(self, round_number: int, guessing_team, hinting_team) -> list:
+        if hinting_team == guessing_team and self.rng.random() < self.accuracy:
+            return self.get_code(round_number, hinting_team)
+        return self.get_random_code()
+
+    def make_guesses(self, round_number: int):
+        is_first_round = self.game.get_value('fsm2').slug == 'first_round'
+        teams = self.game.get_roster().teams
+        for guessing_team in teams:
+            for hinting_team in teams:
+                if hinting_team != guessing_team and is_first_round:
+                    continue
+                guesses = self.get_guesses(round_number, guessing_team, hinting_team)
+                self.game.submit_guesses(round_number, guessing_team, hinting_team, guesses)
+
+    def play_round(self):
+        """
+        Plays the current round through to the start of the next, or the end of the game.
+        :return: None
+        """
+        round_number = self.game.get_value('current_round_number')
+        self.make_hints(round_number)
+        self.make_guesses(round_number)
+        self.game.score_teams()
+        self.game.update()
+        self.game.start_next_round()
+        self.game.update()
+
+    def play(self, max_rounds=20):
+        rounds = 0
+        while not self.game.is_over():
+            rounds += 1
+            if rounds > max_rounds:
+                raise RuntimeError('Game %s did not finish in %d rounds.' % (self.game, max_rounds))
+            self.play_round()
+        return rounds
+
+
+setup_error = None
+
+
+def create_schema():
+    from django.apps import apps
+    from django.db import connection
+    with connection.schema_editor() as editor:
+        for model in apps.get_models():
+            if model._meta.managed and not model._meta.proxy:
+                editor.create_model(model)
+
+
+def setup_worker(database_name: str, settings_module: str):
+    """
+    Sets Django up in a pool worker on its own SQLite database, with the tables and reference data a game needs.
+    The tables are created from the models, so unapplied migrations do not matter.
+    A failure is kept and raised by `play_games`, since a pool restarts workers whose setup fails.
+    :param database_name: str SQLite file path, or ':memory:'
+    :param settings_module: str
+    :return: None
+    """
+    global setup_error
+    try:
+        os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+        import django
+        from django.conf import settings
+        settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': database_name}}
+        settings.DEBUG = False
+        django.setup()
+        from django.core.management import call_command
+        create_schema()
+        call_command('loaddata', os.path.join(settings.BASE_DIR, 'clusterbuster', 'data', FIXTURE), verbosity=0)
+    except Exception as error:
+        setup_error = error
+
+
+def create_game(player_count: int, rng_seed=None):
+    from lobbies.models import Lobby, Player
+    from .models import ClusterBuster
+    lobby = Lobby.objects.create()
+    for player_i in range(player_count):
+        lobby.join(Player.objects.create(name='bot %d' % (player_i,)))
+    game = ClusterBuster.objects.create(rng_seed=rng_seed)
+    game.setup(lobby=lobby)
+    game.start()
+    game.update()
+    return game
+
+
+def play_games(game_count: int, seed: int, player_count=4, accuracy=0.9) -> dict:
+    """
+    Plays games one after another in this worker.
+    :param game_count: int
+    :param seed: int seeding the bots and the games
+    :param player_count: int
+    :param accuracy: float
+    :return: dict of game durations, query counts, rounds and rule durations by rule
+    """
+    if setup_error is not None:
+        raise RuntimeError('The worker could not be set up: %r' % (setup_error,))
+    from django.db import connection
+    from games.signals import rule_evaluated
+    rng = random.Random(seed)
+    rule_durations = defaultdict(list)
+    query_count = [0]
+
+    def count_query(execute, sql, params, many, context):
+        query_count[0] += 1
+        return execute(sql, params, many, context)
+
+    def record_rule(rule, duration, **kwargs):
+        rule_durations[rule].append(duration)
+
+    rule_evaluated.connect(record_rule, dispatch_uid='core.simulation.record_rule')
+    results = {'game_durations': [], 'query_counts': [], 'rounds': [], 'rule_durations': rule_durations}
+    try:
+        with connection.execute_wrapper(count_query):
+            for game_i in range(game_count):
+                query_count[0] = 0
+                started = perf_counter()
+                game = create_game(player_count, rng.getrandbits(32))
+                rounds = GameBot(game, rng, accuracy).play()
+                results['game_durations'].append(perf_counter() - started)
+                results['query_counts'].append(query_count[0])
+                results['rounds'].append(rounds)
+    finally:
+        rule_evaluated.disconnect(dispatch_uid='core.simulation.record_rule')
+    results['rule_durations'] = dict(rule_durations)
+    return results
+
+
+def merge_results(results: list) -> dict:
+    merged = {'game_durations': [], 'query_counts': [], 'rounds': [], 'rule_durations': defaultdict(list)}
+    for result in results:
+        for key in ('game_durations', 'query_counts', 'rounds'):
+            merged[key].extend(result[key])
+        for rule, durations in result['rule_durations'].items():
+            merged['rule_durations'][rule].extend(durations)
+    merged['rule_durations'] = dict(merged['rule_durations'])
+    return merged
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import os
+import random
+import tempfile
 
-# Create your tests here.
+from django.test import Client
+
+from clusterbuster.mixins.benchmarks import BenchmarkTestCase
+from lobbies.models import Lobby, Player, Team
+
+from .benchmarks import OPERATIONS, ParameterBenchmark, find_regressions, load_baseline, save_baseline
+from .models import ClusterBuster
+from .simulation import GameBot
+
+MIN_TEAM_COUNT = 2
+PLAYERS_PER_TEAM = 2
+VIEW_TIME_BUDGET = 1.0
+RULE_TIME_BUDGET = 5.0
+
+# Query budgets by measurement for 2 to 6 teams, on SQLite. They leave a little room for the queries
+# that vary with the cards drawn, and should be lowered whenever a change saves queries.
+QUERY_BUDGETS = {
+    'game_over/game_detail/leader/cold': (251, 348, 445, 541, 638),
+    'game_over/game_detail/leader/warm': (56, 65, 73, 81, 90),
+    'game_over/game_detail/player/cold': (56, 65, 73, 81, 90),
+    'game_over/game_detail/player/warm': (56, 65, 73, 81, 90),
+    'lobby_detail': (6, 6, 6, 6, 6),
+    'round_1/game_detail/leader/cold': (80, 89, 97, 105, 114),
+    'round_1/game_detail/leader/warm': (63, 72, 80, 89, 97),
+    'round_1/game_detail/player/cold': (63, 72, 80, 89, 97),
+    'round_1/game_detail/player/warm': (63, 72, 80, 89, 97),
+    'round_1/leader_hints/get': (39, 39, 39, 39, 39),
+    'round_1/leader_hints/post': (87, 95, 103, 112, 120),
+    'round_1/player_guesses/get': (26, 26, 26, 26, 26),
+    'round_1/player_guesses/post': (71, 79, 88, 96, 104),
+    'round_1/rules/score_teams': (84, 113, 141, 170, 198),
+    'round_1/rules/start_next_round': (292, 392, 492, 592, 691),
+    'round_1/rules/submit_guesses': (171, 281, 414, 571, 750),
+    'round_1/rules/submit_hints': (261, 412, 586, 784, 1004),
+    'round_1/score_teams': (94, 122, 151, 179, 207),
+    'round_1/start_next_round': (302, 402, 501, 601, 701),
+    'round_8/game_detail/leader/cold': (257, 353, 450, 546, 643),
+    'round_8/game_detail/leader/warm': (63, 72, 80, 89, 97),
+    'round_8/game_detail/player/cold': (63, 72, 80, 89, 97),
+    'round_8/game_detail/player/warm': (63, 72, 80, 89, 97),
+    'round_8/leader_hints/get': (39, 39, 39, 39, 39),
+    'round_8/leader_hints/post': (83, 92, 100, 109, 117),
+    'round_8/player_guesses/get': (26, 26, 26, 26, 26),
+    'round_8/player_guesses/post': (69, 77, 84, 94, 102),
+    'round_8/player_guesses_opponents/get': (15, 15, 15, 15, 15),
+    'round_8/player_guesses_opponents/post': (72, 80, 89, 98, 105),
+    'round_8/rules/score_teams': (110, 188, 292, 422, 576),
+    'round_8/rules/start_next_round': (77, 86, 94, 102, 111),
+    'round_8/rules/submit_guesses': (330, 923, 2103, 4183, 7554),
+    'round_8/rules/submit_hints': (330, 620, 1002, 1477, 2044),
+    'round_8/score_teams': (119, 198, 302, 431, 585),
+    'round_8/start_next_round': (87, 95, 103, 112, 120),
+}
+
+
+class StallingBot(GameBot):
+    """
+    Stalling Bots guess their own codes right and every other team's code wrong,
+    so no team wins or loses before the last round.
+    """
+    def get_guesses(self, round_number: int, guessing_team, hinting_team) -> list:
+        code = self.get_code(round_number, hinting_team)
+        if hinting_team == guessing_team:
+            return code
+        return [number % self.game.SECRET_WORDS_PER_TEAM + 1 for number in code]
+
+
+class GameTable:
+    """
+    Game Tables are the browsers of a lobby's players, who joined it and started a game through the views.
+    """
+    def __init__(self, team_count: int, players_per_team=PLAYERS_PER_TEAM):
+        self.players = {}
+        host = self.add_player('player 0')
+        response = host.post('/new_lobby/', {})
+        self.lobby = Lobby.objects.get(code=response.url.rstrip('/').split('/')[-1])
+        self.lobby.teams.add(*[Team.objects.create(name=Lobby.DEFAULT_TEAM_NAMES[team_i])
+                               for team_i in range(Lobby.DEFAULT_TEAM_COUNT, team_count)])
+        for player_i in range(1, team_count * players_per_team):
+            self.add_player('player %d' % (player_i,)).get('/lobbies/%s/join/' % (self.lobby.code,))
+        host.get('/lobbies/%s/start_cluster_buster/' % (self.lobby.code,))
+        self.lobby.refresh_from_db()
+        self.game_code = self.lobby.current_activity.link.rstrip('/').split('/')[-1]
+
+    def add_player(self, name: str) -> Client:
+        client = Client()
+        client.post('/new_player/', {'name': name})
+        self.players[client.session['player_id']] = client
+        return client
+
+    def get_game(self) -> ClusterBuster:
+        return ClusterBuster.objects.get(code=self.game_code)
+
+    def get_path(self, route=None) -> str:
+        if route is None:
+            return '/games/%s/' % (self.game_code,)
+        return '/games/%s/%s/' % (self.game_code, route)
+
+    def get_leader(self, game: ClusterBuster, team: Team) -> Client:
+        round_number = game.get_value('current_round_number')
+        leader = game.get_value(('round', round_number, 'team', team, 'leader'))  # type: Player
+        return self.players[leader.pk]
+
+    def get_guesser(self, game: ClusterBuster, team: Team) -> Client:
+        leader = self.get_leader(game, team)
+        for player in team.players.all():
+            if self.players[player.pk] is not leader:
+                return self.players[player.pk]
+        raise Exception('Team %s has no player besides its leader.' % (team,))
+
+
+class GameBenchmarks:
+    """
+    Game Benchmarks play a game to round 1, to round 8 and to its end for a number of teams,
+    then hold the views and rule methods of each stage to their budgets.
+    """
+    TEAM_COUNT = None
+    STAGES = {'round_1': 0, 'round_8': 7, 'game_over': 8}
+
+    @classmethod
+    def setUpTestData(cls):
+        super(GameBenchmarks, cls).setUpTestData()
+        cls.tables = {}
+        for stage, rounds in cls.STAGES.items():
+            table = GameTable(cls.TEAM_COUNT)
+            bot = StallingBot(table.get_game(), random.Random(rounds))
+            for round_i in range(rounds):
+                bot.play_round()
+            cls.tables[stage] = table
+
+    def assertBudget(self, name: str, stage=None, seconds=VIEW_TIME_BUDGET):
+        if stage is not None:
+            name = '%s/%s' % (stage, name)
+        queries = QUERY_BUDGETS[name][self.TEAM_COUNT - MIN_TEAM_COUNT]
+        return super(GameBenchmarks, self).assertBudget('core/%d_teams/%s' % (self.TEAM_COUNT, name), queries,
+                                                        seconds)
+
+    def assertPage(self, response, status_code=200):
+        self.assertEqual(response.status_code, status_code, response.content[:2000])
+
+    def test_game_stages(self):
+        for stage in self.STAGES:
+            game = self.tables[stage].get_game()
+            self.assertEqual(game.is_over(), stage == 'game_over', stage)
+            if stage != 'game_over':
+                self.assertEqual(game.get_value('current_round_number'), self.STAGES[stage] + 1, stage)
+
+    def test_lobby_detail(self):
+        table = self.tables['round_1']
+        host = table.players[table.lobby.players.order_by('pk').first().pk]
+        with self.assertBudget('lobby_detail'):
+            response = host.get('/lobbies/%s/' % (table.lobby.code,))
+        self.assertPage(response)
+
+    def test_game_detail(self):
+        for stage, table in self.tables.items():
+            game = table.get_game()
+            team = game.get_roster().teams[0]
+            clients = {'leader': table.get_leader(game, team), 'player': table.get_guesser(game, team)}
+            for role, client in clients.items():
+                with self.assertBudget('game_detail/%s/cold' % (role,), stage):
+                    response = client.get(table.get_path())
+                self.assertPage(response)
+                with self.assertBudget('game_detail/%s/warm' % (role,), stage):
+                    response = client.get(table.get_path())
+                self.assertPage(response)
+
+    def test_leader_hints(self):
+        for stage in ('round_1', 'round_8'):
+            table = self.tables[stage]
+            game = table.get_game()
+            leader = table.get_leader(game, game.get_roster().teams[0])
+            with self.assertBudget('leader_hints/get', stage):
+                response = leader.get(table.get_path('leader_hints'))
+            self.assertPage(response)
+            with self.assertBudget('leader_hints/post', stage):
+                response = leader.post(table.get_path('leader_hints'),
+                                       {'hint_1': 'one', 'hint_2': 'two', 'hint_3': 'three'})
+            self.assertPage(response, 302)
+
+    def test_player_guesses(self):
+        for stage in ('round_1', 'round_8'):
+            table = self.tables[stage]
+            game = table.get_game()
+            round_number = game.get_value('current_round_number')
+            bot = StallingBot(game, random.Random(round_number))
+            bot.make_hints(round_number)
+            teams = game.get_roster().teams
+            guesser = table.get_guesser(game, teams[0])
+            routes = [('player_guesses', teams[0])]
+            if stage != 'round_1':
+                routes.append(('player_guesses_opponents', teams[1]))
+            for route, hinting_team in routes:
+                guesses = bot.get_guesses(round_number, teams[0], hinting_team)
+                with self.assertBudget('%s/get' % (route,), stage):
+                    response = guesser.get(table.get_path(route))
+                self.assertPage(response)
+                with self.assertBudget('%s/post' % (route,), stage):
+                    response = guesser.post(table.get_path(route), {
+                        'guess_%d' % (card_i + 1,): number for card_i, number in enumerate(guesses)})
+                self.assertPage(response, 302)
+
+    def test_score_teams_and_start_next_round(self):
+        for stage in ('round_1', 'round_8'):
+            table = self.tables[stage]
+            game = table.get_game()
+            round_number = game.get_value('current_round_number')
+            bot = StallingBot(game, random.Random(round_number))
+            bot.make_hints(round_number)
+            bot.make_guesses(round_number)
+            leader = table.get_leader(game, game.get_roster().teams[0])
+            with self.assertBudget('score_teams', stage):
+                response = leader.get(table.get_path('score_teams'))
+            self.assertPage(response, 302)
+            with self.assertBudget('start_next_round', stage):
+                response = leader.get(table.get_path('start_next_round'))
+            self.assertPage(response, 302)
+            self.assertEqual(table.get_game().is_over(), stage == 'round_8', stage)
+
+    def test_rule_methods(self):
+        for stage in ('round_1', 'round_8'):
+            game = self.tables[stage].get_game()
+            round_number = game.get_value('current_round_number')
+            bot = StallingBot(game, random.Random(round_number))
+            with self.assertBudget('rules/submit_hints', stage, RULE_TIME_BUDGET):
+                bot.make_hints(round_number)
+            with self.assertBudget('rules/submit_guesses', stage, RULE_TIME_BUDGET):
+                bot.make_guesses(round_number)
+            with self.assertBudget('rules/score_teams', stage, RULE_TIME_BUDGET):
+                game.score_teams()
+                game.update()
+            with self.assertBudget('rules/start_next_round', stage, RULE_TIME_BUDGET):
+                game.start_next_round()
+                game.update()
+            self.assertEqual(game.is_over(), stage == 'round_8', stage)
+
+
+class TwoTeamGameBenchmarks(GameBenchmarks, BenchmarkTestCase):
+    TEAM_COUNT = 2
+
+
+class ThreeTeamGameBenchmarks(GameBenchmarks, BenchmarkTestCase):
+    TEAM_COUNT = 3
+
+
+class FourTeamGameBenchmarks(GameBenchmarks, BenchmarkTestCase):
+    TEAM_COUNT = 4
+
+
+class FiveTeamGameBenchmarks(GameBenchmarks, BenchmarkTestCase):
+    TEAM_COUNT = 5
+
+
+class SixTeamGameBenchmarks(GameBenchmarks, BenchmarkTestCase):
+    TEAM_COUNT = 6
+
+
+class ParameterBenchmarkTests(BenchmarkTestCase):
+    def test_run(self):
+        results = ParameterBenchmark(100, 3, random.Random(0)).run()
+        self.assertEqual(sorted(results), sorted(OPERATIONS))
+        for result in results.values():
+            self.assertEqual(result['calls'], 3)
+            self.assertGreater(result['median'], 0)
+
+    def test_baseline(self):
+        results = {'sqlite/100/get_value': {'median': 0.002, 'p95': 0.003, 'calls': 3},
+                   'sqlite/100/set_value': {'median': 0.001, 'p95': 0.001, 'calls': 3}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            self.assertEqual(load_baseline(path), {})
+            save_baseline(path, {'sqlite/100/get_value': {'median': 0.001, 'p95': 0.001, 'calls': 3}})
+            save_baseline(path, {'postgresql/100/get_value': {'median': 0.003, 'p95': 0.004, 'calls': 3}})
+            baseline = load_baseline(path)
+        self.assertEqual(len(baseline), 2)
+        self.assertEqual(find_regressions(results, baseline, 0.5), [('sqlite/100/get_value', 0.001, 0.002)])
+        self.assertEqual(find_regressions(results, baseline, 1.5), [])
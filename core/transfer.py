@@ -0,0 +1,315 @@
+import gzip
+import json
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from clusterbuster.mixins import compress_json
+from games.codecs import ValueCodec
+from games.models import GameTemplate, TriggerTemplate, ParameterUpdate, CompactParameterUpdate, \
+    ParameterCheckpoint
+from lobbies.models import Player, Team
+
+from . import registries
+from .models import ClusterBuster, CodeCard, Deck, State
+
+__all__ = ['GameExporter', 'GameImporter', 'export_games', 'import_games']
+
+FORMAT_VERSION = 1
+HEADER = 'h'
+KEY = 'k'
+GAME = 'g'
+ROSTER = 'r'
+DECK = 'd'
+PARAMETER = 'p'
+TRIGGER = 't'
+UPDATE = 'u'
+CHECKPOINT = 'cp'
+END = 'e'
+
+REFERENCE_PREFIX = 'r' + ValueCodec.SEPARATOR
+TEAM_REFERENCE = 'team'
+PLAYER_REFERENCE = 'player'
+DECK_REFERENCE = 'deck'
+STATE_REFERENCE = 'state'
+CODE_CARD_REFERENCE = 'codecard'
+
+
+def get_code_card_label(card: CodeCard) -> str:
+    return "%d-%d-%d" % (card.number_1, card.number_2, card.number_3)
+
+
+class GameExporter:
+    """
+    Game Exporters write Cluster Buster games as JSON lines, one record per line.
+    Parameter keys are written once per file and referred to by number after that.
+    Values are encoded like the Value Codec does, except references, which are written so that another
+    database can resolve them: teams, players and decks by their position in the game's records,
+    states by slug and code cards by their numbers.
+    """
+    def __init__(self, stream):
+        """
+        :param stream: text stream to write to
+        """
+        self.stream = stream
+        self.keys = {}
+        self.references = {}
+        self.write({'t': HEADER, 'version': FORMAT_VERSION})
+
+    def write(self, record: dict):
+        self.stream.write(json.dumps(record, separators=(',', ':')))
+        self.stream.write('\n')
+
+    def get_key_id(self, key: str) -> int:
+        key_id = self.keys.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self.keys[key] = key_id
+            self.write({'t': KEY, 'i': key_id, 'k': key})
+        return key_id
+
+    def to_portable(self, encoded: str) -> str:
+        reference = ValueCodec.decode_reference(encoded)
+        if reference is None:
+            return encoded
+        portable = self.references.get(reference)
+        if portable is None:
+            raise ValueError('%s can not be exported, it is not part of the game.' % (encoded,))
+        return portable
+
+    def __set_references(self, game: ClusterBuster, decks: list):
+        self.references = {}
+        for state in registries.states.all():
+            self.references[(State, state.pk)] = REFERENCE_PREFIX + STATE_REFERENCE + ValueCodec.SEPARATOR + state.slug
+        for card in registries.code_cards.all():
+            self.references[(CodeCard, card.pk)] = REFERENCE_PREFIX + CODE_CARD_REFERENCE + ValueCodec.SEPARATOR + \
+                get_code_card_label(card)
+        for deck_i, deck in enumerate(decks):
+            self.references[(Deck, deck.pk)] = REFERENCE_PREFIX + DECK_REFERENCE + ValueCodec.SEPARATOR + str(deck_i)
+
+    def write_roster(self, game: ClusterBuster):
+        players = list(game.players.all())
+        player_indexes = {}
+        for player_i, player in enumerate(players):
+            player_indexes[player.pk] = player_i
+            self.references[(Player, player.pk)] = \
+                REFERENCE_PREFIX + PLAYER_REFERENCE + ValueCodec.SEPARATOR + str(player_i)
+        teams = []
+        for team_i, team in enumerate(game.teams.prefetch_related('players')):
+            self.references[(Team, team.pk)] = REFERENCE_PREFIX + TEAM_REFERENCE + ValueCodec.SEPARATOR + str(team_i)
+            teams.append([team.name, [player_indexes[player.pk] for player in team.players.all()
+                                      if player.pk in player_indexes]])
+        self.write({'t': ROSTER, 'players': [player.name for player in players], 'teams': teams})
+
+    def write_game(self, game: ClusterBuster):
+        """
+        Writes the game's roster, decks, parameters, triggers, update history and checkpoints.
+        Inherited default parameters are not written; the importing database supplies its own.
+        :param game: ClusterBuster
+        :return: None
+        """
+        dictionary = game.parameters
+        parameters = list(dictionary.parameters.prefetch_related('value'))
+        decks = [parameter.value for parameter in parameters if isinstance(parameter.value, Deck)]
+        self.__set_references(game, decks)
+        self.write({'t': GAME, 'code': game.code, 'state_version': game.state_version, 'rng_seed': game.rng_seed,
+                    'created': game.created.isoformat() if game.created else None,
+                    'updated': game.updated.isoformat() if game.updated else None})
+        self.write_roster(game)
+        deck_cards = {deck.pk: [] for deck in decks}
+        for membership in Deck.cards.through.objects.filter(deck__in=decks).order_by('pk'):
+            deck_cards[membership.deck_id].append(membership.codecard_id)
+        code_card_labels = {card.pk: get_code_card_label(card) for card in registries.code_cards.all()}
+        for deck in decks:
+            self.write({'t': DECK, 'cards': [code_card_labels[card_pk] for card_pk in deck_cards[deck.pk]]})
+        for parameter in parameters:
+            self.write({'t': PARAMETER, 'k': self.get_key_id(parameter.key),
+                        'v': self.to_portable(ValueCodec.encode(parameter.value))})
+        triggers = game.triggers.select_related('condition_group').prefetch_related(
+            'condition_group__conditions__parameter_1', 'condition_group__conditions__parameter_2')
+        for trigger in triggers.order_by('pk'):
+            conditions = []
+            for condition in trigger.condition_group.conditions.all():
+                key_2 = self.get_key_id(condition.parameter_2.key) if condition.parameter_2 else None
+                conditions.append([condition.condition_type, self.get_key_id(condition.parameter_1.key), key_2,
+                                   condition.comparison_type])
+            self.write({'t': TRIGGER, 'rule': game.strip_game_slug(trigger.rule), 'active': trigger.active,
+                        'repeats': trigger.repeats, 'count': trigger.trigger_count,
+                        'op': trigger.condition_group.boolean_op, 'conditions': conditions})
+        self.write_history(dictionary)
+        for checkpoint in dictionary.checkpoints.order_by('created', 'pk'):
+            state = {str(self.get_key_id(key)): self.to_portable(encoded)
+                     for key, encoded in checkpoint.get_encoded_state().items()}
+            self.write({'t': CHECKPOINT, 'label': checkpoint.label, 'round': checkpoint.round_number,
+                        'at': checkpoint.created.isoformat(), 'state': state})
+        self.write({'t': END})
+
+    def write_history(self, dictionary):
+        changes = []
+        updates = ParameterUpdate.objects.filter(parameter__dictionary=dictionary).select_related(
+            'parameter').prefetch_related('old_value', 'new_value')
+        for update in updates:
+            changes.append((update.created, update.parameter.key, ValueCodec.encode(update.old_value),
+                            ValueCodec.encode(update.new_value)))
+        for update in dictionary.compact_updates.select_related('parameter'):
+            changes.append((update.created, update.parameter.key, update.old_value, update.new_value))
+        changes.sort(key=lambda change: change[0])
+        for created, key, old_value, new_value in changes:
+            self.write({'t': UPDATE, 'k': self.get_key_id(key), 'o': self.to_portable(old_value),
+                        'n': self.to_portable(new_value), 'at': created.isoformat()})
+
+
+class GameImporter:
+    """
+    Game Importers rebuild the games written by a Game Exporter, one game at a time with bulk inserts.
+    Teams and players are created anew without sessions, and games are not attached to a lobby.
+    A game keeps its code unless the code is taken, in which case it gets a new one.
+    """
+    def __init__(self, stream):
+        """
+        :param stream: text stream to read from
+        """
+        self.stream = stream
+        self.keys = {}
+
+    def read_games(self):
+        """
+        Imports the games of the stream, yielding each game once it is saved.
+        :return: generator of ClusterBuster
+        """
+        records = []
+        for line in self.stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record_type = record['t']
+            if record_type == HEADER:
+                if record['version'] != FORMAT_VERSION:
+                    raise ValueError('Unsupported export version %s.' % (record['version'],))
+            elif record_type == KEY:
+                self.keys[record['i']] = record['k']
+            elif record_type == END:
+                yield self.import_game(records)
+                records = []
+            else:
+                records.append(record)
+
+    @staticmethod
+    def __get_timestamp(value):
+        return parse_datetime(value) if value else None
+
+    def import_game(self, records: list) -> ClusterBuster:
+        with transaction.atomic():
+            return self.__import_game(records)
+
+    def __import_game(self, records: list) -> ClusterBuster:
+        game_record = records[0]
+        roster_record = records[1]
+        players = [Player.objects.create(name=name) for name in roster_record['players']]
+        teams = []
+        for name, player_indexes in roster_record['teams']:
+            team = Team.objects.create(name=name)
+            team.players.set([players[player_i] for player_i in player_indexes])
+            teams.append(team)
+        code = game_record['code']
+        if ClusterBuster.objects.filter(code=code).exists():
+            code = ClusterBuster.allocate_code()
+        game = ClusterBuster.objects.create(code=code, state_version=game_record['state_version'],
+                                            rng_seed=game_record.get('rng_seed'))
+        game.setup()
+        game.players.set(players)
+        game.teams.set(teams)
+        game.created = self.__get_timestamp(game_record['created'])
+        game.updated = self.__get_timestamp(game_record['updated'])
+        ClusterBuster.objects.filter(pk=game.pk).update(created=game.created, updated=game.updated)
+        code_cards = {get_code_card_label(card): card for card in registries.code_cards.all()}
+        decks = []
+        deck_cards = []
+        references = {}
+        for record in records:
+            if record['t'] != DECK:
+                continue
+            deck = Deck.objects.create()
+            deck_cards.extend(Deck.cards.through(deck=deck, codecard=code_cards[label]) for label in record['cards'])
+            decks.append(deck)
+        Deck.cards.through.objects.bulk_create(deck_cards)
+        references[TEAM_REFERENCE] = lambda index: teams[int(index)]
+        references[PLAYER_REFERENCE] = lambda index: players[int(index)]
+        references[DECK_REFERENCE] = lambda index: decks[int(index)]
+        references[STATE_REFERENCE] = lambda slug: ClusterBuster.get_state(slug)
+        references[CODE_CARD_REFERENCE] = lambda label: code_cards[label]
+
+        def decode(portable: str):
+            if portable.startswith(REFERENCE_PREFIX):
+                prefix, kind, reference = portable.split(ValueCodec.SEPARATOR, 2)
+                return references[kind](reference)
+            return ValueCodec.decode(portable)
+
+        def to_encoded(portable: str) -> str:
+            if portable.startswith(REFERENCE_PREFIX):
+                return ValueCodec.encode(decode(portable))
+            return portable
+
+        values = []
+        keys = []
+        triggers = []
+        for record in records:
+            if record['t'] == PARAMETER:
+                values.append((self.keys[record['k']], decode(record['v'])))
+            elif record['t'] == TRIGGER:
+                trigger = TriggerTemplate(record['rule'], record['repeats'], record['active'], record['count'])
+                trigger.boolean_op = record['op']
+                conditions = []
+                for condition_type, key_1, key_2, comparison_type in record['conditions']:
+                    key_1 = self.keys[key_1]
+                    key_2 = self.keys[key_2] if key_2 is not None else None
+                    keys.extend(key for key in (key_1, key_2) if key is not None)
+                    conditions.append((condition_type, key_1, key_2, comparison_type))
+                triggers.append((trigger, conditions))
+            elif record['t'] == UPDATE:
+                keys.append(self.keys[record['k']])
+        parameters = game.parameters.bulk_set_values(values, keys, record=False)
+        GameTemplate.create_triggers(game, triggers, parameters)
+        compact_updates = []
+        checkpoints = []
+        for record in records:
+            if record['t'] == UPDATE:
+                compact_updates.append(CompactParameterUpdate(
+                    dictionary=game.parameters, parameter=parameters[self.keys[record['k']]],
+                    old_value=to_encoded(record['o']), new_value=to_encoded(record['n']),
+                    created=self.__get_timestamp(record['at'])))
+            elif record['t'] == CHECKPOINT:
+                state = {self.keys[int(key_id)]: to_encoded(portable) for key_id, portable in record['state'].items()}
+                checkpoint = ParameterCheckpoint(dictionary=game.parameters, label=record['label'],
+                                                 round_number=record['round'], data=compress_json(state))
+                checkpoint.stamp(self.__get_timestamp(record['at']))
+                checkpoints.append(checkpoint)
+        CompactParameterUpdate.objects.bulk_create(compact_updates)
+        ParameterCheckpoint.objects.bulk_create(checkpoints)
+        return game
+
+
+def export_games(path: str, games) -> int:
+    """
+    Writes the games to a gzip compressed JSON lines file.
+    :param path: str
+    :param games: iterable of ClusterBuster
+    :return: int number of games written
+    """
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as stream:
+        exporter = GameExporter(stream)
+        for game in games:
+            exporter.write_game(game)
+            count += 1
+    return count
+
+
+def import_games(path: str) -> list:
+    """
+    Imports the games of a file written by `export_games`.
+    :param path: str
+    :return: list of ClusterBuster
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as stream:
+        return list(GameImporter(stream).read_games())
@@ -1,8 +1,12 @@
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, reverse
+from django.utils.functional import SimpleLazyObject
 from django.views import generic
 
 from lobbies.views.mixins import CheckPlayerView
 from lobbies.models import Lobby, Player, Team
+from games.models import ArchivedGame
 
 from ..models import State, ClusterBuster
 from .forms import LeaderHintsForm, PlayerGuessForm
@@ -35,6 +39,12 @@ class UpdateGame(generic.RedirectView, generic.detail.SingleObjectMixin):
 
 
 class GameViewAbstract(CheckPlayerView):
+    # Archived games are read only, so only views that change nothing may show them.
+    allows_read_only = False
+    # Views that bring the game up to date do it before reading anything, so the page and the
+    # state version its fragments are cached under agree.
+    updates_game = False
+
     class Meta:
         abstract = True
 
@@ -44,35 +54,54 @@ class GameViewAbstract(CheckPlayerView):
         self.team = None
         self.opponent_team = None
         self.round_number = 0
+        self.round_team_leader = None
         super().__init__()
 
     def dispatch(self, request, *args, **kwargs):
-        self.game = get_object_or_404(ClusterBuster, code=kwargs['slug'])
+        self.game = self.get_game(kwargs['slug'])
+        if self.game.read_only and not self.allows_read_only:
+            return redirect('game_detail', slug=self.game.code)
+        if self.updates_game:
+            self.game.update()
         self.player = self.get_current_player()
         if self.player is None:
-            return redirect('lobby_detail', slug=self.game.lobby.code)
+            return self.redirect_to_lobby()
         self.team = self.get_current_player_team()
         if self.team is None:
-            return redirect('lobby_detail', slug=self.game.lobby.code)
+            return self.redirect_to_lobby()
         self.opponent_team = self.get_current_player_opponent_team()
         if self.opponent_team is None:
-            return redirect('lobby_detail', slug=self.game.lobby.code)
+            return self.redirect_to_lobby()
         self.round_number = self.game.get_value('current_round_number')
         return super().dispatch(request, *args, **kwargs)
 
+    def redirect_to_lobby(self):
+        if self.game.lobby is None:
+            raise Http404('The lobby of the game no longer exists.')
+        return redirect('lobby_detail', slug=self.game.lobby.code)
+
+    @staticmethod
+    def get_game(code: str):
+        """
+        Returns the game with the code, rehydrated from the archive if it was archived.
+        :param code: str
+        :raise: Http404
+        :return: ClusterBuster
+        """
+        try:
+            return ClusterBuster.objects.get(code=code)
+        except ClusterBuster.DoesNotExist:
+            pass
+        game = ArchivedGame.rehydrate_by_code(code)
+        if game is None:
+            raise Http404('No game matches the code.')
+        return game
+
     def get_current_player_team(self):
-        teams = self.game.teams.all()
-        for team in teams:
-            if team.has_player(self.player):
-                return team
-        return None
+        return self.game.get_roster().get_team(self.player)
 
     def get_current_player_opponent_team(self):
-        teams = self.game.teams.all()
-        for team in teams:
-            if not team.has_player(self.player):
-                return team
-        return None
+        return self.game.get_roster().get_opponent_team(self.player)
 
     def get_secret_words_data(self):
         secret_words = []
@@ -104,9 +133,10 @@ class GameViewAbstract(CheckPlayerView):
         fsm2 = self.game.get_value('fsm2')  # type: State
         is_first_round = fsm2.slug == 'first_round'
         guesses = {}
-        for guessing_team in self.game.teams.all():  # type: Team
+        teams = self.game.get_roster().teams
+        for guessing_team in teams:  # type: Team
             guesses[guessing_team.name] = {}
-            for hinting_team in self.game.teams.all():  # type: Team
+            for hinting_team in teams:  # type: Team
                 if guessing_team != hinting_team and is_first_round:
                     continue
                 guesses[guessing_team.name][hinting_team.name] = []
@@ -126,7 +156,7 @@ class GameViewAbstract(CheckPlayerView):
 
     def get_round_hints_data(self):
         hints = {}
-        for team in self.game.teams.all():  # type: Team
+        for team in self.game.get_roster().teams:  # type: Team
             hints[team.name] = []
             for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
                 hint_number = card_i + 1
@@ -140,7 +170,7 @@ class GameViewAbstract(CheckPlayerView):
     def get_game_logs_data(self):
         game_logs = {}
         last_round_number = self.round_number - 1
-        for team in self.game.teams.all():  # type: Team
+        for team in self.game.get_roster().teams:  # type: Team
             game_logs[team.name] = {}
             rounds = []
             words = ["?"] * ClusterBuster.SECRET_WORDS_PER_TEAM
@@ -169,8 +199,9 @@ class GameViewAbstract(CheckPlayerView):
     def is_round_team_leader(self):
         if self.player is None or self.team is None:
             return False
-        round_team_leader = self.game.get_value(('round', self.round_number, 'team', self.team, 'leader'))
-        return round_team_leader == self.player
+        if self.round_team_leader is None:
+            self.round_team_leader = self.game.get_value(('round', self.round_number, 'team', self.team, 'leader'))
+        return self.round_team_leader == self.player
 
 
 class GameDetail(generic.DetailView, GameViewAbstract):
@@ -178,11 +209,11 @@ class GameDetail(generic.DetailView, GameViewAbstract):
     context_object_name = 'game'
     slug_field = 'code'
     template_name = 'core/game_detail.html'
+    allows_read_only = True
+    updates_game = True
 
-    def dispatch(self, request, *args, **kwargs):
-        response = super().dispatch(request, *args, **kwargs)
-        self.game.update()
-        return response
+    def get_object(self, queryset=None):
+        return self.game
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
@@ -197,11 +228,10 @@ class GameDetail(generic.DetailView, GameViewAbstract):
         losing_team = None
         round_hints = []
         round_guesses = []
-        fsm0 = self.game.get_value('fsm0')  # type: State
-        is_game_over = fsm0.slug == 'game_over'
+        is_game_over = self.game.is_over()
         if is_game_over:
-            winning_team = self.game.get_value('game_winning_team')
-            losing_team = self.game.get_value('game_losing_team')
+            winning_team = SimpleLazyObject(lambda: self.game.get_value('game_winning_team'))
+            losing_team = SimpleLazyObject(lambda: self.game.get_value('game_losing_team'))
         else:
             fsm2 = self.game.get_value('fsm2')  # type: State
             is_first_round = fsm2.slug == 'first_round'
@@ -233,14 +263,19 @@ class GameDetail(generic.DetailView, GameViewAbstract):
         data['show_guesses_information'] = show_guesses_information
         data['show_score_teams_link'] = show_score_teams_link
         data['secret_words'] = self.get_secret_words_data()
-        data['game_logs'] = self.get_game_logs_data()
+        # Only evaluated when the cached template fragments that use them are missing.
+        data['game_logs'] = SimpleLazyObject(self.get_game_logs_data)
         data['round_number'] = self.round_number
         data['round_hints'] = round_hints
         data['round_guesses'] = round_guesses
         data['is_round_leader'] = self.is_round_team_leader()
-        data['tokens'] = self.get_tokens_data()
+        data['tokens'] = SimpleLazyObject(self.get_tokens_data)
+        data['player_team'] = self.team
+        data['state_version'] = self.game.state_version
+        data['fragment_cache_timeout'] = None if is_game_over else settings.GAME_FRAGMENT_CACHE_TIMEOUT
         fsm3 = self.game.get_value('fsm3')
         data['round_stage'] = fsm3.name
+        data['roster'] = self.game.get_roster()
         return data
 
 
@@ -299,12 +334,7 @@ class LeaderHintsFormView(GameFormAbstractView):
 
     def form_valid(self, form):
         hints = [form.cleaned_data['hint_1'], form.cleaned_data['hint_2'], form.cleaned_data['hint_3']]
-        for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
-            self.game.set_value(
-                ('round', self.round_number, 'team', self.team, 'hint', card_i + 1),
-                hints[card_i]
-            )
-        self.game.update()
+        self.game.submit_hints(self.round_number, self.team, hints)
         return super().form_valid(form)
 
 
@@ -340,14 +370,7 @@ class PlayerGuessesFormView(GameFormAbstractView):
 
     def form_valid(self, form):
         guesses = [form.cleaned_data['guess_1'], form.cleaned_data['guess_2'], form.cleaned_data['guess_3']]
-        for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
-            self.game.set_value(
-                (
-                    'round', self.round_number, 'guessing_team', self.team, 'hinting_team', self.team, 'guess',
-                    card_i + 1),
-                guesses[card_i]
-            )
-        self.game.update()
+        self.game.submit_guesses(self.round_number, self.team, self.team, guesses)
         return super().form_valid(form)
 
 
@@ -375,14 +398,7 @@ class PlayerGuessesOpponentHintsFormView(GameFormAbstractView):
 
     def form_valid(self, form):
         guesses = [form.cleaned_data['guess_1'], form.cleaned_data['guess_2'], form.cleaned_data['guess_3']]
-        for card_i in range(ClusterBuster.CODE_CARD_SLOTS):
-            self.game.set_value(
-                (
-                    'round', self.round_number, 'guessing_team', self.team, 'hinting_team', self.opponent_team, 'guess',
-                    card_i + 1),
-                guesses[card_i]
-            )
-        self.game.update()
+        self.game.submit_guesses(self.round_number, self.team, self.opponent_team, guesses)
         return super().form_valid(form)
 
 
@@ -402,10 +418,8 @@ class StartNextRound(generic.RedirectView, generic.detail.SingleObjectMixin, Gam
         return response
 
     def get_redirect_url(self, *args, **kwargs):
-        game = get_object_or_404(ClusterBuster, code=kwargs['slug'])
-        game.start_next_round()
-        game.update()
-
+        self.game.start_next_round()
+        self.game.update()
         return super().get_redirect_url(*args, **kwargs)
 
 
@@ -425,7 +439,6 @@ class ScoreTeams(generic.RedirectView, generic.detail.SingleObjectMixin, GameVie
         return response
 
     def get_redirect_url(self, *args, **kwargs):
-        game = get_object_or_404(ClusterBuster, code=kwargs['slug'])
-        game.score_teams()
-        game.update()
+        self.game.score_teams()
+        self.game.update()
         return super().get_redirect_url(*args, **kwargs)
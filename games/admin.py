@@ -6,6 +6,10 @@ admin.site.register(Condition)
 admin.site.register(ConditionGroup)
 admin.site.register(Parameter)
 admin.site.register(ParameterUpdate)
+admin.site.register(CompactParameterUpdate)
+admin.site.register(ParameterHistory)
+admin.site.register(ParameterCheckpoint)
+admin.site.register(ArchivedGame)
 admin.site.register(Trigger)
 admin.site.register(Game)
 admin.site.register(IntegerValue)
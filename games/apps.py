@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class GameConfig(AppConfig):
     name = 'games'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from .audit import flush_audit_log
+        request_finished.connect(flush_audit_log, dispatch_uid='games.audit.flush_audit_log')
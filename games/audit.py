@@ -0,0 +1,170 @@
+import threading
+from collections import deque, namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .codecs import ValueCodec
+
+__all__ = ['AuditEntry', 'AuditLog', 'NullAuditLog', 'FullAuditLog', 'MemoryAuditLog', 'CompactAuditLog',
+           'get_audit_log', 'flush_audit_log']
+
+AuditEntry = namedtuple('AuditEntry', ['dictionary_id', 'key', 'old_value', 'new_value', 'created'])
+
+
+class AuditLog:
+    """
+    Audit Logs record parameter changes. `PARAMETER_AUDIT_LOG` picks which one is used.
+    Models are looked up when used, since the parameter models record through this module.
+    """
+    def record(self, parameter, old_value, new_value):
+        self.record_many([(parameter, old_value, new_value)])
+
+    def record_many(self, updates: list):
+        """
+        Records (parameter, old value, new value) changes. Parameters must be saved.
+        :param updates: list
+        :return: None
+        """
+        raise NotImplementedError('AuditLog subclasses must override record_many()')
+
+    def flush(self):
+        pass
+
+
+class NullAuditLog(AuditLog):
+    """
+    Keeps no history.
+    """
+    def record_many(self, updates: list):
+        pass
+
+
+class FullAuditLog(AuditLog):
+    """
+    Saves a Parameter Update row per change, pointing at the old and new value rows.
+    """
+    def record(self, parameter, old_value, new_value):
+        # A plain insert, since bulk_create opens a transaction around even a single row.
+        ParameterUpdate = apps.get_model('games', 'ParameterUpdate')
+        ParameterUpdate.objects.create(parameter=parameter, old_value=old_value, new_value=new_value)
+
+    def record_many(self, updates: list):
+        ParameterUpdate = apps.get_model('games', 'ParameterUpdate')
+        _now = now()
+        parameter_updates = []
+        for parameter, old_value, new_value in updates:
+            parameter_update = ParameterUpdate(parameter=parameter, old_value=old_value, new_value=new_value)
+            parameter_update.stamp(_now)
+            parameter_updates.append(parameter_update)
+        ParameterUpdate.objects.bulk_create(parameter_updates)
+
+
+class MemoryAuditLog(AuditLog):
+    """
+    Keeps the latest changes of this process in memory, for debugging. Nothing is written to the database.
+    """
+    def __init__(self, size: int):
+        self.entries = deque(maxlen=size)
+
+    def record_many(self, updates: list):
+        _now = now()
+        for parameter, old_value, new_value in updates:
+            self.entries.append(AuditEntry(parameter.dictionary_id, parameter.key, ValueCodec.encode(old_value),
+                                           ValueCodec.encode(new_value), _now))
+
+    def get_entries(self, dictionary_id=None) -> list:
+        """
+        Returns the kept changes, oldest first, optionally only those of a dictionary.
+        :param dictionary_id: Optional[int]
+        :return: list of AuditEntry
+        """
+        entries = list(self.entries)
+        if dictionary_id is None:
+            return entries
+        return [entry for entry in entries if entry.dictionary_id == dictionary_id]
+
+
+class CompactAuditLog(AuditLog):
+    """
+    Buffers changes as Compact Parameter Updates and inserts them in batches,
+    when a game finishes updating, at the end of each request, or when the buffer is full.
+    Changes made inside a transaction join the buffer when it commits, and are dropped if it rolls back.
+    """
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.local = threading.local()
+
+    @property
+    def buffer(self) -> list:
+        if not hasattr(self.local, 'buffer'):
+            self.local.buffer = []
+        return self.local.buffer
+
+    def record_many(self, updates: list):
+        CompactParameterUpdate = apps.get_model('games', 'CompactParameterUpdate')
+        _now = now()
+        compact_updates = [
+            CompactParameterUpdate(dictionary_id=parameter.dictionary_id, parameter=parameter,
+                                   old_value=ValueCodec.encode(old_value), new_value=ValueCodec.encode(new_value),
+                                   created=_now)
+            for parameter, old_value, new_value in updates
+        ]
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self.__buffer(compact_updates))
+        else:
+            self.__buffer(compact_updates)
+
+    def __buffer(self, compact_updates: list):
+        self.buffer.extend(compact_updates)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        buffer = self.buffer
+        if not buffer:
+            return
+        self.local.buffer = []
+        CompactParameterUpdate = apps.get_model('games', 'CompactParameterUpdate')
+        CompactParameterUpdate.objects.bulk_create(buffer, batch_size=self.batch_size)
+
+
+AUDIT_LOG_MODES = {
+    'off': lambda: NullAuditLog(),
+    'full': lambda: FullAuditLog(),
+    'memory': lambda: MemoryAuditLog(getattr(settings, 'PARAMETER_AUDIT_LOG_MEMORY_SIZE', 1000)),
+    'compact': lambda: CompactAuditLog(getattr(settings, 'PARAMETER_AUDIT_LOG_BATCH_SIZE', 500)),
+}
+audit_log = None
+
+
+def get_audit_log() -> AuditLog:
+    """
+    Returns the audit log picked by the `PARAMETER_AUDIT_LOG` setting, one per process.
+    :return: AuditLog
+    """
+    global audit_log
+    if audit_log is None:
+        mode = getattr(settings, 'PARAMETER_AUDIT_LOG', 'full')
+        try:
+            audit_log = AUDIT_LOG_MODES[mode]()
+        except KeyError:
+            raise ValueError('PARAMETER_AUDIT_LOG must be one of %s' % (', '.join(sorted(AUDIT_LOG_MODES)),))
+    return audit_log
+
+
+def flush_audit_log(*args, **kwargs):
+    if audit_log is not None:
+        audit_log.flush()
+
+
+@receiver(setting_changed)
+def reset_audit_log(setting, **kwargs):
+    global audit_log
+    if setting.startswith('PARAMETER_AUDIT_LOG'):
+        flush_audit_log()
+        audit_log = None
@@ -0,0 +1,150 @@
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import models
+
+from .models.mixins.parameters import BaseValue, BaseIntegerValue, BaseFloatValue, BaseCharacterValue, \
+    BaseBooleanValue
+
+__all__ = ['ValueCodec', 'EncodedState']
+
+
+class ValueCodec:
+    """
+    Value Codecs write parameter values as short strings, so they can be stored without generic foreign keys.
+    Scalars are written with a type prefix, and model objects as their model label and primary key.
+    """
+    NONE = 'n'
+    INTEGER = 'i'
+    FLOAT = 'f'
+    CHARACTER = 's'
+    BOOLEAN = 'b'
+    MODEL = 'm'
+    SEPARATOR = ':'
+
+    @staticmethod
+    def encode(value) -> str:
+        """
+        Encodes a raw value, a value row or a model object.
+        :param value:
+        :return: str
+        """
+        if isinstance(value, BaseBooleanValue):
+            return ValueCodec.__encode_scalar(ValueCodec.BOOLEAN, value.value)
+        if isinstance(value, BaseIntegerValue):
+            return ValueCodec.__encode_scalar(ValueCodec.INTEGER, value.value)
+        if isinstance(value, BaseFloatValue):
+            return ValueCodec.__encode_scalar(ValueCodec.FLOAT, value.value)
+        if isinstance(value, BaseCharacterValue):
+            return ValueCodec.__encode_scalar(ValueCodec.CHARACTER, value.value)
+        if isinstance(value, BaseValue):
+            return ValueCodec.__encode_scalar(ValueCodec.BOOLEAN, value.value)
+        if isinstance(value, models.Model):
+            return ValueCodec.SEPARATOR.join((ValueCodec.MODEL, value._meta.label_lower, str(value.pk)))
+        if value is None:
+            return ValueCodec.NONE
+        if isinstance(value, bool):
+            return ValueCodec.__encode_scalar(ValueCodec.BOOLEAN, value)
+        if isinstance(value, int):
+            return ValueCodec.__encode_scalar(ValueCodec.INTEGER, value)
+        if isinstance(value, float):
+            return ValueCodec.__encode_scalar(ValueCodec.FLOAT, value)
+        if isinstance(value, str):
+            return ValueCodec.__encode_scalar(ValueCodec.CHARACTER, value)
+        raise ValueError('value must be a recognized type.')
+
+    @staticmethod
+    def __encode_scalar(prefix: str, value) -> str:
+        if value is None:
+            return ValueCodec.NONE
+        if prefix == ValueCodec.BOOLEAN:
+            value = int(value)
+        elif prefix == ValueCodec.FLOAT:
+            value = repr(value)
+        return prefix + ValueCodec.SEPARATOR + str(value)
+
+    @staticmethod
+    def decode_reference(encoded: str):
+        """
+        Returns the model and primary key of an encoded model object, or `None` for scalars.
+        :param encoded: str
+        :return: Optional[tuple]
+        """
+        if not encoded.startswith(ValueCodec.MODEL + ValueCodec.SEPARATOR):
+            return None
+        prefix, label, pk = encoded.split(ValueCodec.SEPARATOR, 2)
+        return apps.get_model(label), int(pk)
+
+    @staticmethod
+    def decode(encoded: str):
+        """
+        Decodes a value written by `encode`. Model objects are fetched from the database.
+        :param encoded: str
+        :raise: DoesNotExist if an encoded model object was deleted
+        :return:
+        """
+        if encoded == ValueCodec.NONE:
+            return None
+        prefix, value = encoded.split(ValueCodec.SEPARATOR, 1)
+        if prefix == ValueCodec.INTEGER:
+            return int(value)
+        if prefix == ValueCodec.FLOAT:
+            return float(value)
+        if prefix == ValueCodec.CHARACTER:
+            return value
+        if prefix == ValueCodec.BOOLEAN:
+            return bool(int(value))
+        if prefix == ValueCodec.MODEL:
+            model, pk = ValueCodec.decode_reference(encoded)
+            return model._default_manager.get(pk=pk)
+        raise ValueError('encoded must start with a recognized type.')
+
+
+class EncodedState:
+    """
+    Encoded States hold parameters encoded by the Value Codec, by key string.
+    Model objects are fetched with one query per model the first time a value is decoded.
+    """
+    def __init__(self, encoded_state: dict, known_objects=None):
+        """
+        :param encoded_state: dict of encoded values by key string
+        :param known_objects: optional dict of model objects by (model, pk), used instead of fetching them
+        """
+        self.encoded_state = encoded_state
+        self.known_objects = known_objects or {}
+        self.__values = None
+
+    def __contains__(self, key):
+        return key in self.encoded_state
+
+    def __decode_all(self) -> dict:
+        references = defaultdict(set)
+        for encoded in self.encoded_state.values():
+            reference = ValueCodec.decode_reference(encoded)
+            if reference is not None and reference not in self.known_objects:
+                references[reference[0]].add(reference[1])
+        model_objects = {
+            model: model._default_manager.in_bulk(list(pks)) for model, pks in references.items()
+        }
+        values = {}
+        for key, encoded in self.encoded_state.items():
+            reference = ValueCodec.decode_reference(encoded)
+            if reference is None:
+                values[key] = ValueCodec.decode(encoded)
+            elif reference in self.known_objects:
+                values[key] = self.known_objects[reference]
+            else:
+                values[key] = model_objects[reference[0]].get(reference[1])
+        return values
+
+    def get_values(self) -> dict:
+        """
+        Returns the decoded values by key. Model objects deleted since are `None`.
+        :return: dict
+        """
+        if self.__values is None:
+            self.__values = self.__decode_all()
+        return self.__values
+
+    def get_value(self, key: str):
+        return self.get_values().get(key)
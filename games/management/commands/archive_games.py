@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from games.models import Game, ArchivedGame
+
+
+class Command(BaseCommand):
+    help = "Moves finished games out of the game tables into the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=24.0,
+                            help='Only archive games last saved more than this many hours ago.')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows deleted per query.')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Archive at most this many games.')
+
+    @staticmethod
+    def get_game_models() -> list:
+        return [model for model in apps.get_models() if issubclass(model, Game) and model is not Game]
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(hours=options['older_than'])
+        limit = options['limit']
+        archived = 0
+        for model in Command.get_game_models():
+            games = model.objects.filter(updated__lt=cutoff, parameters__isnull=False).select_related('parameters')
+            # Listed up front, since the loop deletes from the tables being read.
+            games = list(games)
+            # Games already in the archive were interrupted while their rows were deleted, and may have lost
+            # the parameters is_over reads, so they are resumed without asking.
+            interrupted = set()
+            for start in range(0, len(games), options['chunk_size']):
+                interrupted.update(ArchivedGame.objects.using(ArchivedGame.get_database()).filter(
+                    game_id__in=[game.pk for game in games[start:start + options['chunk_size']]]
+                ).values_list('game_id', flat=True))
+            for game in games:
+                if limit is not None and archived >= limit:
+                    break
+                resumed = game.pk in interrupted
+                if not resumed and not game.is_over():
+                    continue
+                ArchivedGame.archive(game, options['chunk_size'])
+                archived += 1
+                self.stdout.write("%s: %s" % (game, "resumed" if resumed else "archived"))
+        self.stdout.write(self.style.SUCCESS("Archived %d games." % (archived,)))
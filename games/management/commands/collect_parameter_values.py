@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils.timezone import now
+
+from games.models import IntegerValue, FloatValue, CharacterValue, BooleanValue, Parameter, ParameterUpdate
+from games.models.managers import get_value_grace_period
+
+
+class Command(BaseCommand):
+    help = 'Deletes value rows no longer referenced by any Parameter or Parameter Update.'
+    VALUE_MODELS = (IntegerValue, FloatValue, CharacterValue, BooleanValue)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to wait between chunks, letting other writers in.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count the orphaned rows without deleting them.')
+
+    @staticmethod
+    def get_orphaned(model):
+        """
+        Returns the rows of the value model that nothing points at, leaving out rows interned within
+        `PARAMETER_VALUE_GRACE_PERIOD` hours, whose parameters may not have been saved yet.
+        :param model: value model
+        :return: QuerySet
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        return model.objects.filter(Q(used__isnull=True) | Q(used__lt=now() - get_value_grace_period())).annotate(
+            in_parameter=Exists(Parameter.objects.filter(
+                content_type=content_type, object_id=OuterRef('pk'))),
+            in_old_update=Exists(ParameterUpdate.objects.filter(
+                old_content_type=content_type, old_object_id=OuterRef('pk'))),
+            in_new_update=Exists(ParameterUpdate.objects.filter(
+                new_content_type=content_type, new_object_id=OuterRef('pk'))),
+        ).filter(in_parameter=False, in_old_update=False, in_new_update=False)
+
+    def collect(self, model, chunk_size: int, pause: float, dry_run: bool) -> int:
+        name = model._meta.object_name
+        total = model.objects.count()
+        deleted = 0
+        last_pk = 0
+        while True:
+            orphaned = Command.get_orphaned(model)
+            pks = list(orphaned.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            if dry_run:
+                deleted += len(pks)
+            else:
+                # The checks are repeated in the delete, so rows interned again meanwhile are kept.
+                with transaction.atomic():
+                    count, _ = Command.get_orphaned(model).filter(pk__in=pks).delete()
+                deleted += count
+            self.stdout.write("%s: %d of %d rows %s" % (
+                name, deleted, total, "orphaned" if dry_run else "deleted"))
+            if pause:
+                time.sleep(pause)
+        return deleted
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in Command.VALUE_MODELS:
+            total += self.collect(model, options['chunk_size'], options['pause'], options['dry_run'])
+        verb = "Found" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS("%s %d orphaned value rows." % (verb, total)))
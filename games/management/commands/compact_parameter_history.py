@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from games.models import Game
+
+
+class Command(BaseCommand):
+    help = "Collapses the parameter updates of finished games into one Parameter History each."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=24.0,
+                            help='Only compact games last saved more than this many hours ago.')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Compact at most this many games.')
+
+    @staticmethod
+    def get_game_models() -> list:
+        return [model for model in apps.get_models() if issubclass(model, Game) and model is not Game]
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(hours=options['older_than'])
+        limit = options['limit']
+        compacted = 0
+        for model in Command.get_game_models():
+            games = model.objects.filter(updated__lt=cutoff, parameters__isnull=False).select_related('parameters')
+            for game in games.iterator():
+                if limit is not None and compacted >= limit:
+                    break
+                if not game.is_over():
+                    continue
+                history = game.parameters.compact_history()
+                if history is None:
+                    continue
+                compacted += 1
+                self.stdout.write("%s: %d updates summarized" % (game, history.update_count))
+        self.stdout.write(self.style.SUCCESS("Compacted the history of %d games." % (compacted,)))
@@ -0,0 +1,207 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('lobbies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BooleanValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.NullBooleanField(default=None, verbose_name='Value')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CharacterValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(blank=True, default=None, max_length=255, null=True, verbose_name='Value')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Condition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('condition_type', models.PositiveSmallIntegerField(choices=[(0, 'Has Value'), (1, 'Boolean'), (2, 'Comparison')], default=0, verbose_name='Condition Operation')),
+                ('comparison_type', models.PositiveSmallIntegerField(choices=[(0, '=='), (1, '!='), (2, '>'), (3, '<'), (4, '>='), (5, '<=')], default=0, verbose_name='Comparison Operation')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ConditionGroup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('boolean_op', models.PositiveSmallIntegerField(choices=[(0, 'OR'), (1, 'AND')], default=0, verbose_name='Boolean Operation')),
+                ('conditions', models.ManyToManyField(related_name='condition_groups', to='games.Condition')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FloatValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.FloatField(blank=True, default=None, null=True, verbose_name='Value')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('code', models.SlugField(max_length=16, verbose_name='Code')),
+                ('leader', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lobbies.Player')),
+                ('lobby', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games', to='lobbies.Lobby')),
+            ],
+            options={
+                'verbose_name': 'Game',
+                'verbose_name_plural': 'Games',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IntegerValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.IntegerField(blank=True, default=None, null=True, verbose_name='Value')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Parameter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('key', models.SlugField(max_length=255, verbose_name='Key')),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Object ID')),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'Parameter',
+                'verbose_name_plural': 'Parameters',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParameterDictionary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+            ],
+            options={
+                'verbose_name': 'Parameter Dictionary',
+                'verbose_name_plural': 'Parameter Dictionaries',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParameterUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('old_object_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Object ID')),
+                ('new_object_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Object ID')),
+                ('new_content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contenttypes.ContentType')),
+                ('old_content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contenttypes.ContentType')),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='updates', to='games.Parameter')),
+            ],
+            options={
+                'verbose_name': 'Parameter Update',
+                'verbose_name_plural': 'Parameter Updates',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Trigger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('rule', models.CharField(max_length=128, verbose_name='Rule')),
+                ('active', models.BooleanField(db_index=True, default=True, verbose_name='Active')),
+                ('repeats', models.BooleanField(default=False, verbose_name='Repeats')),
+                ('trigger_count', models.PositiveSmallIntegerField(default=0, verbose_name='Trigger Count')),
+                ('condition_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='triggers', to='games.ConditionGroup')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='triggers', to='games.Game')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='parameter',
+            name='dictionary',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parameters', to='games.ParameterDictionary'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='parameters',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='games.ParameterDictionary'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='players',
+            field=models.ManyToManyField(blank=True, related_name='games', to='lobbies.Player'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='teams',
+            field=models.ManyToManyField(blank=True, related_name='games', to='lobbies.Team'),
+        ),
+        migrations.AddField(
+            model_name='conditiongroup',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='condition_groups', to='games.Game'),
+        ),
+        migrations.AddField(
+            model_name='condition',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conditions', to='games.Game'),
+        ),
+        migrations.AddField(
+            model_name='condition',
+            name='parameter_1',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='games.Parameter'),
+        ),
+        migrations.AddField(
+            model_name='condition',
+            name='parameter_2',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='games.Parameter'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='parameter',
+            unique_together={('dictionary', 'key')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='state_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='State Version'),
+        ),
+    ]
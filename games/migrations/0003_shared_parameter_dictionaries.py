@@ -0,0 +1,24 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0002_game_state_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parameterdictionary',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='games.ParameterDictionary'),
+        ),
+        migrations.AddField(
+            model_name='parameterdictionary',
+            name='slug',
+            field=models.SlugField(blank=True, default=None, max_length=64, null=True, unique=True, verbose_name='Slug'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_shared_parameter_dictionaries'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booleanvalue',
+            name='value',
+            field=models.NullBooleanField(db_index=True, default=None, verbose_name='Value'),
+        ),
+        migrations.AlterField(
+            model_name='charactervalue',
+            name='value',
+            field=models.CharField(blank=True, db_index=True, default=None, max_length=255, null=True, verbose_name='Value'),
+        ),
+        migrations.AlterField(
+            model_name='floatvalue',
+            name='value',
+            field=models.FloatField(blank=True, db_index=True, default=None, null=True, verbose_name='Value'),
+        ),
+        migrations.AlterField(
+            model_name='integervalue',
+            name='value',
+            field=models.IntegerField(blank=True, db_index=True, default=None, null=True, verbose_name='Value'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_value_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompactParameterUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_value', models.CharField(max_length=320, verbose_name='Old Value')),
+                ('new_value', models.CharField(max_length=320, verbose_name='New Value')),
+                ('created', models.DateTimeField(editable=False)),
+                ('dictionary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compact_updates', to='games.ParameterDictionary')),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compact_updates', to='games.Parameter')),
+            ],
+            options={
+                'verbose_name': 'Compact Parameter Update',
+                'verbose_name_plural': 'Compact Parameter Updates',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParameterHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('update_count', models.PositiveIntegerField(default=0, verbose_name='Update Count')),
+                ('first_update', models.DateTimeField(blank=True, null=True, verbose_name='First Update')),
+                ('last_update', models.DateTimeField(blank=True, null=True, verbose_name='Last Update')),
+                ('summary', models.TextField(default='{}', verbose_name='Summary')),
+                ('dictionary', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='games.ParameterDictionary')),
+            ],
+            options={
+                'verbose_name': 'Parameter History',
+                'verbose_name_plural': 'Parameter Histories',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
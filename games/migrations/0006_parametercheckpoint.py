@@ -0,0 +1,31 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_parameter_audit_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParameterCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('label', models.SlugField(max_length=64, verbose_name='Label')),
+                ('round_number', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Round Number')),
+                ('data', models.BinaryField(verbose_name='Data')),
+                ('dictionary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='games.ParameterDictionary')),
+            ],
+            options={
+                'verbose_name': 'Parameter Checkpoint',
+                'verbose_name_plural': 'Parameter Checkpoints',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_parametercheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGame',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('game_id', models.PositiveIntegerField(unique=True, verbose_name='Game ID')),
+                ('game_model', models.CharField(max_length=128, verbose_name='Game Model')),
+                ('code', models.SlugField(max_length=16, verbose_name='Code')),
+                ('data', models.BinaryField(verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Archived Game',
+                'verbose_name_plural': 'Archived Games',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedParameterDictionary',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+            },
+            bases=('games.parameterdictionary',),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_archivedgame'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='code',
+            field=models.SlugField(max_length=16, unique=True, verbose_name='Code'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_game_code_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='rng_seed',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Random Seed'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+# Postgres 11 and later can keep the value columns in the index, so reads by dictionary and key
+# are answered from the index alone.
+COVERING_PARAMETER_INDEX = 'games_parameter_dictionary_key_value'
+
+
+def create_covering_parameter_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or connection.pg_version < 110000:
+        return
+    schema_editor.execute('CREATE INDEX %s ON games_parameter (dictionary_id, key) INCLUDE (content_type_id, '
+                          'object_id)' % (COVERING_PARAMETER_INDEX,))
+
+
+def drop_covering_parameter_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS %s' % (COVERING_PARAMETER_INDEX,))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0009_game_rng_seed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parameterupdate',
+            index=models.Index(fields=['parameter', 'created'], name='games_param_paramet_596d8c_idx'),
+        ),
+        # Games only look up their active triggers, which are few once non-repeating ones have been pulled.
+        migrations.RunSQL(
+            ['CREATE INDEX games_trigger_game_active ON games_trigger (game_id) WHERE active'],
+            ['DROP INDEX games_trigger_game_active'],
+        ),
+        # The tables behind many to many fields are indexed one way round by their unique constraint,
+        # and by the other foreign key alone the other way round.
+        migrations.RunSQL(
+            ['CREATE INDEX games_game_players_player_game ON games_game_players (player_id, game_id)'],
+            ['DROP INDEX games_game_players_player_game'],
+        ),
+        migrations.RunSQL(
+            ['CREATE INDEX games_game_teams_team_game ON games_game_teams (team_id, game_id)'],
+            ['DROP INDEX games_game_teams_team_game'],
+        ),
+        migrations.RunPython(create_covering_parameter_index, drop_covering_parameter_index),
+    ]
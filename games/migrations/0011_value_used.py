@@ -0,0 +1,33 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booleanvalue',
+            name='used',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Used'),
+        ),
+        migrations.AddField(
+            model_name='charactervalue',
+            name='used',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Used'),
+        ),
+        migrations.AddField(
+            model_name='floatvalue',
+            name='used',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Used'),
+        ),
+        migrations.AddField(
+            model_name='integervalue',
+            name='used',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Used'),
+        ),
+    ]
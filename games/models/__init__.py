@@ -1,2 +1,4 @@
 from .parameters import *
 from .games import *
+from .bootstrap import *
+from .archives import *
@@ -0,0 +1,188 @@
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import ugettext_lazy as _
+
+from clusterbuster.mixins import TimeStamped, compress_json, decompress_json, delete_in_chunks
+
+from lobbies.models import Lobby
+
+from ..codecs import EncodedState
+from .games import Game, GameRoster, GameReadOnlyError, Condition, ConditionGroup, Trigger
+from .parameters import ParameterDictionary, ParameterUpdate, CompactParameterUpdate, ParameterCheckpoint, \
+    ParameterHistory
+
+__all__ = ['ArchivedParameterDictionary', 'ArchivedGame']
+
+
+class ArchivedParameterDictionary(ParameterDictionary):
+    """
+    Archived Parameter Dictionaries answer the parameters of an archived game from its encoded state.
+    They are never saved and refuse writes.
+    """
+    class Meta:
+        proxy = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoded_state = EncodedState({})
+
+    def get_parameter(self, key):
+        raise GameReadOnlyError('Parameters of archived games can not be looked up or created.')
+
+    def get_value(self, key):
+        return self.encoded_state.get_value(ParameterDictionary.get_key(key))
+
+    def set_value(self, key, value):
+        raise GameReadOnlyError('Parameters of archived games can not be changed.')
+
+    def get_encoded_state(self) -> dict:
+        return dict(self.encoded_state.encoded_state)
+
+
+class ArchivedGame(TimeStamped):
+    """
+    Archived Games hold a finished game as one compressed row, after its rows were removed from the game tables.
+    The row is kept in the `GAME_ARCHIVE_DATABASE` database.
+    """
+    game_id = models.PositiveIntegerField(_("Game ID"), unique=True)
+    game_model = models.CharField(_("Game Model"), max_length=128)
+    code = models.SlugField(_("Code"), max_length=16)
+    data = models.BinaryField(_("Data"))
+
+    class Meta:
+        verbose_name = _("Archived Game")
+        verbose_name_plural = _("Archived Games")
+        ordering = ["-created"]
+
+    def __str__(self):
+        return str(self.code)
+
+    @staticmethod
+    def get_database() -> str:
+        return getattr(settings, 'GAME_ARCHIVE_DATABASE', 'default')
+
+    @staticmethod
+    def get_archive_data(game: Game) -> dict:
+        """
+        Returns everything needed to show the game again: its fields, roster, parameters, checkpoints
+        and the summary of its parameter history, along with the rows it owns outside the game tables.
+        :param game: Game
+        :return: dict
+        """
+        dictionary = game.parameters
+        history = dictionary.compact_history() or ParameterHistory.objects.filter(dictionary=dictionary).first()
+        return {
+            'game': {
+                'lobby_id': game.lobby_id,
+                'leader_id': game.leader_id,
+                'state_version': game.state_version,
+                'rng_seed': game.rng_seed,
+                'created': game.created.isoformat() if game.created else None,
+                'updated': game.updated.isoformat() if game.updated else None,
+            },
+            'roster': game.get_roster().to_data(),
+            'parameters': dictionary.get_encoded_state(),
+            'checkpoints': [
+                {'label': checkpoint.label, 'round_number': checkpoint.round_number,
+                 'created': checkpoint.created.isoformat(), 'parameters': checkpoint.get_encoded_state()}
+                for checkpoint in dictionary.checkpoints.order_by('created', 'pk')
+            ],
+            'history': {
+                'update_count': history.update_count,
+                'summary': json.loads(history.summary),
+            } if history is not None else None,
+            'owned': [
+                [queryset.model._meta.label_lower, list(queryset.values_list('pk', flat=True))]
+                for queryset in game.get_owned_querysets()
+            ],
+        }
+
+    def get_owned_querysets(self) -> list:
+        """
+        Returns querysets of the rows the game owned when it was archived.
+        :return: list of QuerySet
+        """
+        return [apps.get_model(label).objects.filter(pk__in=pks) for label, pks in self.get_data().get('owned', [])]
+
+    @staticmethod
+    def archive(game: Game, chunk_size=1000):
+        """
+        Saves the game to the archive, then deletes its rows from the game tables in chunks.
+        Archiving a game again resumes deleting rows left behind by an interrupted run,
+        from what the archive holds, since the game's parameters may already be gone.
+        :param game: Game that is over, or whose archiving was interrupted
+        :param chunk_size: int rows deleted per query
+        :return: ArchivedGame
+        """
+        database = ArchivedGame.get_database()
+        archived_game = ArchivedGame.objects.using(database).filter(game_id=game.pk).first()
+        if archived_game is None:
+            archived_game = ArchivedGame(game_id=game.pk, game_model=game._meta.label_lower, code=game.code,
+                                         data=compress_json(ArchivedGame.get_archive_data(game)))
+            archived_game.save(using=database)
+        archived_game.delete_game_rows(game, chunk_size)
+        return archived_game
+
+    def delete_game_rows(self, game: Game, chunk_size: int):
+        # The game row goes last, so a game still in the tables is one whose archiving did not finish.
+        dictionary = game.parameters
+        delete_in_chunks(Trigger.objects.filter(game=game), chunk_size)
+        delete_in_chunks(ConditionGroup.conditions.through.objects.filter(conditiongroup__game=game), chunk_size)
+        delete_in_chunks(Condition.objects.filter(game=game), chunk_size)
+        delete_in_chunks(ConditionGroup.objects.filter(game=game), chunk_size)
+        if dictionary is not None:
+            delete_in_chunks(ParameterUpdate.objects.filter(parameter__dictionary=dictionary), chunk_size)
+            delete_in_chunks(CompactParameterUpdate.objects.filter(dictionary=dictionary), chunk_size)
+            delete_in_chunks(ParameterCheckpoint.objects.filter(dictionary=dictionary), chunk_size)
+            delete_in_chunks(dictionary.parameters.all(), chunk_size)
+        for queryset in self.get_owned_querysets():
+            delete_in_chunks(queryset, chunk_size)
+        with transaction.atomic():
+            game.delete()
+            if dictionary is not None:
+                dictionary.delete()
+
+    def get_data(self) -> dict:
+        return decompress_json(self.data)
+
+    def rehydrate(self) -> Game:
+        """
+        Returns the archived game as an unsaved, read only instance of its game model.
+        :return: Game
+        """
+        data = self.get_data()
+        game_data = data['game']
+        model = apps.get_model(self.game_model)
+        game = model(id=self.game_id, code=self.code, leader_id=game_data['leader_id'],
+                     state_version=game_data['state_version'], rng_seed=game_data.get('rng_seed'))
+        game.pk = self.game_id
+        game.created = parse_datetime(game_data['created']) if game_data['created'] else None
+        game.updated = parse_datetime(game_data['updated']) if game_data['updated'] else None
+        game.lobby = Lobby.objects.filter(pk=game_data['lobby_id']).first()
+        game.read_only = True
+        game.roster = GameRoster.from_data(game, data['roster'])
+        known_objects = {}
+        for team, players in game.roster.teams_with_players:
+            known_objects[(type(team), team.pk)] = team
+            for player in players:
+                known_objects[(type(player), player.pk)] = player
+        parameters = ArchivedParameterDictionary()
+        parameters.encoded_state = EncodedState(data['parameters'], known_objects)
+        game.parameters = parameters
+        return game
+
+    @staticmethod
+    def rehydrate_by_code(code: str):
+        """
+        Returns the archived game with the code, rehydrated, or `None`.
+        :param code: str
+        :return: Optional[Game]
+        """
+        archived_game = ArchivedGame.objects.using(ArchivedGame.get_database()).filter(code=code).first()
+        if archived_game is None:
+            return None
+        return archived_game.rehydrate()
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.utils.timezone import now
+
+from clusterbuster.mixins import bulk_create_with_pks
+
+from .mixins.conditions import ConditionAbstract, ConditionGroupAbstract
+from .games import Condition, ConditionGroup, Trigger
+
+__all__ = ['TemplateSlot', 'TeamSlot', 'TriggerTemplate', 'GameTemplate']
+
+
+class TemplateSlot:
+    """
+    Template Slots stand in for objects that only exist once a game is materialized from a template.
+    """
+    def resolve(self, game, context: dict):
+        raise NotImplementedError('TemplateSlot subclasses must override resolve()')
+
+
+class TeamSlot(TemplateSlot):
+    """
+    Stands in for the team at an index of the game's roster.
+    """
+    def __init__(self, index: int):
+        self.index = index
+
+    def __str__(self):
+        return "team %d" % (self.index,)
+
+    def resolve(self, game, context: dict):
+        return context['teams'][self.index]
+
+
+class TriggerTemplate:
+    """
+    Trigger Templates describe a trigger and its conditions, mirroring the Trigger methods that add them.
+    """
+    def __init__(self, rule: str, repeats=False, active=True, trigger_count=0):
+        self.rule = rule
+        self.repeats = repeats
+        self.active = active
+        self.trigger_count = trigger_count
+        self.boolean_op = ConditionGroupAbstract.OR_OP
+        self.conditions = []
+
+    def add_has_value_condition(self, key):
+        self.conditions.append((ConditionAbstract.HAS_VALUE, key, None, ConditionAbstract.EQUAL))
+
+    def add_boolean_condition(self, key):
+        self.conditions.append((ConditionAbstract.BOOLEAN, key, None, ConditionAbstract.EQUAL))
+
+    def add_comparison_condition(self, key_1, key_2, comparison_type=ConditionAbstract.EQUAL):
+        self.conditions.append((ConditionAbstract.COMPARISON, key_1, key_2, comparison_type))
+
+    def set_to_and_op(self):
+        self.boolean_op = ConditionGroupAbstract.AND_OP
+
+    def set_to_or_op(self):
+        self.boolean_op = ConditionGroupAbstract.OR_OP
+
+
+class GameTemplate:
+    """
+    Game Templates hold the parameters and triggers a game starts with, for a given number of teams.
+    They mirror the Game methods that set values and add triggers, and are materialized into a game
+    with a few bulk inserts instead of a query per value.
+    """
+    def __init__(self, team_count: int):
+        self.teams = [TeamSlot(team_i) for team_i in range(team_count)]
+        self.values = []
+        self.triggers = []
+
+    @staticmethod
+    def __resolve(item, game, context: dict):
+        if isinstance(item, TemplateSlot):
+            return item.resolve(game, context)
+        if isinstance(item, tuple):
+            return tuple(GameTemplate.__resolve(sub_item, game, context) for sub_item in item)
+        return item
+
+    def set_value(self, key, value):
+        self.values.append((key, value))
+
+    def set_values(self, **kwargs):
+        for key, value in kwargs.items():
+            self.set_value(key, value)
+
+    def add_trigger(self, rule: str, repeats=False) -> TriggerTemplate:
+        trigger = TriggerTemplate(rule, repeats)
+        self.triggers.append(trigger)
+        return trigger
+
+    def materialize(self, game, **context):
+        """
+        Sets the template's parameters and adds its triggers to the game.
+        :param game: Game
+        :param context: objects the template's slots resolve to; `teams` defaults to the game's roster
+        :return: None
+        """
+        context.setdefault('teams', game.get_roster().teams)
+        resolve = GameTemplate.__resolve
+        values = [(resolve(key, game, context), resolve(value, game, context)) for key, value in self.values]
+        triggers = []
+        condition_keys = []
+        for trigger in self.triggers:
+            conditions = []
+            for condition_type, key_1, key_2, comparison_type in trigger.conditions:
+                key_1 = game.parameters.get_key(resolve(key_1, game, context))
+                condition_keys.append(key_1)
+                if key_2 is not None:
+                    key_2 = game.parameters.get_key(resolve(key_2, game, context))
+                    condition_keys.append(key_2)
+                conditions.append((condition_type, key_1, key_2, comparison_type))
+            triggers.append((trigger, conditions))
+        with transaction.atomic():
+            parameters = game.parameters.bulk_set_values(values, condition_keys)
+            GameTemplate.create_triggers(game, triggers, parameters)
+        game.parameters_updated = True
+        game.state_changed = True
+
+    @staticmethod
+    def create_triggers(game, triggers: list, parameters: dict):
+        """
+        Bulk creates triggers with their condition groups and conditions.
+        :param game: Game
+        :param triggers: list of (TriggerTemplate, conditions) pairs, where conditions are
+            (condition type, key string, key string or None, comparison type) tuples
+        :param parameters: dict of the Parameters by key string, holding every key the conditions use
+        :return: None
+        """
+        _now = now()
+        condition_groups = []
+        for trigger, conditions in triggers:
+            condition_group = ConditionGroup(game=game, boolean_op=trigger.boolean_op)
+            condition_group.stamp(_now)
+            condition_groups.append(condition_group)
+        bulk_create_with_pks(game.condition_groups.all(), condition_groups)
+        new_triggers = []
+        new_conditions = []
+        for (trigger, conditions), condition_group in zip(triggers, condition_groups):
+            new_trigger = Trigger(game=game, condition_group=condition_group,
+                                  rule=game.prepend_game_slug(trigger.rule), repeats=trigger.repeats,
+                                  active=trigger.active, trigger_count=trigger.trigger_count)
+            new_trigger.stamp(_now)
+            new_triggers.append(new_trigger)
+            for condition_type, key_1, key_2, comparison_type in conditions:
+                condition = Condition(game=game, condition_type=condition_type, comparison_type=comparison_type,
+                                      parameter_1=parameters[key_1], parameter_2=parameters.get(key_2))
+                condition.stamp(_now)
+                new_conditions.append((condition_group, condition))
+        Trigger.objects.bulk_create(new_triggers)
+        bulk_create_with_pks(game.conditions.all(), [condition for condition_group, condition in new_conditions])
+        ConditionGroup.conditions.through.objects.bulk_create([
+            ConditionGroup.conditions.through(conditiongroup=condition_group, condition=condition)
+            for condition_group, condition in new_conditions
+        ])
@@ -1,15 +1,35 @@
+import logging
+import random
+from time import perf_counter
+from typing import Optional
+
+from django.apps import apps
 from django.db import models
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 from django.urls import reverse
 
-from clusterbuster.mixins import TimeStamped, CodeGenerator
+from clusterbuster.mixins import TimeStamped, CodeGenerator, get_random
+from clusterbuster.mixins.interfaces import ModelInterface
 
-from lobbies.models import Player, Team, Lobby
+from lobbies.models import Player, Team, Lobby, CodeSequence
 
 from .parameters import ParameterDictionary, Parameter
+from ..audit import flush_audit_log
+from ..signals import game_updated, rule_evaluated
 from .mixins.conditions import *
 
-__all__ = ['Game', 'Condition', 'ConditionGroup', 'Trigger']
+__all__ = ['GameReadOnlyError', 'Game', 'GameRoster', 'Condition', 'ConditionGroup', 'Trigger']
+
+rule_logger = logging.getLogger('games.rules')
+trigger_logger = logging.getLogger('games.triggers')
+
+
+class GameReadOnlyError(Exception):
+    """
+    Raised when an archived game is asked to change.
+    """
+    pass
 
 
 class Game(GameAbstract, TimeStamped):
@@ -17,14 +37,17 @@ class Game(GameAbstract, TimeStamped):
     Games are instances of Game Definitions, that have codes, State Machines, Players, and Teams.
     """
     SLUG = 'no_game'
+    CODE_NAMESPACE = 'game'
 
     players = models.ManyToManyField(Player, blank=True, related_name='games')
     teams = models.ManyToManyField(Team, blank=True, related_name='games')
-    code = models.SlugField(_("Code"), max_length=16)
+    code = models.SlugField(_("Code"), max_length=16, unique=True)
     lobby = models.ForeignKey(Lobby, on_delete=models.SET_NULL, null=True, blank=True, related_name='games')
     leader = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     parameters = models.ForeignKey(ParameterDictionary, on_delete=models.SET_NULL, null=True, blank=True,
                                    related_name="+")
+    state_version = models.PositiveIntegerField(_("State Version"), default=0, editable=False)
+    rng_seed = models.BigIntegerField(_("Random Seed"), null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = _("Game")
@@ -38,16 +61,24 @@ class Game(GameAbstract, TimeStamped):
         super().__init__(*args, **kwargs)
         self.trigger_list = []
         self.parameters_updated = False
+        self.state_changed = False
+        self.roster = None
+        self.read_only = False
+        self.rng = None
+        self.rng_version = None
 
     def __setup_parameters(self):
         if self.parameters is None:
-            self.parameters = ParameterDictionary.objects.create()
+            self.parameters = ParameterDictionary.objects.create(parent=self.get_default_parameters())
             self.save()
 
     def __setup_code(self):
         if not self.code:
-            self.code = CodeGenerator.game_code()
-            self.save()
+            self.code = Game.allocate_code()
+
+    def __setup_rng_seed(self):
+        if self.rng_seed is None:
+            self.rng_seed = get_random().getrandbits(32)
 
     def __setup_from_lobby(self, lobby: Lobby):
         """
@@ -57,12 +88,28 @@ class Game(GameAbstract, TimeStamped):
         self.lobby = lobby
         self.players.set(lobby.players.all())
         self.teams.set(lobby.teams.all())
+        self.roster = None
         game_url = reverse('game_detail', kwargs={'slug': self.code})
         self.lobby.start_activity('Cluster Buster', game_url)
 
     def save(self, *args, **kwargs):
+        if self.read_only:
+            raise GameReadOnlyError('Archived games can not be saved.')
+        self.__setup_code()
+        self.__setup_rng_seed()
         super(Game, self).save(*args, **kwargs)
 
+    @staticmethod
+    def allocate_code() -> str:
+        """
+        Returns a game code that no live or archived game has. Game codes are never reused,
+        so archived games can still be found by theirs.
+        :return: str
+        """
+        ArchivedGame = apps.get_model('games', 'ArchivedGame')
+        taken = (Game.objects.all(), ArchivedGame.objects.using(ArchivedGame.get_database()))
+        return CodeSequence.objects.allocate(Game.CODE_NAMESPACE, CodeGenerator.GAME_CODE_LENGTH, taken)
+
     def has_player(self, player: Player) -> bool:
         """
         Returns `True` if the player is in the game.
@@ -71,6 +118,15 @@ class Game(GameAbstract, TimeStamped):
         """
         return self.players.filter(pk=player.pk).exists()
 
+    def get_roster(self):
+        """
+        Returns the teams and players of the game, loading them once per game instance.
+        :return: GameRoster
+        """
+        if self.roster is None:
+            self.roster = GameRoster(self)
+        return self.roster
+
     def has_team(self, team: Team) -> bool:
         """
         Returns `True` if the team is in the lobby.
@@ -106,34 +162,115 @@ class Game(GameAbstract, TimeStamped):
     def get_game_slug(self):
         return self.SLUG
 
+    def get_default_parameters(self) -> Optional[ParameterDictionary]:
+        """
+        Returns the shared dictionary the game's parameters fall back to. Games without defaults return `None`.
+        :return: Optional[ParameterDictionary]
+        """
+        return None
+
     def start(self):
         self.first_rule()
 
+    def get_owned_querysets(self) -> list:
+        """
+        Returns querysets of rows outside the game tables that belong to this game alone,
+        to delete along with it when it is archived.
+        :return: list of QuerySet
+        """
+        return []
+
+    def take_checkpoint(self, label: str, round_number=None):
+        """
+        Saves the game's parameters so the game can be replayed from this point.
+        :param label: str
+        :param round_number: Optional[int]
+        :return: ParameterCheckpoint
+        """
+        return self.parameters.take_checkpoint(label, round_number)
+
+    def get_replay(self):
+        """
+        Returns a replay of the game's parameters, to rebuild its state at an earlier time or round.
+        :return: ParameterReplay
+        """
+        from ..replay import ParameterReplay
+        return ParameterReplay(self.parameters)
+
+    def get_random(self) -> random.Random:
+        """
+        Returns the generator every random choice of the game is made with. It is seeded by the game's seed
+        and state version, so the same seed and moves give the same choices, in any process.
+        :return: random.Random
+        """
+        if self.rng_seed is None:
+            self.__setup_rng_seed()
+            if self.pk is not None and not self.read_only:
+                Game.objects.filter(pk=self.pk).update(rng_seed=self.rng_seed)
+        if self.rng is None or self.rng_version != self.state_version:
+            self.rng = random.Random('%d:%d' % (self.rng_seed, self.state_version))
+            self.rng_version = self.state_version
+        return self.rng
+
+    def is_over(self) -> bool:
+        """
+        Returns `True` once the game has finished.
+        :return: bool
+        """
+        return False
+
     def first_rule(self):
         pass
 
     def update(self):
+        if self.read_only:
+            return
+        started = perf_counter()
+        iterations = 0
         self.trigger_list = list(self.triggers.filter(active=True).all())
         self.parameters_updated = True
         while self.parameters_updated:
+            iterations += 1
             active_trigger_list = self.trigger_list.copy()
             self.parameters_updated = False
             while len(active_trigger_list) > 0:
                 trigger = active_trigger_list.pop()
                 trigger.squeeze()
+        if self.state_changed:
+            self.bump_state_version()
+        flush_audit_log()
+        game_updated.send(sender=type(self), game=self, iterations=iterations, duration=perf_counter() - started)
+
+    def bump_state_version(self):
+        """
+        Increments the state version, marking anything cached for the previous version as stale,
+        and records the activity in `updated`.
+        :return: None
+        """
+        self.state_version += 1
+        self.state_changed = False
+        self.updated = now()
+        Game.objects.filter(pk=self.pk).update(state_version=models.F('state_version') + 1, updated=self.updated)
 
     def evaluate_rule(self, rule: str):
         rule_method = self.get_rule_method(rule)
         if rule_method is not None:
+            started = perf_counter()
             rule_method()
+            duration = perf_counter() - started
+            rule = self.strip_game_slug(rule)
+            rule_evaluated.send(sender=type(self), game=self, rule=rule, duration=duration)
+            if rule_logger.isEnabledFor(logging.INFO):
+                rule_logger.info('Evaluated %s in %s', rule, self.code, extra={
+                    'game': self.code, 'rule': rule, 'duration': duration, 'state_version': self.state_version})
 
     def get_rule_method(self, rule: str):
         rule = self.strip_game_slug(rule)
-        print("%s rule lookup" % (rule,))
         try:
             return getattr(self, rule)
         except AttributeError:
-            print("%s didn't exist in %s" % (rule, self))
+            rule_logger.warning('Rule %s does not exist in %s', rule, self.code, extra={
+                'game': self.code, 'rule': rule, 'state_version': self.state_version})
             return None
 
     def get_parameter(self, key):
@@ -143,8 +280,21 @@ class Game(GameAbstract, TimeStamped):
         return self.parameters.get_value(key)
 
     def set_value(self, key, value):
-        self.parameters.set_value(key, value)
+        inherited = self.parameters.set_value(key, value)
+        if inherited is not None:
+            self.repoint_conditions(inherited, self.get_parameter(key))
         self.parameters_updated = True
+        self.state_changed = True
+
+    def repoint_conditions(self, old_parameter: Parameter, new_parameter: Parameter):
+        """
+        Moves the game's conditions from a parameter to another, when a default is overridden.
+        :param old_parameter: Parameter
+        :param new_parameter: Parameter
+        :return: None
+        """
+        self.conditions.filter(parameter_1=old_parameter).update(parameter_1=new_parameter)
+        self.conditions.filter(parameter_2=old_parameter).update(parameter_2=new_parameter)
 
     def set_values(self, **kwargs):
         for key, value in kwargs.items():
@@ -179,6 +329,120 @@ class Game(GameAbstract, TimeStamped):
         return trigger
 
 
+class GameRoster(ModelInterface):
+    """
+    Teams and players of a Game, loaded with a single query and answered from memory.
+    """
+    model = Game
+
+    def __init__(self, model_object, memberships=None):
+        """
+        :param model_object: Game
+        :param memberships: optional (team, player) pairs in roster order, instead of loading them
+        """
+        super().__init__(model_object)
+        self.teams = []
+        self.__team_players = {}
+        self.__player_teams = {}
+        if memberships is None:
+            memberships = self.__load()
+        for team, player in memberships:
+            self.__add(team, player)
+
+    def __load(self) -> list:
+        memberships = Team.players.through.objects.filter(team__games=self.object).select_related(
+            'team', 'player').order_by('team__name', '-team__created', 'team__pk', 'player__name', '-player__created')
+        return [(membership.team, membership.player) for membership in memberships]
+
+    def __add(self, team: Team, player: Player):
+        if team.pk not in self.__team_players:
+            self.teams.append(team)
+            self.__team_players[team.pk] = []
+        self.__team_players[team.pk].append(player)
+        self.__player_teams[player.pk] = team
+
+    def to_data(self) -> list:
+        """
+        Returns the roster as JSON serializable data, for `from_data`.
+        :return: list
+        """
+        return [
+            {'team': [team.pk, team.name], 'players': [[player.pk, player.name] for player in players]}
+            for team, players in self.teams_with_players
+        ]
+
+    @staticmethod
+    def from_data(game, data: list):
+        """
+        Builds a roster from `to_data` output, with unsaved copies of the teams and players.
+        :param game: Game
+        :param data: list
+        :return: GameRoster
+        """
+        memberships = []
+        for team_data in data:
+            team = Team(pk=team_data['team'][0], name=team_data['team'][1])
+            for player_pk, player_name in team_data['players']:
+                memberships.append((team, Player(pk=player_pk, name=player_name)))
+        return GameRoster(game, memberships)
+
+    @property
+    def teams_with_players(self) -> list:
+        """
+        Returns (team, players) pairs in team order.
+        :return: list
+        """
+        return [(team, self.__team_players[team.pk]) for team in self.teams]
+
+    def get_players(self, team: Team) -> list:
+        """
+        Returns the players of the team in player order.
+        :param team: Team
+        :return: list
+        """
+        return self.__team_players.get(team.pk, [])
+
+    def get_team(self, player: Player) -> Optional[Team]:
+        """
+        Returns the team the player plays for.
+        :param player: Player
+        :return: Optional[Team]
+        """
+        return self.__player_teams.get(player.pk)
+
+    def get_opponent_team(self, player: Player) -> Optional[Team]:
+        """
+        Returns the first team the player does not play for.
+        :param player: Player
+        :return: Optional[Team]
+        """
+        player_team = self.get_team(player)
+        for team in self.teams:
+            if team != player_team:
+                return team
+        return None
+
+    def has_player(self, player: Player) -> bool:
+        """
+        Returns `True` if the player plays for any team.
+        :param player: Player
+        :return: bool
+        """
+        return player.pk in self.__player_teams
+
+    def get_round_leader(self, round_number: int, team: Team) -> Optional[Player]:
+        """
+        Returns the player leading the team in the round, rotating through the team's players.
+        :param round_number: int
+        :param team: Team
+        :return: Optional[Player]
+        """
+        players = self.get_players(team)
+        if not players:
+            return None
+        return players[(round_number - 1) % len(players)]
+
+
 class Condition(ConditionAbstract, TimeStamped):
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="conditions")
     parameter_1 = models.ForeignKey(Parameter, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
@@ -271,6 +535,10 @@ class Trigger(TimeStamped):
 
     def pull(self):
         self.trigger_count += 1
+        if trigger_logger.isEnabledFor(logging.INFO):
+            trigger_logger.info('Pulled trigger %d for %s in %s', self.pk, self.rule, self.game.code, extra={
+                'game': self.game.code, 'trigger': self.pk, 'rule': self.game.strip_game_slug(self.rule),
+                'trigger_count': self.trigger_count, 'state_version': self.game.state_version})
         self.game.evaluate_rule(self.rule)
         if self.repeats is False:
             self.active = False
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models
+from django.utils.timezone import now
+
+
+def get_value_grace_period() -> timedelta:
+    return timedelta(hours=getattr(settings, 'PARAMETER_VALUE_GRACE_PERIOD', 1.0))
+
+
+class ValueManager(models.Manager):
+    """
+    Value rows are never changed once saved, so equal values share one interned row.
+    Interning marks the row used, at most once per half grace period, so collect_parameter_values
+    leaves it alone until the parameter pointing at it has been saved.
+    """
+    def mark_used(self, model_values, _now) -> set:
+        """
+        Marks the rows used, skipping those marked in the last half grace period.
+        :param model_values: iterable of BaseValue
+        :param _now: datetime
+        :return: set of the pks of the rows that no longer exist
+        """
+        threshold = _now - get_value_grace_period() / 2
+        stale_pks = [model_value.pk for model_value in model_values
+                     if model_value.used is None or model_value.used < threshold]
+        if not stale_pks:
+            return set()
+        marked = self.filter(pk__in=stale_pks).update(used=_now)
+        if marked == len(stale_pks):
+            return set()
+        # The row was collected between the lookup and the update.
+        return set(stale_pks) - set(self.filter(pk__in=stale_pks).values_list('pk', flat=True))
+
+    def intern(self, value):
+        """
+        Returns the row holding the value, creating it if there is none.
+        :param value:
+        :return: BaseValue
+        """
+        _now = now()
+        model_value = self.filter(value=value).order_by('pk').first()
+        if model_value is not None and self.mark_used([model_value], _now):
+            model_value = None
+        if model_value is None:
+            model_value = self.create(value=value, used=_now)
+        return model_value
+
+    def intern_many(self, values) -> dict:
+        """
+        Returns the rows holding the values with one query, creating the missing ones.
+        :param values: iterable of values
+        :return: dict of the rows by value
+        """
+        _now = now()
+        values = list(OrderedDict.fromkeys(values))
+        interned = {}
+        for model_value in self.filter(value__in=values).order_by('pk'):
+            interned.setdefault(model_value.value, model_value)
+        collected = self.mark_used(interned.values(), _now)
+        interned = {value: model_value for value, model_value in interned.items() if model_value.pk not in collected}
+        missing = [self.model(value=value, used=_now) for value in values if value not in interned]
+        if connection.features.can_return_ids_from_bulk_insert:
+            self.bulk_create(missing)
+        else:
+            for model_value in missing:
+                model_value.save()
+        for model_value in missing:
+            interned[model_value.value] = model_value
+        return interned
@@ -3,12 +3,16 @@ from django.utils.translation import ugettext_lazy as _
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+from ..managers import ValueManager
+
 __all__ = ['BaseValue', 'BaseNumericValue', 'BaseIntegerValue', 'BaseFloatValue', 'BaseCharacterValue',
            'BaseBooleanValue', 'BaseParameter']
 
 
 class BaseValue(models.Model):
-    value = models.BooleanField(_("Value"), blank=True, null=True, default=None)
+    value = models.BooleanField(_("Value"), blank=True, null=True, default=None, db_index=True)
+    used = models.DateTimeField(_("Used"), null=True, editable=False)
+    objects = ValueManager()
 
     class Meta:
         abstract = True
@@ -18,7 +22,7 @@ class BaseValue(models.Model):
 
 
 class BaseNumericValue(BaseValue):
-    value = models.IntegerField(_("Value"), blank=True, null=True, default=None)
+    value = models.IntegerField(_("Value"), blank=True, null=True, default=None, db_index=True)
 
     class Meta:
         abstract = True
@@ -28,6 +32,9 @@ class BaseNumericValue(BaseValue):
             return False
         return self.value == other.value
 
+    def __hash__(self):
+        return super().__hash__()
+
     def __ne__(self, other):
         if not isinstance(other, BaseNumericValue):
             return True
@@ -55,28 +62,28 @@ class BaseNumericValue(BaseValue):
 
 
 class BaseIntegerValue(BaseNumericValue):
-    value = models.IntegerField(_("Value"), blank=True, null=True, default=None)
+    value = models.IntegerField(_("Value"), blank=True, null=True, default=None, db_index=True)
 
     class Meta:
         abstract = True
 
 
 class BaseFloatValue(BaseNumericValue):
-    value = models.FloatField(_("Value"), blank=True, null=True, default=None)
+    value = models.FloatField(_("Value"), blank=True, null=True, default=None, db_index=True)
 
     class Meta:
         abstract = True
 
 
 class BaseCharacterValue(BaseValue):
-    value = models.CharField(_("Value"), max_length=255, blank=True, null=True, default=None)
+    value = models.CharField(_("Value"), max_length=255, blank=True, null=True, default=None, db_index=True)
 
     class Meta:
         abstract = True
 
 
 class BaseBooleanValue(BaseValue):
-    value = models.NullBooleanField(_("Value"), default=None)
+    value = models.NullBooleanField(_("Value"), default=None, db_index=True)
 
     class Meta:
         abstract = True
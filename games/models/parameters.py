@@ -1,14 +1,22 @@
-from django.db import models
+import json
+from collections import OrderedDict
+
+from django.db import IntegrityError, models, transaction
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
-from clusterbuster.mixins import TimeStamped
+from django.utils.timezone import now
+
+from clusterbuster.metrics import parameter_reads, parameter_writes
+from clusterbuster.mixins import TimeStamped, bulk_create_with_pks, compress_json, decompress_json
 
 from .mixins.parameters import *
+from ..audit import get_audit_log
+from ..codecs import ValueCodec
 
 __all__ = ['IntegerValue', 'FloatValue', 'CharacterValue', 'BooleanValue', 'ParameterDictionary',
-           'Parameter', 'ParameterUpdate']
+           'Parameter', 'ParameterUpdate', 'CompactParameterUpdate', 'ParameterHistory', 'ParameterCheckpoint']
 
 
 class IntegerValue(BaseIntegerValue):
@@ -30,27 +38,48 @@ class BooleanValue(BaseBooleanValue):
 class ParameterDictionary(TimeStamped):
     """
     Parameters store all data about a specific game and the state.
+    Dictionaries may have a parent: keys they do not hold are read from the parent,
+    and writes to those keys create an override in the child. Shared dictionaries have a slug,
+    hold defaults for many games and are kept in memory by each process.
     """
+    slug = models.SlugField(_("Slug"), max_length=64, unique=True, null=True, blank=True, default=None)
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='children')
+    shared_dictionaries = {}
+
     class Meta:
         verbose_name = _("Parameter Dictionary")
         verbose_name_plural = _("Parameter Dictionaries")
         ordering = ["-created"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shared_parameters = None
+
     @staticmethod
-    def __get_model_value(raw_value):
-        if isinstance(raw_value, models.Model):
-            return raw_value
-        elif isinstance(raw_value, int):
-            return IntegerValue(value=raw_value)
+    def __get_value_model(raw_value):
+        if isinstance(raw_value, int):
+            return IntegerValue
         elif isinstance(raw_value, float):
-            return FloatValue(value=raw_value)
+            return FloatValue
         elif isinstance(raw_value, str):
-            return CharacterValue(value=raw_value)
+            return CharacterValue
         elif isinstance(raw_value, bool):
-            return BooleanValue(value=raw_value)
+            return BooleanValue
         else:
             raise ValueError('raw_value must be a recognized type.')
 
+    @staticmethod
+    def __get_model_value(raw_value):
+        if isinstance(raw_value, models.Model):
+            return raw_value
+        return ParameterDictionary.__get_value_model(raw_value).objects.intern(raw_value)
+
+    @staticmethod
+    def __get_raw_value(model_value):
+        if isinstance(model_value, BaseValue):
+            return model_value.value
+        return model_value
+
     @staticmethod
     def __get_str_from_iter(args):
         try:
@@ -58,27 +87,261 @@ class ParameterDictionary(TimeStamped):
         except TypeError:
             return str(args)
 
-    def get_parameter(self, key):
+    @staticmethod
+    def get_key(key) -> str:
         if not isinstance(key, str):
             key = ParameterDictionary.__get_str_from_iter(key)
-        parameter, create = Parameter.objects.get_or_create(dictionary=self, key=key)
+        return key
+
+    @staticmethod
+    def get_shared(slug: str, values: dict):
+        """
+        Returns the shared dictionary with the slug, creating it or updating the values that differ.
+        Games that have not overridden a key see the new value.
+        :param slug: str
+        :param values: dict of raw values by key
+        :return: ParameterDictionary
+        """
+        dictionary, created = ParameterDictionary.objects.get_or_create(slug=slug)
+        dictionary.load_shared_parameters()
+        missing_values = []
+        for key, value in values.items():
+            key = ParameterDictionary.get_key(key)
+            parameter = dictionary.shared_parameters.get(key)
+            if parameter is None:
+                missing_values.append((key, value))
+            elif type(dictionary.get_value(key)) != type(value) or dictionary.get_value(key) != value:
+                dictionary.set_value(key, value)
+        if missing_values:
+            dictionary.shared_parameters.update(dictionary.bulk_set_values(missing_values))
+        ParameterDictionary.shared_dictionaries[dictionary.pk] = dictionary
+        return dictionary
+
+    def load_shared_parameters(self):
+        """
+        Loads every parameter and value of the dictionary, to be answered from memory from then on.
+        Only shared dictionaries, which are not written while games read them, are loaded this way.
+        :return: None
+        """
+        parameters = self.parameters.all().prefetch_related('value')
+        self.shared_parameters = {parameter.key: parameter for parameter in parameters}
+
+    def get_parent(self):
+        """
+        Returns the parent dictionary, kept in memory for the life of the process.
+        :return: Optional[ParameterDictionary]
+        """
+        if self.parent_id is None:
+            return None
+        parent = ParameterDictionary.shared_dictionaries.get(self.parent_id)
+        if parent is None:
+            parent = ParameterDictionary.objects.get(pk=self.parent_id)
+            parent.load_shared_parameters()
+            ParameterDictionary.shared_dictionaries[parent.pk] = parent
+        return parent
+
+    def get_inherited_parameter(self, key):
+        """
+        Returns the parameter for the key from the parent dictionaries, without looking at this one.
+        :param key:
+        :return: Optional[Parameter]
+        """
+        parent = self.get_parent()
+        if parent is None:
+            return None
+        return parent.find_parameter(key)
+
+    def find_parameter(self, key):
+        """
+        Returns the parameter for the key from this dictionary or its parents, without creating it.
+        :param key:
+        :return: Optional[Parameter]
+        """
+        key = ParameterDictionary.get_key(key)
+        if self.shared_parameters is not None:
+            parameter = self.shared_parameters.get(key)
+        else:
+            parameter = self.parameters.filter(key=key).first()
+        if parameter is None:
+            return self.get_inherited_parameter(key)
+        return parameter
+
+    def get_parameter(self, key):
+        key = ParameterDictionary.get_key(key)
+        parameter = self.find_parameter(key)
+        if parameter is None:
+            # find_parameter already looked, so go straight to the insert get_or_create would fall back to.
+            try:
+                with transaction.atomic():
+                    parameter = Parameter.objects.create(dictionary=self, key=key)
+            except IntegrityError:
+                parameter = self.parameters.get(key=key)
         return parameter
 
     def get_value(self, key):
+        parameter_reads.inc()
         parameter = self.get_parameter(key)
         if isinstance(parameter.value, BaseValue):
             return parameter.value.value
         return parameter.value
 
     def set_value(self, key, value):
+        """
+        Sets the value of the key in this dictionary, recording the change.
+        Writing an inherited key creates an override, unless the value is the inherited one.
+        :param key:
+        :param value:
+        :return: the inherited Parameter the write overrode, if any
+        """
         parameter = self.get_parameter(key)
         old_value = parameter.value
-        new_value = ParameterDictionary.__get_model_value(value)
+        inherited = None
+        if parameter.dictionary_id != self.pk:
+            if type(ParameterDictionary.__get_raw_value(old_value)) == type(value) and \
+                    ParameterDictionary.__get_raw_value(old_value) == value:
+                return None
+            inherited = parameter
+            parameter = Parameter(dictionary=self, key=parameter.key)
+        new_value = ParameterDictionary.__get_model_value(value) if value is not None else None
         if old_value != new_value:
-            new_value.save()
-            ParameterUpdate.objects.create(parameter=parameter, old_value=old_value, new_value=new_value)
+            if new_value is not None and new_value.pk is None:
+                new_value.save()
             parameter.value = new_value
             parameter.save()
+            parameter_writes.inc()
+            get_audit_log().record(parameter, old_value, new_value)
+        return inherited
+
+    def bulk_set_values(self, values, keys=(), record=True) -> dict:
+        """
+        Sets many parameters that do not exist yet with a few bulk inserts.
+        Keys that already exist are set one at a time, and inherited keys are only overridden if the value differs.
+        :param values: list of (key, value) pairs, later pairs winning
+        :param keys: further keys to create without a value
+        :param record: whether to record the new values in the audit log
+        :return: dict of the parameters by key string
+        """
+        new_values = OrderedDict()
+        for key, value in values:
+            new_values[ParameterDictionary.get_key(key)] = value
+        all_keys = list(new_values.keys())
+        for key in keys:
+            key = ParameterDictionary.get_key(key)
+            if key not in new_values:
+                all_keys.append(key)
+        parameters = {parameter.key: parameter for parameter in self.parameters.filter(key__in=all_keys)}
+        for key, parameter in parameters.items():
+            if key in new_values:
+                self.set_value(key, new_values.pop(key))
+        inherited_parameters = {}
+        for key in all_keys:
+            if key in parameters:
+                continue
+            inherited = self.get_inherited_parameter(key)
+            if inherited is None:
+                continue
+            inherited_value = ParameterDictionary.__get_raw_value(inherited.value)
+            if key not in new_values or (type(inherited_value) == type(new_values[key]) and
+                                         inherited_value == new_values[key]):
+                new_values.pop(key, None)
+                parameters[key] = inherited
+            else:
+                inherited_parameters[key] = inherited
+        model_values = {}
+        scalar_values = OrderedDict()
+        for key, value in new_values.items():
+            if value is None:
+                continue
+            if isinstance(value, models.Model):
+                model_values[key] = value
+                continue
+            scalar_values.setdefault(ParameterDictionary.__get_value_model(value), []).append(value)
+        interned_values = {model: model.objects.intern_many(values) for model, values in scalar_values.items()}
+        for key, value in new_values.items():
+            if value is not None and key not in model_values:
+                model_values[key] = interned_values[ParameterDictionary.__get_value_model(value)][value]
+        _now = now()
+        new_parameters = []
+        for key in all_keys:
+            if key in parameters:
+                continue
+            parameter = Parameter(dictionary=self, key=key, value=model_values.get(key))
+            parameter.stamp(_now)
+            new_parameters.append(parameter)
+        bulk_create_with_pks(self.parameters.all(), new_parameters)
+        parameter_writes.inc(len(new_parameters))
+        updates = []
+        for parameter in new_parameters:
+            parameters[parameter.key] = parameter
+            if record and parameter.key in model_values:
+                inherited = inherited_parameters.get(parameter.key)
+                old_value = inherited.value if inherited is not None else None
+                updates.append((parameter, old_value, parameter.value))
+        get_audit_log().record_many(updates)
+        return parameters
+
+    def get_encoded_state(self) -> dict:
+        """
+        Returns every key this dictionary answers, including inherited ones, with its encoded value.
+        :return: dict
+        """
+        state = {}
+        parent = self.get_parent()
+        if parent is not None:
+            state.update(parent.get_encoded_state())
+        if self.shared_parameters is not None:
+            parameters = self.shared_parameters.values()
+        else:
+            parameters = self.parameters.prefetch_related('value')
+        for parameter in parameters:
+            state[parameter.key] = ValueCodec.encode(parameter.value)
+        return state
+
+    def take_checkpoint(self, label: str, round_number=None):
+        """
+        Saves the current state of the dictionary as one compressed row, for replays to start from.
+        :param label: str
+        :param round_number: Optional[int]
+        :return: ParameterCheckpoint
+        """
+        return ParameterCheckpoint.objects.create(dictionary=self, label=label, round_number=round_number,
+                                                  data=compress_json(self.get_encoded_state()))
+
+    def compact_history(self):
+        """
+        Collapses the dictionary's updates into its Parameter History and deletes them.
+        For each key the history keeps the value before the first update, the value after the last one
+        and the number of updates. Running it again folds newer updates into the same history.
+        :return: Optional[ParameterHistory], `None` if there were no updates to compact
+        """
+        changes = []
+        for update in ParameterUpdate.objects.filter(parameter__dictionary=self).select_related(
+                'parameter').prefetch_related('old_value', 'new_value'):
+            changes.append((update.created, update.pk, update.parameter.key,
+                            ValueCodec.encode(update.old_value), ValueCodec.encode(update.new_value)))
+        for update in self.compact_updates.select_related('parameter'):
+            changes.append((update.created, update.pk, update.parameter.key, update.old_value, update.new_value))
+        changes.sort(key=lambda change: (change[0], change[1]))
+        if not changes:
+            return None
+        with transaction.atomic():
+            history, created = ParameterHistory.objects.select_for_update().get_or_create(dictionary=self)
+            summary = json.loads(history.summary)
+            for created_at, pk, key, old_value, new_value in changes:
+                if key in summary:
+                    summary[key] = [summary[key][0], new_value, summary[key][2] + 1]
+                else:
+                    summary[key] = [old_value, new_value, 1]
+                if history.first_update is None or created_at < history.first_update:
+                    history.first_update = created_at
+                if history.last_update is None or created_at > history.last_update:
+                    history.last_update = created_at
+            history.update_count += len(changes)
+            history.summary = json.dumps(summary, sort_keys=True)
+            history.save()
+            ParameterUpdate.objects.filter(parameter__dictionary=self).delete()
+            self.compact_updates.all().delete()
+        return history
 
 
 class Parameter(BaseParameter, TimeStamped):
@@ -98,6 +361,10 @@ class Parameter(BaseParameter, TimeStamped):
             return False
         return self.value == other.value
 
+    def __hash__(self):
+        # Defining __eq__ drops the inherited hash, which deleting rows through the ORM needs.
+        return super().__hash__()
+
     def __ne__(self, other):
         if not isinstance(other, Parameter):
             return True
@@ -139,6 +406,67 @@ class ParameterUpdate(TimeStamped):
         verbose_name = _("Parameter Update")
         verbose_name_plural = _("Parameter Updates")
         ordering = ["-created"]
+        indexes = [models.Index(fields=['parameter', 'created'])]
 
     def __str__(self):
         return str(self.parameter.key) + ": " + str(self.old_value) + " -> " + str(self.new_value)
+
+
+class CompactParameterUpdate(models.Model):
+    """
+    Compact Parameter Updates record changes with encoded values, appended in batches.
+    """
+    dictionary = models.ForeignKey(ParameterDictionary, on_delete=models.CASCADE, related_name='compact_updates')
+    parameter = models.ForeignKey(Parameter, on_delete=models.CASCADE, related_name='compact_updates')
+    old_value = models.CharField(_("Old Value"), max_length=320)
+    new_value = models.CharField(_("New Value"), max_length=320)
+    created = models.DateTimeField(editable=False)
+
+    class Meta:
+        verbose_name = _("Compact Parameter Update")
+        verbose_name_plural = _("Compact Parameter Updates")
+        ordering = ["-created"]
+
+    def __str__(self):
+        return str(self.parameter_id) + ": " + str(self.old_value) + " -> " + str(self.new_value)
+
+
+class ParameterHistory(TimeStamped):
+    """
+    Parameter Histories summarize the updates of a dictionary once they have been compacted:
+    for each key, the value before the first update, the value after the last one and the update count.
+    """
+    dictionary = models.OneToOneField(ParameterDictionary, on_delete=models.CASCADE, related_name='history')
+    update_count = models.PositiveIntegerField(_("Update Count"), default=0)
+    first_update = models.DateTimeField(_("First Update"), null=True, blank=True)
+    last_update = models.DateTimeField(_("Last Update"), null=True, blank=True)
+    summary = models.TextField(_("Summary"), default='{}')
+
+    class Meta:
+        verbose_name = _("Parameter History")
+        verbose_name_plural = _("Parameter Histories")
+        ordering = ["-created"]
+
+    def __str__(self):
+        return "%s: %d updates" % (self.dictionary_id, self.update_count)
+
+
+class ParameterCheckpoint(TimeStamped):
+    """
+    Parameter Checkpoints hold the encoded state of a dictionary at a point in a game, such as a round starting.
+    """
+    dictionary = models.ForeignKey(ParameterDictionary, on_delete=models.CASCADE, related_name='checkpoints')
+    label = models.SlugField(_("Label"), max_length=64)
+    round_number = models.PositiveSmallIntegerField(_("Round Number"), null=True, blank=True)
+    data = models.BinaryField(_("Data"))
+
+    class Meta:
+        verbose_name = _("Parameter Checkpoint")
+        verbose_name_plural = _("Parameter Checkpoints")
+        ordering = ["-created"]
+
+    def __str__(self):
+        return "%s: %s" % (self.dictionary_id, self.label)
+
+    def get_encoded_state(self) -> dict:
+        return decompress_json(self.data)
@@ -0,0 +1,100 @@
+from typing import Optional
+
+from .codecs import ValueCodec, EncodedState
+from .models import ParameterDictionary, ParameterUpdate, ParameterCheckpoint
+
+__all__ = ['ReplayState', 'ParameterReplay']
+
+
+class ReplayState(EncodedState):
+    """
+    Replay States hold the encoded parameters of a dictionary at a point in time.
+    """
+    def __init__(self, encoded_state: dict, checkpoint=None, applied_updates=0):
+        """
+        :param encoded_state: dict of encoded values by key
+        :param checkpoint: Optional[ParameterCheckpoint] the state started from
+        :param applied_updates: int updates applied after the checkpoint
+        """
+        super().__init__(encoded_state)
+        self.checkpoint = checkpoint
+        self.applied_updates = applied_updates
+
+    def __contains__(self, key):
+        return super().__contains__(ParameterDictionary.get_key(key))
+
+    def get_value(self, key):
+        return super().get_value(ParameterDictionary.get_key(key))
+
+
+class ParameterReplay:
+    """
+    Parameter Replays rebuild the state of a dictionary at an earlier time.
+    They start from the nearest earlier checkpoint and apply the recorded updates after it in bulk.
+    Updates folded into a Parameter History can no longer be replayed, only checkpoints remain.
+    """
+    def __init__(self, dictionary: ParameterDictionary):
+        self.dictionary = dictionary
+
+    def get_checkpoint(self, at=None, round_number=None) -> Optional[ParameterCheckpoint]:
+        """
+        Returns the latest checkpoint taken at or before the time, or the first one of the round.
+        :param at: Optional[datetime]
+        :param round_number: Optional[int]
+        :return: Optional[ParameterCheckpoint]
+        """
+        checkpoints = self.dictionary.checkpoints.all()
+        if round_number is not None:
+            return checkpoints.filter(round_number=round_number).order_by('created', 'pk').first()
+        if at is not None:
+            checkpoints = checkpoints.filter(created__lte=at)
+        return checkpoints.order_by('-created', '-pk').first()
+
+    def get_updates(self, after=None, until=None) -> list:
+        """
+        Returns the (time, key, encoded new value) updates recorded in full or compact mode, oldest first.
+        :param after: Optional[datetime], excluded
+        :param until: Optional[datetime], included
+        :return: list
+        """
+        updates = ParameterUpdate.objects.filter(parameter__dictionary=self.dictionary)
+        compact_updates = self.dictionary.compact_updates.all()
+        if after is not None:
+            updates = updates.filter(created__gt=after)
+            compact_updates = compact_updates.filter(created__gt=after)
+        if until is not None:
+            updates = updates.filter(created__lte=until)
+            compact_updates = compact_updates.filter(created__lte=until)
+        changes = []
+        for update in updates.select_related('parameter').prefetch_related('new_value'):
+            changes.append((update.created, update.pk, update.parameter.key, ValueCodec.encode(update.new_value)))
+        for update in compact_updates.select_related('parameter'):
+            changes.append((update.created, update.pk, update.parameter.key, update.new_value))
+        changes.sort(key=lambda change: (change[0], change[1]))
+        return [(created, key, new_value) for created, pk, key, new_value in changes]
+
+    def get_state(self, at=None, round_number=None) -> ReplayState:
+        """
+        Returns the state at the time, or as the round started.
+        Without either, the state after every recorded update is returned.
+        :param at: Optional[datetime]
+        :param round_number: Optional[int]
+        :raise: ParameterCheckpoint.DoesNotExist if no checkpoint was taken for the round
+        :return: ReplayState
+        """
+        checkpoint = self.get_checkpoint(at=at, round_number=round_number)
+        if round_number is not None:
+            if checkpoint is None:
+                raise ParameterCheckpoint.DoesNotExist('No checkpoint was taken for round %d.' % (round_number,))
+            return ReplayState(checkpoint.get_encoded_state(), checkpoint)
+        if checkpoint is None:
+            parent = self.dictionary.get_parent()
+            encoded_state = parent.get_encoded_state() if parent is not None else {}
+            after = None
+        else:
+            encoded_state = checkpoint.get_encoded_state()
+            after = checkpoint.created
+        updates = self.get_updates(after=after, until=at)
+        for created, key, new_value in updates:
+            encoded_state[key] = new_value
+        return ReplayState(encoded_state, checkpoint, len(updates))
@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+__all__ = ['rule_evaluated', 'game_updated']
+
+# Sent after a game runs a rule method, with the rule name (without the game slug) and its duration in seconds.
+rule_evaluated = Signal(providing_args=['game', 'rule', 'duration'])
+
+# Sent after a game updates, with the passes it made over its triggers and its duration in seconds.
+game_updated = Signal(providing_args=['game', 'iterations', 'duration'])
@@ -1,3 +1,70 @@
-from django.test import TestCase
+from django.test import override_settings
 
-# Create your tests here.
+from clusterbuster.mixins.benchmarks import BenchmarkTestCase
+
+from .models import ParameterDictionary
+
+BULK_VALUE_COUNT = 100
+TIME_BUDGET = 0.5
+
+# Query budgets by measurement, on SQLite. Backends that return the ids of bulk inserts
+# also create new values with one query, where SQLite inserts them one at a time.
+QUERY_BUDGETS = {
+    'get_value/own': 2,
+    'get_value/inherited': 1,
+    'get_value/missing': 4,
+    'set_value/new': 9,
+    'set_value/changed': 5,
+    'set_value/unchanged': 3,
+    'set_value/inherited': 5,
+    'bulk_set_values/new': 103,
+}
+
+
+@override_settings(PARAMETER_AUDIT_LOG='full')
+class ParameterDictionaryBenchmarks(BenchmarkTestCase):
+    """
+    Parameter Dictionary Benchmarks hold the reads and writes every rule makes to their budgets.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super(ParameterDictionaryBenchmarks, cls).setUpTestData()
+        cls.shared = ParameterDictionary.get_shared('benchmark_defaults', {'inherited': 1, 'overridden': 2})
+        cls.dictionary = ParameterDictionary.objects.create(parent=cls.shared)
+        cls.dictionary.bulk_set_values([('own', 1), ('changed', 1)])
+
+    def setUp(self):
+        super(ParameterDictionaryBenchmarks, self).setUp()
+        self.dictionary = ParameterDictionary.objects.get(pk=self.dictionary.pk)
+
+    def assertBudget(self, name: str, seconds=TIME_BUDGET):
+        return super(ParameterDictionaryBenchmarks, self).assertBudget('games/%s' % (name,), QUERY_BUDGETS[name],
+                                                                       seconds)
+
+    def test_get_value(self):
+        with self.assertBudget('get_value/own'):
+            self.assertEqual(self.dictionary.get_value('own'), 1)
+        with self.assertBudget('get_value/inherited'):
+            self.assertEqual(self.dictionary.get_value('inherited'), 1)
+        with self.assertBudget('get_value/missing'):
+            self.assertIsNone(self.dictionary.get_value('missing'))
+
+    def test_set_value(self):
+        with self.assertBudget('set_value/new'):
+            self.dictionary.set_value('new', 'word')
+        with self.assertBudget('set_value/changed'):
+            self.dictionary.set_value('changed', 2)
+        with self.assertBudget('set_value/unchanged'):
+            self.dictionary.set_value('changed', 2)
+        with self.assertBudget('set_value/inherited'):
+            self.dictionary.set_value('overridden', 3)
+        self.assertEqual(self.dictionary.get_value('new'), 'word')
+        self.assertEqual(self.dictionary.get_value('changed'), 2)
+        self.assertEqual(self.dictionary.get_value('overridden'), 3)
+        self.assertEqual(self.shared.get_value('overridden'), 2)
+
+    def test_bulk_set_values(self):
+        values = [(('bulk', value_i), value_i) for value_i in range(BULK_VALUE_COUNT)]
+        with self.assertBudget('bulk_set_values/new'):
+            self.dictionary.bulk_set_values(values)
+        self.assertEqual(self.dictionary.get_value(('bulk', BULK_VALUE_COUNT - 1)), BULK_VALUE_COUNT - 1)
@@ -1,9 +1,11 @@
 from django.contrib import admin
 
-from .models import Player, Team, Lobby, Activity, ActivityOption
+from .models import Player, Team, Lobby, Activity, ActivityOption, CodeSequence, ReleasedCode
 
 admin.site.register(Player)
 admin.site.register(Team)
 admin.site.register(Lobby)
 admin.site.register(Activity)
 admin.site.register(ActivityOption)
+admin.site.register(CodeSequence)
+admin.site.register(ReleasedCode)
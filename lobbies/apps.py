@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class LobbyConfig(AppConfig):
     name = 'lobbies'
+
+    def ready(self):
+        from . import registries
+        from .expiry import start_expiry_thread
+        start_expiry_thread()
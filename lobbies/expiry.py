@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from clusterbuster.mixins import delete_in_chunks
+
+from .models import Lobby, Player, Team
+
+__all__ = ['ExpirySweeper', 'start_expiry_thread']
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirySweeper:
+    """
+    Expiry Sweepers delete lobbies, teams and players nobody has used for a while, and expired sessions.
+    Lobbies with a game updated since the cutoff are kept. Teams and players are only deleted once
+    no lobby or game holds them, so a sweep after lobbies expire picks up their rosters.
+    """
+    def __init__(self, lobby_age=None, player_age=None, chunk_size=None):
+        """
+        :param lobby_age: Optional[float] hours, defaults to `LOBBY_EXPIRY_AGE`
+        :param player_age: Optional[float] hours, defaults to `PLAYER_EXPIRY_AGE`
+        :param chunk_size: Optional[int] rows deleted per query, defaults to `EXPIRY_CHUNK_SIZE`
+        """
+        self.lobby_age = lobby_age if lobby_age is not None else getattr(settings, 'LOBBY_EXPIRY_AGE', 24.0)
+        self.player_age = player_age if player_age is not None else getattr(settings, 'PLAYER_EXPIRY_AGE', 24.0 * 7)
+        self.chunk_size = chunk_size or getattr(settings, 'EXPIRY_CHUNK_SIZE', 500)
+
+    @staticmethod
+    def get_cutoff(hours: float):
+        return now() - timedelta(hours=hours)
+
+    def get_stale_lobbies(self):
+        cutoff = ExpirySweeper.get_cutoff(self.lobby_age)
+        return Lobby.objects.filter(updated__lt=cutoff).exclude(games__updated__gte=cutoff)
+
+    def get_stale_teams(self):
+        cutoff = ExpirySweeper.get_cutoff(self.player_age)
+        return Team.objects.filter(updated__lt=cutoff, lobby=None, games=None)
+
+    def get_stale_players(self):
+        cutoff = ExpirySweeper.get_cutoff(self.player_age)
+        return Player.objects.filter(updated__lt=cutoff, lobby=None, team=None, games=None)
+
+    @staticmethod
+    def get_expired_sessions():
+        return Session.objects.filter(expire_date__lt=now())
+
+    def get_querysets(self) -> list:
+        """
+        Returns the (name, queryset) pairs to delete, in the order they are swept.
+        :return: list
+        """
+        return [
+            ('lobbies', self.get_stale_lobbies()),
+            ('teams', self.get_stale_teams()),
+            ('players', self.get_stale_players()),
+            ('sessions', ExpirySweeper.get_expired_sessions()),
+        ]
+
+    def count(self) -> dict:
+        return {name: queryset.count() for name, queryset in self.get_querysets()}
+
+    def sweep(self) -> dict:
+        """
+        Deletes the stale rows a chunk at a time.
+        :return: dict of deleted row counts by name
+        """
+        return {name: delete_in_chunks(queryset, self.chunk_size) for name, queryset in self.get_querysets()}
+
+
+expiry_thread = None
+
+
+def run_expiry_thread(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            deleted = ExpirySweeper().sweep()
+            logger.info('Expired %s', ', '.join('%d %s' % (count, name) for name, count in deleted.items()))
+        except Exception:
+            logger.exception('Expiry sweep failed')
+        finally:
+            close_old_connections()
+
+
+def start_expiry_thread():
+    """
+    Starts sweeping every `EXPIRY_INTERVAL` seconds in a daemon thread of this process, if the setting is set.
+    :return: None
+    """
+    global expiry_thread
+    interval = getattr(settings, 'EXPIRY_INTERVAL', None)
+    if not interval or expiry_thread is not None:
+        return
+    expiry_thread = threading.Thread(target=run_expiry_thread, args=(interval,), name='expiry-sweeper', daemon=True)
+    expiry_thread.start()
@@ -0,0 +1,113 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+from django.db import router
+
+from .models import Player
+
+
+class PlayerIdentity:
+    """
+    Player Identities carry the current player in a signed cookie, so pages can know who is playing
+    without reading the session or the Player table.
+    """
+    SALT = 'lobbies.identity'
+
+    def __init__(self, data=None):
+        self.data = data or {}
+        self.modified = False
+
+    @staticmethod
+    def get_cookie_name() -> str:
+        return getattr(settings, 'PLAYER_IDENTITY_COOKIE_NAME', 'player_identity')
+
+    @staticmethod
+    def get_cookie_age() -> int:
+        # Idle players are deleted after PLAYER_EXPIRY_AGE hours, so the cookie never outlives them by much.
+        age = getattr(settings, 'PLAYER_IDENTITY_COOKIE_AGE', settings.SESSION_COOKIE_AGE)
+        return min(age, int(getattr(settings, 'PLAYER_EXPIRY_AGE', 24.0 * 7) * 60 * 60))
+
+    @classmethod
+    def load(cls, request):
+        """
+        Returns the identity stored in the request's cookie, or an empty identity if it is missing or tampered with.
+        :param request: HttpRequest
+        :return: PlayerIdentity
+        """
+        value = request.COOKIES.get(cls.get_cookie_name())
+        if value is None:
+            return cls()
+        try:
+            data = signing.loads(value, salt=cls.SALT, max_age=cls.get_cookie_age())
+        except signing.BadSignature:
+            identity = cls()
+            identity.modified = True
+            return identity
+        return cls(data)
+
+    @property
+    def player_id(self) -> Optional[int]:
+        return self.data.get('player_id')
+
+    @property
+    def player_name(self) -> str:
+        return self.data.get('player_name', '')
+
+    @property
+    def session_key(self) -> Optional[str]:
+        return self.data.get('session_key')
+
+    def matches(self, session_key) -> bool:
+        """
+        Returns `True` if the identity belongs to the session.
+        :param session_key: str or None
+        :return: bool
+        """
+        return self.player_id is not None and session_key is not None and self.session_key == session_key
+
+    def get_player(self) -> Optional[Player]:
+        """
+        Returns the player built from the identity, without querying the database.
+        Fields the identity does not carry are deferred. The player's row may have been deleted since,
+        so views that write rows referencing it check it still exists first.
+        :return: Optional[Player]
+        """
+        if self.player_id is None:
+            return None
+        return Player.from_db(router.db_for_read(Player), ['id', 'name', 'session_id'],
+                              [self.player_id, self.player_name, self.data.get('player_session_key')])
+
+    def set_player(self, player: Player, session_key: str):
+        """
+        Stores the player and the session it belongs to.
+        :param player: Player
+        :param session_key: str
+        :return: None
+        """
+        self.data = {
+            'player_id': player.pk,
+            'player_name': player.name,
+            'player_session_key': player.session_id,
+            'session_key': session_key,
+        }
+        self.modified = True
+
+    def clear(self):
+        self.data = {}
+        self.modified = True
+
+    def save(self, response):
+        """
+        Writes the identity cookie to the response if the identity changed.
+        :param response: HttpResponse
+        :return: None
+        """
+        if not self.modified:
+            return
+        if self.player_id is None:
+            response.delete_cookie(self.get_cookie_name())
+            return
+        value = signing.dumps(self.data, salt=self.SALT, compress=True)
+        response.set_cookie(self.get_cookie_name(), value, max_age=self.get_cookie_age(),
+                            secure=settings.SESSION_COOKIE_SECURE or None, httponly=True)
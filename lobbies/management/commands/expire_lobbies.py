@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from lobbies.expiry import ExpirySweeper
+
+
+class Command(BaseCommand):
+    help = "Deletes lobbies, teams and players nobody has used for a while, and expired sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lobby-age', type=float, default=None,
+                            help='Hours since a lobby or its games were last active. Defaults to LOBBY_EXPIRY_AGE.')
+        parser.add_argument('--player-age', type=float, default=None,
+                            help='Hours since a player or team was last saved. Defaults to PLAYER_EXPIRY_AGE.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows deleted per query. Defaults to EXPIRY_CHUNK_SIZE.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the rows that would be deleted.')
+
+    def handle(self, *args, **options):
+        sweeper = ExpirySweeper(options['lobby_age'], options['player_age'], options['chunk_size'])
+        if options['dry_run']:
+            counts = sweeper.count()
+            verb = 'Would delete'
+        else:
+            counts = sweeper.sweep()
+            verb = 'Deleted'
+        for name, count in counts.items():
+            self.stdout.write("%s: %d" % (name, count))
+        self.stdout.write(self.style.SUCCESS("%s %d rows." % (verb, sum(counts.values()))))
@@ -0,0 +1,16 @@
+from .identity import PlayerIdentity
+
+
+class PlayerIdentityMiddleware:
+    """
+    Loads the player identity cookie into `request.player_identity` and writes it back when it changes.
+    Must come after the SessionMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.player_identity = PlayerIdentity.load(request)
+        response = self.get_response(request)
+        request.player_identity.save(response)
+        return response
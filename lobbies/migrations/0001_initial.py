@@ -0,0 +1,116 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('name', models.CharField(max_length=64, verbose_name='Name')),
+                ('link', models.URLField(verbose_name='Link')),
+            ],
+            options={
+                'verbose_name': 'Activity',
+                'verbose_name_plural': 'Activities',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityOption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('slug', models.SlugField(verbose_name='Slug')),
+                ('start_text', models.CharField(max_length=256, verbose_name='Text')),
+                ('start_url', models.CharField(max_length=64, verbose_name='Relative Link')),
+                ('minimum_player', models.PositiveSmallIntegerField(default=0, verbose_name='Minimum Players')),
+                ('minimum_teams', models.PositiveSmallIntegerField(default=0, verbose_name='Minimum Teams')),
+                ('minimum_players_per_team', models.PositiveSmallIntegerField(default=0, verbose_name='Minimum Players Per Team')),
+            ],
+            options={
+                'verbose_name': 'Activity Option',
+                'verbose_name_plural': 'Activity Options',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Lobby',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('code', models.SlugField(max_length=16, verbose_name='Code')),
+                ('current_activity', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lobbies.Activity')),
+            ],
+            options={
+                'verbose_name': 'Lobby',
+                'verbose_name_plural': 'Lobbies',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Player',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('name', models.CharField(max_length=64, verbose_name='Name')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lobbies_player_related', to='sessions.Session', verbose_name='Session')),
+            ],
+            options={
+                'verbose_name': 'Player',
+                'verbose_name_plural': 'Players',
+                'ordering': ['name', '-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Team',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('name', models.CharField(default='', max_length=64, verbose_name='Team Name')),
+                ('players', models.ManyToManyField(blank=True, to='lobbies.Player')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lobbies_team_related', to='sessions.Session', verbose_name='Session')),
+            ],
+            options={
+                'verbose_name': 'Team',
+                'verbose_name_plural': 'Teams',
+                'ordering': ['name', '-created'],
+            },
+        ),
+        migrations.AddField(
+            model_name='lobby',
+            name='players',
+            field=models.ManyToManyField(blank=True, to='lobbies.Player'),
+        ),
+        migrations.AddField(
+            model_name='lobby',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lobbies_lobby_related', to='sessions.Session', verbose_name='Session'),
+        ),
+        migrations.AddField(
+            model_name='lobby',
+            name='teams',
+            field=models.ManyToManyField(blank=True, to='lobbies.Team'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='lobby',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='lobbies.Lobby'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lobbies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.SlugField(max_length=32, unique=True, verbose_name='Namespace')),
+                ('counter', models.PositiveIntegerField(default=0, verbose_name='Counter')),
+            ],
+            options={
+                'verbose_name': 'Code Sequence',
+                'verbose_name_plural': 'Code Sequences',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReleasedCode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('namespace', models.SlugField(max_length=32, verbose_name='Namespace')),
+                ('code', models.SlugField(max_length=16, verbose_name='Code')),
+            ],
+            options={
+                'verbose_name': 'Released Code',
+                'verbose_name_plural': 'Released Codes',
+            },
+        ),
+        migrations.AlterField(
+            model_name='lobby',
+            name='code',
+            field=models.SlugField(max_length=16, unique=True, verbose_name='Code'),
+        ),
+        migrations.AddIndex(
+            model_name='releasedcode',
+            index=models.Index(fields=['namespace', 'created'], name='lobbies_rel_namespa_307627_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='releasedcode',
+            unique_together={('namespace', 'code')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lobbies', '0002_code_sequences'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lobby',
+            index=models.Index(fields=['updated'], name='lobbies_lob_updated_73cba2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lobby',
+            index=models.Index(fields=['created'], name='lobbies_lob_created_275b2f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['updated'], name='lobbies_pla_updated_034d86_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['updated'], name='lobbies_tea_updated_871f12_idx'),
+        ),
+    ]
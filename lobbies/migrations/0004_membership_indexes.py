@@ -0,0 +1,27 @@
+# Generated by Django 2.1.7 on 2026-10-19 02:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lobbies', '0003_expiry_indexes'),
+    ]
+
+    # The tables behind many to many fields are indexed one way round by their unique constraint,
+    # and by the other foreign key alone the other way round.
+    operations = [
+        migrations.RunSQL(
+            ['CREATE INDEX lobbies_team_players_player_team ON lobbies_team_players (player_id, team_id)'],
+            ['DROP INDEX lobbies_team_players_player_team'],
+        ),
+        migrations.RunSQL(
+            ['CREATE INDEX lobbies_lobby_players_player_lobby ON lobbies_lobby_players (player_id, lobby_id)'],
+            ['DROP INDEX lobbies_lobby_players_player_lobby'],
+        ),
+        migrations.RunSQL(
+            ['CREATE INDEX lobbies_lobby_teams_team_lobby ON lobbies_lobby_teams (team_id, lobby_id)'],
+            ['DROP INDEX lobbies_lobby_teams_team_lobby'],
+        ),
+    ]
@@ -1,7 +1,68 @@
-from django.db import models
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.utils.timezone import now
+
+from clusterbuster.mixins import CodeGenerator
 
 
 class ActiveLobbyManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().exclude(session=None)
 
+
+class ActivityOptionManager(models.Manager):
+    def eligible(self, player_count: int, team_count: int, team_player_count: int):
+        """
+        Returns the activity options whose minimums are met.
+        :param player_count: int
+        :param team_count: int
+        :param team_player_count: int fewest players in any team
+        :return: QuerySet
+        """
+        return self.filter(minimum_player__lte=player_count,
+                           minimum_teams__lte=team_count,
+                           minimum_players_per_team__lte=team_player_count)
+
+
+class CodeSequenceManager(models.Manager):
+    def __next_counter(self, namespace: str) -> int:
+        with transaction.atomic():
+            if not self.filter(namespace=namespace).update(counter=models.F('counter') + 1):
+                try:
+                    with transaction.atomic():
+                        self.create(namespace=namespace, counter=1)
+                except IntegrityError:
+                    self.filter(namespace=namespace).update(counter=models.F('counter') + 1)
+            return self.filter(namespace=namespace).values_list('counter', flat=True).get() - 1
+
+    @staticmethod
+    def __reuse_code(namespace: str):
+        ReleasedCode = apps.get_model('lobbies', 'ReleasedCode')
+        delay = timedelta(hours=getattr(settings, 'CODE_REUSE_DELAY', 24.0))
+        released = ReleasedCode.objects.filter(namespace=namespace, created__lte=now() - delay) \
+            .order_by('created', 'pk').first()
+        if released is None:
+            return None
+        # Another process may have claimed it in the meantime, only the one deleting the row gets it.
+        count, counts = ReleasedCode.objects.filter(pk=released.pk).delete()
+        return released.code if count else None
+
+    def allocate(self, namespace: str, length: int, taken=()) -> str:
+        """
+        Returns an unused code of the namespace. Codes released long enough ago are reused first,
+        otherwise the namespace's counter is advanced and mapped to its code.
+        :param namespace: str
+        :param length: int shortest code length
+        :param taken: querysets of rows with a `code` field; codes found there, like random codes
+            given out before the sequence, are skipped
+        :return: str
+        """
+        while True:
+            code = CodeSequenceManager.__reuse_code(namespace)
+            if code is None:
+                code = CodeGenerator.get_sequence_code(self.__next_counter(namespace), length)
+            if not any(queryset.filter(code=code).exists() for queryset in taken):
+                return code
@@ -1,12 +1,50 @@
 from typing import Optional
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 from clusterbuster.mixins import TimeStamped, CodeGenerator
 
+from .. import registries
 from .mixins import SessionOptional
-from .managers import ActiveLobbyManager
+from .managers import ActiveLobbyManager, ActivityOptionManager, CodeSequenceManager
+
+
+class CodeSequence(models.Model):
+    """
+    Code Sequences count the codes given out in a namespace. Each counter value maps to a distinct code.
+    """
+    namespace = models.SlugField(_("Namespace"), max_length=32, unique=True)
+    counter = models.PositiveIntegerField(_("Counter"), default=0)
+
+    objects = CodeSequenceManager()
+
+    class Meta:
+        verbose_name = _("Code Sequence")
+        verbose_name_plural = _("Code Sequences")
+
+    def __str__(self):
+        return "%s (%d)" % (self.namespace, self.counter)
+
+
+class ReleasedCode(TimeStamped):
+    """
+    Released Codes belonged to deleted rows, and are given out again after `CODE_REUSE_DELAY` hours.
+    """
+    namespace = models.SlugField(_("Namespace"), max_length=32)
+    code = models.SlugField(_("Code"), max_length=16)
+
+    class Meta:
+        verbose_name = _("Released Code")
+        verbose_name_plural = _("Released Codes")
+        unique_together = (('namespace', 'code'),)
+        indexes = [models.Index(fields=['namespace', 'created'])]
+
+    def __str__(self):
+        return str(self.code)
 
 
 class Player(TimeStamped, SessionOptional):
@@ -19,6 +57,7 @@ class Player(TimeStamped, SessionOptional):
         verbose_name = _("Player")
         verbose_name_plural = _("Players")
         ordering = ["name", "-created"]
+        indexes = [models.Index(fields=['updated'])]
 
     def __str__(self):
         return str(self.name)
@@ -35,6 +74,7 @@ class Team(TimeStamped, SessionOptional):
         verbose_name = _("Team")
         verbose_name_plural = _("Teams")
         ordering = ["name", "-created"]
+        indexes = [models.Index(fields=['updated'])]
 
     def __str__(self):
         return str(self.name)
@@ -63,7 +103,7 @@ class Team(TimeStamped, SessionOptional):
         :param player: Player
         :return: bool
         """
-        return bool(self.session == player.session)
+        return bool(self.session_id == player.session_id)
 
     def can_join(self, player: Player) -> bool:
         """
@@ -89,8 +129,9 @@ class Lobby(TimeStamped, SessionOptional):
     """
     DEFAULT_TEAM_COUNT = 2
     DEFAULT_TEAM_NAMES = ['RED', 'BLUE', 'GREEN', 'CYAN', 'MAGENTA', 'YELLOW']
+    CODE_NAMESPACE = 'lobby'
 
-    code = models.SlugField(_("Code"), max_length=16)
+    code = models.SlugField(_("Code"), max_length=16, unique=True)
     players = models.ManyToManyField(Player, blank=True)
     teams = models.ManyToManyField(Team, blank=True)
     current_activity = models.ForeignKey("Activity", on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
@@ -102,13 +143,15 @@ class Lobby(TimeStamped, SessionOptional):
         verbose_name = _("Lobby")
         verbose_name_plural = _("Lobbies")
         ordering = ["-created"]
+        indexes = [models.Index(fields=['updated']), models.Index(fields=['created'])]
 
     def __str__(self):
         return str(self.code)
 
     def __setup_code(self):
         if not self.code:
-            self.code = CodeGenerator.lobby_code()
+            self.code = CodeSequence.objects.allocate(Lobby.CODE_NAMESPACE, CodeGenerator.LOBBY_CODE_LENGTH,
+                                                      (Lobby.objects.all(),))
 
     def __get_teams_with_player_count(self):
         return self.teams.annotate(num_players=models.Count('players')).order_by('num_players')
@@ -151,7 +194,7 @@ class Lobby(TimeStamped, SessionOptional):
         :param player: Player
         :return: bool
         """
-        return bool(self.session == player.session)
+        return bool(self.session_id == player.session_id)
 
     def can_join(self, player: Player) -> bool:
         """
@@ -182,14 +225,16 @@ class Lobby(TimeStamped, SessionOptional):
         Sets the default teams.
         :return: None
         """
-        team_count = self.teams.count()
-        teams_remaining = self.DEFAULT_TEAM_COUNT - team_count
-        for i in range(teams_remaining):
-            new_team_i = team_count + i
-            team = Team(name=self.DEFAULT_TEAM_NAMES[new_team_i])
-            team.save()
-            self.teams.add(team)
-        self.save()
+        with transaction.atomic():
+            self.lock()
+            self.__add_default_teams(self.teams.count())
+
+    def __add_default_teams(self, team_count: int) -> list:
+        new_teams = []
+        for new_team_i in range(team_count, self.DEFAULT_TEAM_COUNT):
+            new_teams.append(Team.objects.create(name=self.DEFAULT_TEAM_NAMES[new_team_i]))
+        self.teams.add(*new_teams)
+        return new_teams
 
     def get_default_team(self) -> Team:
         """
@@ -201,6 +246,23 @@ class Lobby(TimeStamped, SessionOptional):
             self.set_default_teams()
         return self.get_team_with_fewest_players()
 
+    def lock(self):
+        """
+        Locks the lobby's row until the transaction ends, so changes to its roster happen one at a time.
+        The lock is taken by stamping `updated`, since a write locks on every backend,
+        while SQLite ignores `select_for_update`. Must be called in a transaction.
+        :return: None
+        """
+        self.touch()
+
+    def touch(self):
+        """
+        Records activity in the lobby without saving its other fields, which another request may have changed.
+        :return: None
+        """
+        self.updated = now()
+        Lobby.objects.filter(pk=self.pk).update(updated=self.updated)
+
     def join_team(self, player: Player, team: Team):
         """
         Attempts to join the player to a specific team in the lobby.
@@ -221,33 +283,41 @@ class Lobby(TimeStamped, SessionOptional):
         :return: None
         """
         self.players.add(player)
-        self.save()
+        self.touch()
 
     def join(self, player: Player, team=None):
         """
-        Attempts to join the player to the lobby.
+        Attempts to join the player to the lobby, and to the team or else the team with the fewest players.
+        Joins to a lobby are made one at a time under a lock on its row, with a query for the teams' sizes
+        and a single insert per membership, so concurrent joins can not overfill a team or add default teams twice.
         Raises an exception if it fails.
         :param player: Player
         :param team: Team or None
         :raise: Exception
         :return: None
         """
-        if not self.can_join(player):
-            raise Exception('Player can not join lobby.')
-        self.force_join(player)
-        if team is None:
-            team = self.get_default_team()
-        team.join(player)
-        self.save()
+        with transaction.atomic():
+            self.lock()
+            if not self.can_join(player):
+                raise Exception('Player can not join lobby.')
+            teams = list(self.__get_teams_with_player_count())
+            if len(teams) < self.DEFAULT_TEAM_COUNT:
+                new_teams = self.__add_default_teams(len(teams))
+                for new_team in new_teams:
+                    new_team.num_players = 0
+                teams = new_teams + teams
+            if team is None:
+                team = min(teams, key=lambda lobby_team: lobby_team.num_players)
+            elif team.pk not in {lobby_team.pk for lobby_team in teams}:
+                raise Exception('Team does not exist in this Lobby.')
+            Lobby.players.through.objects.create(lobby=self, player=player)
+            Team.players.through.objects.create(team=team, player=player)
 
     def get_activity_options(self):
         player_count = self.players.count()
         team_count = self.teams.count()
         team_player_count = self.get_fewest_players_per_team()
-        activity_options = ActivityOption.objects.filter(minimum_player__lte=player_count,
-                                                         minimum_teams__lte=team_count,
-                                                         minimum_players_per_team__lte=team_player_count).all()
-        return activity_options
+        return registries.get_eligible_activity_options(player_count, team_count, team_player_count)
 
     def start_activity(self, name: str, link: str):
         activity = self.activities.create(name=name, link=link)
@@ -285,6 +355,8 @@ class ActivityOption(TimeStamped):
     minimum_teams = models.PositiveSmallIntegerField(_("Minimum Teams"), default=0)
     minimum_players_per_team = models.PositiveSmallIntegerField(_("Minimum Players Per Team"), default=0)
 
+    objects = ActivityOptionManager()
+
     class Meta:
         verbose_name = _("Activity Option")
         verbose_name_plural = _("Activity Options")
@@ -293,3 +365,8 @@ class ActivityOption(TimeStamped):
     def __str__(self):
         return str(self.slug)
 
+
+@receiver(post_delete, sender=Lobby)
+def release_lobby_code(instance: Lobby, **kwargs):
+    if instance.code:
+        ReleasedCode.objects.get_or_create(namespace=Lobby.CODE_NAMESPACE, code=instance.code)
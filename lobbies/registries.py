@@ -0,0 +1,17 @@
+from clusterbuster.mixins import ModelRegistry
+
+activity_options = ModelRegistry('lobbies.ActivityOption', key_field='slug')
+
+
+def get_eligible_activity_options(player_count: int, team_count: int, team_player_count: int) -> list:
+    """
+    Returns the activity options whose minimums are met, without querying the database.
+    :param player_count: int
+    :param team_count: int
+    :param team_player_count: int fewest players in any team
+    :return: list
+    """
+    return [activity_option for activity_option in activity_options.all()
+            if activity_option.minimum_player <= player_count
+            and activity_option.minimum_teams <= team_count
+            and activity_option.minimum_players_per_team <= team_player_count]
@@ -1,3 +1,83 @@
-from django.test import TestCase
+from django.test import Client
 
-# Create your tests here.
+from clusterbuster.mixins.benchmarks import BenchmarkTestCase
+
+from .models import Lobby, Player, Team
+
+TEAM_COUNTS = range(2, 7)
+PLAYERS_PER_TEAM = 3
+LOBBY_COUNT = 45
+VIEW_TIME_BUDGET = 1.0
+
+# Query budgets by measurement. Lobby pages load their rosters with a fixed number of queries,
+# so the budgets do not grow with the teams and players.
+QUERY_BUDGETS = {
+    'lobby_detail/member': 4,
+    'lobby_detail/visitor': 4,
+    'lobby_list/first_page': 2,
+    'lobby_list/last_page': 1,
+    'join_lobby': 9,
+}
+
+
+class LobbyBenchmarks(BenchmarkTestCase):
+    """
+    Lobby Benchmarks hold the lobby pages to their budgets, for lobbies of 2 to 6 teams and for a long lobby list.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super(LobbyBenchmarks, cls).setUpTestData()
+        host = Client()
+        host.post('/new_player/', {'name': 'host'})
+        codes = [host.post('/new_lobby/', {}).url.rstrip('/').split('/')[-1] for lobby_i in range(LOBBY_COUNT)]
+        cls.lobbies = {}
+        for team_count, code in zip(TEAM_COUNTS, codes):
+            lobby = Lobby.objects.get(code=code)
+            lobby.teams.add(*[Team.objects.create(name=Lobby.DEFAULT_TEAM_NAMES[team_i])
+                              for team_i in range(Lobby.DEFAULT_TEAM_COUNT, team_count)])
+            for player_i in range(1, team_count * PLAYERS_PER_TEAM):
+                lobby.join(Player.objects.create(name='player %d' % (player_i,)))
+            cls.lobbies[team_count] = lobby
+
+    def assertBudget(self, name: str, team_count=None, seconds=VIEW_TIME_BUDGET):
+        label = 'lobbies/%s' % (name,)
+        if team_count is not None:
+            label = 'lobbies/%d_teams/%s' % (team_count, name)
+        return super(LobbyBenchmarks, self).assertBudget(label, QUERY_BUDGETS[name], seconds)
+
+    def add_player(self, name: str) -> Client:
+        client = Client()
+        response = client.post('/new_player/', {'name': name})
+        self.assertEqual(response.status_code, 302)
+        return client
+
+    def test_lobby_detail(self):
+        for team_count, lobby in self.lobbies.items():
+            member = self.add_player('member')
+            member.get('/lobbies/%s/join/' % (lobby.code,))
+            with self.assertBudget('lobby_detail/member', team_count):
+                response = member.get('/lobbies/%s/' % (lobby.code,))
+            self.assertEqual(response.status_code, 200)
+            visitor = self.add_player('visitor')
+            with self.assertBudget('lobby_detail/visitor', team_count):
+                response = visitor.get('/lobbies/%s/' % (lobby.code,))
+            self.assertEqual(response.status_code, 200)
+
+    def test_join_lobby(self):
+        for team_count, lobby in self.lobbies.items():
+            client = self.add_player('joining')
+            with self.assertBudget('join_lobby', team_count):
+                response = client.get('/lobbies/%s/join/' % (lobby.code,))
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(lobby.players.count(), team_count * PLAYERS_PER_TEAM + 1)
+
+    def test_lobby_list(self):
+        client = Client()
+        with self.assertBudget('lobby_list/first_page'):
+            response = client.get('/lobbies/')
+        self.assertEqual(response.status_code, 200)
+        last_page = response.context['paginator'].num_pages
+        self.assertGreater(last_page, 1)
+        with self.assertBudget('lobby_list/last_page'):
+            response = client.get('/lobbies/', {'page': last_page})
+        self.assertEqual(response.status_code, 200)
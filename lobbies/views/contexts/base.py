@@ -1,4 +1,7 @@
+from django.db.models import Count
+
 from lobbies.models import Player, Team, Lobby
+from lobbies.registries import get_eligible_activity_options
 
 
 class LobbyContext:
@@ -65,8 +68,59 @@ class Player2TeamContext:
         """
         data = dict()
         has_player = team.has_player(player)
-        data['has_player'] = team.has_player(player)
-        data['can_join'] = team.can_join(player)
+        data['has_player'] = has_player
+        data['can_join'] = not has_player
         if has_player:
             data['is_leader'] = team.is_leader(player)
         return data
+
+
+class LobbyRosterContext:
+    """
+    Loads the players, teams and activity options of a lobby with a constant number of queries,
+    however many players and teams it has.
+    """
+    @staticmethod
+    def __load_membership(player: Player, player_ids: set, leader_session_id) -> dict:
+        data = dict()
+        has_player = player.pk in player_ids
+        data['has_player'] = has_player
+        data['can_join'] = not has_player
+        if has_player:
+            data['is_leader'] = bool(leader_session_id == player.session_id)
+        return data
+
+    @staticmethod
+    def load(lobby: Lobby, current_player=None) -> dict:
+        """
+        :param lobby: Lobby
+        :param current_player: Player or None
+        :return: dict
+        """
+        data = dict()
+        players = list(lobby.players.all())
+        teams = list(lobby.teams.annotate(num_players=Count('players')).prefetch_related('players'))
+        lobby_player_ids = {player.pk for player in players}
+        if current_player:
+            data.update(PlayerContext.load(current_player))
+            data['is_player'] = True
+            data.update(LobbyRosterContext.__load_membership(current_player, lobby_player_ids, lobby.session_id))
+        players_data = list()
+        for player in players:
+            player_data = PlayerContext.load(player)
+            player_data.update(LobbyRosterContext.__load_membership(player, lobby_player_ids, lobby.session_id))
+            player_data['is_player'] = player == current_player
+            players_data.append(player_data)
+        data['players'] = players_data
+        teams_data = list()
+        for team in teams:
+            team_data = TeamContext.load(team)
+            team_data['player_count'] = team.num_players
+            if current_player:
+                team_player_ids = {player.pk for player in team.players.all()}
+                team_data.update(LobbyRosterContext.__load_membership(current_player, team_player_ids, team.session_id))
+            teams_data.append(team_data)
+        data['teams'] = teams_data
+        team_player_count = min((team.num_players for team in teams), default=0)
+        data['activity_options'] = get_eligible_activity_options(len(players), len(teams), team_player_count)
+        return data
@@ -1,9 +1,13 @@
+from django.conf import settings
+from django.db import models
 from django.views import generic
 from django.shortcuts import redirect, reverse, render
 
+from clusterbuster.mixins import CachedCountPaginator
+
 from ..models import Lobby
 
-from .contexts import PlayerContext, TeamContext, Player2LobbyContext, Player2TeamContext
+from .contexts import LobbyRosterContext
 from .mixins import CheckPlayerView
 
 
@@ -16,7 +20,7 @@ class LobbyCreate(generic.CreateView, CheckPlayerView):
     fields = []
 
     def dispatch(self, request, *args, **kwargs):
-        player = self.get_current_player()
+        player = self.get_verified_player()
         if player is None:
             return redirect('player_create')
         return super().dispatch(request, *args, **kwargs)
@@ -26,8 +30,9 @@ class LobbyCreate(generic.CreateView, CheckPlayerView):
         new_lobby = form.instance  # type: Lobby
         new_lobby.session_id = self.request.session.session_key
         response = super().form_valid(form)
-        player = self.get_current_player()
+        player = self.get_verified_player()
         new_lobby.join(player)
+        self.save_player_to_identity(player)
         return response
 
     def get_success_url(self):
@@ -36,9 +41,16 @@ class LobbyCreate(generic.CreateView, CheckPlayerView):
 
 class LobbyList(generic.ListView):
     context_object_name = 'active_lobbies'
+    paginate_by = 20
+    COUNT_CACHE_KEY = 'lobbies.active_lobby_count'
 
     def get_queryset(self):
-        return Lobby.active_lobbies.all()
+        return Lobby.active_lobbies.annotate(num_players=models.Count('players'))
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return CachedCountPaginator(queryset, per_page, LobbyList.COUNT_CACHE_KEY,
+                                    getattr(settings, 'LOBBY_LIST_COUNT_TIMEOUT', 30), orphans=orphans,
+                                    allow_empty_first_page=allow_empty_first_page, **kwargs)
 
 
 class LobbyDetail(generic.DetailView, CheckPlayerView):
@@ -50,34 +62,7 @@ class LobbyDetail(generic.DetailView, CheckPlayerView):
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        lobby = self.get_object()  # type: Lobby
-        current_player = self.get_current_player()
-        if current_player:
-            player_data = PlayerContext.load(current_player)
-            player_data['is_player'] = True
-            data.update(player_data)
-            player_lobby_data = Player2LobbyContext.load(current_player, lobby)
-            data.update(player_lobby_data)
-        players = lobby.players.all()
-        players_data = list()
-        for player in players:
-            player_data = PlayerContext.load(player)
-            player_lobby_data = Player2LobbyContext.load(player, lobby)
-            player_data.update(player_lobby_data)
-            player_data['is_player'] = player == current_player
-            players_data.append(player_data)
-        data['players'] = players_data
-        teams = lobby.teams.all()
-        teams_data = list()
-        for team in teams:
-            team_data = TeamContext.load(team)
-            if current_player:
-                player_team_data = Player2TeamContext.load(current_player, team)
-                team_data.update(player_team_data)
-            teams_data.append(team_data)
-        data['teams'] = teams_data
-        data['activity_options'] = lobby.get_activity_options()
-
+        data.update(LobbyRosterContext.load(self.object, self.get_current_player()))
         return data
 
 
@@ -87,9 +72,10 @@ class JoinLobby(generic.RedirectView, generic.detail.SingleObjectMixin, CheckPla
     slug_field = 'code'
 
     def get_redirect_url(self, *args, **kwargs):
-        player = self.get_current_player()
+        player = self.get_verified_player()
         if not player:
-            raise Exception('Player must be logged in.')
+            return reverse('player_create')
         lobby = self.get_object()
         lobby.join(player)
+        self.save_player_to_identity(player)
         return super().get_redirect_url(*args, **kwargs)
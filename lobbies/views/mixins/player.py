@@ -9,24 +9,72 @@ class CheckPlayerView(View):
 
     model = Player
 
+    def get_player_identity(self):
+        return getattr(self.request, 'player_identity', None)
+
+    def save_player_to_identity(self, player):
+        identity = self.get_player_identity()
+        if identity is not None:
+            identity.set_player(player, self.request.session.session_key)
+
     def save_player_to_session(self, player):
         if isinstance(player, Player):
             self.request.session['player_id'] = player.pk
             self.request.session['player_name'] = player.name
+            self.save_player_to_identity(player)
 
     def is_current_player(self, player):
         return self.get_current_player() == player
 
     def get_current_player(self):
+        """
+        Returns the current player, resolving it at most once per request.
+        :return: Player or None
+        """
+        if not hasattr(self.request, 'current_player'):
+            self.request.current_player = self.load_current_player()
+        return self.request.current_player
+
+    def get_verified_player(self):
+        """
+        Returns the current player once its row is known to exist, for views that write rows referencing it.
+        A player whose row was deleted, as expiry does to idle players, is forgotten.
+        :return: Player or None
+        """
+        player = self.get_current_player()
+        if player is None or getattr(self.request, 'current_player_verified', True):
+            return player
+        if Player.objects.filter(pk=player.pk).exists():
+            self.request.current_player_verified = True
+            return player
+        self.forget_current_player()
+        return None
+
+    def forget_current_player(self):
+        identity = self.get_player_identity()
+        if identity is not None:
+            identity.clear()
+        self.request.session.pop('player_id', None)
+        self.request.session.pop('player_name', None)
+        self.request.current_player = None
+
+    def load_current_player(self):
+        session_key = self.request.session.session_key
+        identity = self.get_player_identity()
+        if identity is not None and identity.matches(session_key):
+            # Built from the cookie alone, so it is checked against the database before anything is written.
+            self.request.current_player_verified = False
+            return identity.get_player()
         player_id = self.request.session.get('player_id')
         if player_id:
             try:
-                return Player.objects.get(pk=player_id)
+                player = Player.objects.get(pk=player_id)
+                self.save_player_to_session(player)
+                return player
             except Player.DoesNotExist:
                 return None
-        if self.request.session.session_key is None:
-            self.request.session.save()
-        session_key = self.request.session.session_key
+        if session_key is None:
+            return None
         try:
             player = Player.objects.get(session_id=session_key)
             self.save_player_to_session(player)
@@ -45,6 +93,7 @@ class AssignPlayerView(generic.edit.FormMixin, CheckPlayerView):
         new_player.session_id = self.request.session.session_key
         response = super().form_valid(form)
         self.save_player_to_session(new_player)
+        self.request.current_player = new_player
         return response
 
     def get_success_url(self):
@@ -10,7 +10,7 @@ class PlayerCreate(AssignPlayerView, generic.CreateView):
     fields = ['name']
 
     def dispatch(self, request, *args, **kwargs):
-        player = self.get_current_player()
+        player = self.get_verified_player()
         if player:
             return redirect('player_detail', pk=player.pk)
         return super().dispatch(request, *args, **kwargs)